@@ -0,0 +1,163 @@
+"""
+Incremental maintenance of the dashboard aggregates.
+
+The counts behind series_mensal/top_orgaos/top_destinos/metricas
+(build_aggregates.AggregateCounters) are kept in agregados_estado.json,
+together with the final record(s) counted for each event key (NOME, date)
+and a hash of each ground truth entry. A run only revisits the keys the
+event store marked dirty plus the keys whose ground truth entry changed:
+the old records of a key are uncounted and its new ones counted, so the
+cost follows the size of the change, not of the history. The events of a
+key come from the store's key index (EventStore.by_key), and outputs()
+re-encodes only the outputs the changed records are counted in.
+
+Per key, the final records are the ones apply_ground_truth would produce:
+the last detected event merged with the ground truth entry, or just the
+last detected event; without ground truth, every detected event.
+"""
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from apply_ground_truth import load_ground_truth
+from build_aggregates import (OUTPUT_NAMES, AggregateCounters, aggregate, as_record, content_hash, event_month,
+                              normalize_orgao, read_json, write_json)
+from detect_events import Event
+
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.path.join(PIPELINE_DIR, "agregados_estado.json")
+# Muda quando o formato do estado (ou a forma de contar) muda: força reconstrução
+STATE_VERSION = 2
+# Saídas de outputs()
+OUTPUTS = OUTPUT_NAMES + ("eventos.bin",)
+
+Key = Tuple[str, str]
+
+def key_str(key: Key) -> str:
+    nome, date = key
+    return f"{date}|{nome}"
+
+def parse_key(s: str) -> Key:
+    date, nome = s.split("|", 1)
+    return nome, date
+
+class AggregateState:
+    def __init__(self, path: str = STATE_PATH):
+        self.path = path
+        data = read_json(path, {})
+        self.valid = data.get("version") == STATE_VERSION
+        if not self.valid:
+            data = {}
+        # Store e modo de ground truth com que o estado foi construído
+        self.store_path: Optional[str] = data.get("store")
+        self.with_gt: Optional[bool] = data.get("ground_truth")
+        self.records: Dict[Key, List[Dict]] = {parse_key(k): v for k, v in data.get("records", {}).items()}
+        self.gt_hashes: Dict[Key, str] = {parse_key(k): v for k, v in data.get("gt_hashes", {}).items()}
+        self.counters = AggregateCounters.from_dict(data.get("counters", {}))
+        # Saídas afetadas pelo último sync (None = todas)
+        self.dirty_outputs: Optional[Set[str]] = None
+
+    @property
+    def total(self) -> int:
+        return sum(len(v) for v in self.records.values())
+
+    def save(self) -> bool:
+        return write_json(self.path, {
+            "version": STATE_VERSION,
+            "store": self.store_path,
+            "ground_truth": self.with_gt,
+            "records": {key_str(k): v for k, v in sorted(self.records.items())},
+            "gt_hashes": {key_str(k): v for k, v in sorted(self.gt_hashes.items())},
+            "counters": self.counters.to_dict(),
+        }, indent=None)
+
+    def sync(self, store, gt_path: Optional[str] = None) -> Dict:
+        """
+        Brings the counts up to date with the store (and ground truth, if
+        gt_path is given). Rebuilds from scratch when there is no usable
+        state. Returns {"rebuilt", "keys", "changed", "meses", "orgaos"}.
+        """
+        gt = load_ground_truth(gt_path) if gt_path else None
+        with_gt = gt is not None
+        if gt_path and not with_gt:
+            print(f"⚠️ Ground truth file not found: {gt_path}")
+        gt = gt or {}
+        gt_hashes = {k: content_hash(ev) for k, ev in gt.items()}
+
+        store_path = os.path.abspath(store.path)
+        rebuilt = not self.valid or self.store_path != store_path or self.with_gt != with_gt
+        if rebuilt:
+            self.records, self.counters = {}, AggregateCounters()
+            keys = None
+        else:
+            keys = set(store.dirty)
+            keys |= {k for k in set(gt_hashes) | set(self.gt_hashes) if gt_hashes.get(k) != self.gt_hashes.get(k)}
+
+        if keys is None:
+            keys = set(store.by_key) | set(gt)
+
+        changed: Set[Key] = set()
+        meses, orgaos = set(), set()
+        dirty_outputs = set()
+        for k in keys:
+            evs = store.by_key.get(k, [])
+            if k in gt:
+                merged = evs[-1].to_dict() if evs else {}
+                merged.update(gt[k])
+                finals = [merged]
+            elif with_gt:
+                finals = [evs[-1].to_dict()] if evs else []
+            else:
+                finals = [e.to_dict() for e in evs]
+            new = [as_record(Event.from_dict(d)) for d in finals]
+            old = self.records.get(k, [])
+            if new == old:
+                continue
+            changed.add(k)
+            for r in old:
+                self.counters.add(r, -1)
+            for r in new:
+                self.counters.add(r)
+            for r in old + new:
+                meses.add(event_month(r))
+                orgaos.add(normalize_orgao(r.get("orgao", "desconhecido")))
+                dirty_outputs |= AggregateCounters.outputs_of(r)
+            if new:
+                self.records[k] = new
+            else:
+                self.records.pop(k, None)
+
+        self.store_path, self.with_gt, self.gt_hashes = store_path, with_gt, gt_hashes
+        self.valid = True
+        if changed:
+            dirty_outputs.add("eventos.bin")
+        self.dirty_outputs = None if rebuilt else dirty_outputs
+        return {"rebuilt": rebuilt, "keys": len(keys), "changed": len(changed),
+                "meses": sorted(meses), "orgaos": sorted(orgaos)}
+
+    def outputs(self, names: Optional[Set[str]] = None) -> Dict:
+        """
+        The dashboard outputs, plus eventos.bin with the final records
+        (columnar.py); only `names`, if given (e.g. dirty_outputs).
+        """
+        from columnar import encode_events
+
+        outputs = self.counters.outputs(names)
+        if names is None or "eventos.bin" in names:
+            outputs["eventos.bin"] = encode_events(r for records in self.records.values() for r in records)
+        return outputs
+
+    def verify(self, store, gt_path: Optional[str] = None) -> List[str]:
+        """Output files whose incremental payload differs from a full recompute."""
+        from apply_ground_truth import apply_ground_truth
+        from detect_events import events_to_dicts
+
+        dicts = events_to_dicts(store.events)
+        if gt_path:
+            dicts = apply_ground_truth(dicts, gt_path)
+        from columnar import encode_events
+
+        records = [as_record(Event.from_dict(d)) for d in dicts]
+        full = aggregate(records)
+        full["eventos.bin"] = encode_events(records)
+        incremental = self.outputs()
+        return [name for name in full if content_hash(full[name]) != content_hash(incremental.get(name))]
@@ -1,6 +1,47 @@
 import json
 import os
-from typing import List, Dict
+from typing import Dict, List, Optional
+
+def event_key(e: Dict) -> tuple:
+    """Identity of an event for the ground truth match: (NOME, date)."""
+    return (e.get("nome", "").upper(), e.get("date", ""))
+
+def gt_to_event(gt: Dict) -> Dict:
+    """Converts a ground truth entry to the detected event schema."""
+    # Determine the best source for 'destino'
+    # Priority: destination_matched > reason > Default
+    gt_reason = gt.get("reason", "Desconhecido")
+    gt_dest = gt.get("destination_matched") or gt_reason
+    
+    # Get organ name (prefer 'orgao' field if exists, fallback to 'trt' formatted)
+    gt_orgao = gt.get("orgao")
+    if not gt_orgao and gt.get("trt"):
+        gt_orgao = f"trt{gt['trt']}"
+
+    return {
+        "orgao": gt_orgao,
+        "destino": gt_dest if gt.get("type") == "evasão" else gt_orgao,
+        "date": gt.get("date", ""),
+        "mes": gt.get("date", "")[:7],
+        "confidence": "ground_truth",
+        "source_pdf": "DOU_AUDIT",
+        "nome": gt.get("name", "").upper(),
+        "role": gt.get("role", "Não identificado"),
+        "ref_date": gt.get("date", ""),
+        "tipo": gt.get("type", "evasão")
+    }
+
+def load_ground_truth(ground_truth_path: str) -> Optional[Dict[tuple, Dict]]:
+    """Ground truth events by event_key (later entries win), None if the file is missing."""
+    if not os.path.exists(ground_truth_path):
+        return None
+    with open(ground_truth_path, "r", encoding="utf-8") as f:
+        gt_data = json.load(f)
+    gt_events = {}
+    for gt in gt_data:
+        gt_event = gt_to_event(gt)
+        gt_events[event_key(gt_event)] = gt_event
+    return gt_events
 
 def apply_ground_truth(events: List[Dict], ground_truth_path: str) -> List[Dict]:
     """
@@ -23,41 +64,18 @@ def apply_ground_truth(events: List[Dict], ground_truth_path: str) -> List[Dict]
     # We use name + date as the key
     event_map = {}
     for e in events:
-        key = (e.get("nome", "").upper(), e.get("date", ""))
-        event_map[key] = e
+        event_map[event_key(e)] = e
 
     added_count = 0
     overridden_count = 0
 
     for gt in gt_data:
-        # Determine the best source for 'destino'
-        # Priority: destination_matched > reason > Default
-        gt_reason = gt.get("reason", "Desconhecido")
-        gt_dest = gt.get("destination_matched") or gt_reason
-        
-        # Get organ name (prefer 'orgao' field if exists, fallback to 'trt' formatted)
-        gt_orgao = gt.get("orgao")
-        if not gt_orgao and gt.get("trt"):
-            gt_orgao = f"trt{gt['trt']}"
-
-        gt_event = {
-            "orgao": gt_orgao,
-            "destino": gt_dest if gt.get("type") == "evasão" else gt_orgao,
-            "date": gt.get("date", ""),
-            "mes": gt.get("date", "")[:7],
-            "confidence": "ground_truth",
-            "source_pdf": "DOU_AUDIT",
-            "nome": gt.get("name", "").upper(),
-            "role": gt.get("role", "Não identificado"),
-            "ref_date": gt.get("date", ""),
-            "tipo": gt.get("type", "evasão")
-        }
+        gt_event = gt_to_event(gt)
         
         # If type is entry (ingresso), we might want to keep it or use it for matching
         # But for now the dashboard focuses on evasions (evasão)
         
-        key = (gt_event["nome"], gt_event["date"])
-        
+        key = event_key(gt_event)
         if key in event_map:
             # Override
             event_map[key].update(gt_event)
@@ -1,9 +1,19 @@
+import argparse
+import hashlib
 import json
 import re
 import os
 from collections import Counter, defaultdict
 from typing import List
-from datetime import datetime
+from datetime import datetime, timezone
+
+from cache import atomic_path
+
+MANIFEST_NAME = "manifest.json"
+# Saídas em formato colunar: gravadas sem indentação para manter o payload pequeno
+COMPACT_OUTPUTS = {"metricas.json"}
+# Saídas de AggregateCounters.outputs()
+OUTPUT_NAMES = ("series_mensal.json", "top_orgaos.json", "top_destinos.json", "metricas.json")
 
 STATES_MAP = {
     "ACRE": "ac", "ALAGOAS": "al", "AMAPÁ": "ap", "AMAZONAS": "am",
@@ -15,10 +25,83 @@ STATES_MAP = {
     "SÃO PAULO": "sp", "SERGIPE": "se", "TOCANTINS": "to"
 }
 
-def write_json(path: str, obj):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+def content_hash(obj) -> str:
+    """SHA-256 of the canonical JSON form (sorted keys, no whitespace); of the bytes themselves for binary outputs."""
+    if isinstance(obj, bytes):
+        return hashlib.sha256(obj).hexdigest()
+    canonical = json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def write_json(path: str, obj, indent: int = 2) -> bool:
+    """
+    Writes obj as JSON atomically (temp file + rename), and only if the
+    content on disk differs. Returns True if the file was (re)written.
+    """
+    separators = (",", ":") if indent is None else None
+    data = json.dumps(obj, ensure_ascii=False, indent=indent, separators=separators).encode("utf-8")
+    return write_bytes(path, data)
+
+def write_bytes(path: str, data: bytes) -> bool:
+    """write_json() for content already encoded."""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+    return True
+
+def read_json(path: str, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def publish(out_dir: str, outputs: dict, partial: bool = False) -> List[str]:
+    """
+    Writes each output that changed and refreshes the manifest
+    (hashes + generation timestamp) only when something changed, so
+    unchanged runs leave the published tree byte-identical. With
+    partial=True, outputs left out keep their manifest entries.
+    """
+    changed = [
+        name for name, obj in outputs.items()
+        if (write_bytes(os.path.join(out_dir, name), obj) if isinstance(obj, bytes) else
+            write_json(os.path.join(out_dir, name), obj, indent=None if name in COMPACT_OUTPUTS else 2))
+    ]
+
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    old_manifest = read_json(manifest_path, {})
+    files = dict(old_manifest.get("files", {})) if partial else {}
+    files.update((name, {"sha256": content_hash(obj)}) for name, obj in outputs.items())
+    if changed or old_manifest.get("files") != files:
+        write_json(manifest_path, {
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "files": files,
+        })
+    return changed
+
+def diff_top_orgaos(old: list, new: list) -> dict:
+    """Events added/removed per organ between two top_orgaos.json payloads."""
+    def keyed(payload):
+        return {
+            o["orgao"]: {(d.get("nome"), d.get("data")) for d in o.get("details", [])}
+            for o in payload or []
+        }
+
+    old_k, new_k = keyed(old), keyed(new)
+    diff = {}
+    for orgao in sorted(set(old_k) | set(new_k)):
+        before, after = old_k.get(orgao, set()), new_k.get(orgao, set())
+        added, removed = sorted(after - before), sorted(before - after)
+        if added or removed:
+            diff[orgao] = {
+                "adicionados": [{"nome": n, "data": d} for n, d in added],
+                "removidos": [{"nome": n, "data": d} for n, d in removed],
+            }
+    return diff
 
 def normalize_orgao(orgao: str) -> str:
     if not orgao: return "desconhecido"
@@ -44,6 +127,9 @@ def normalize_orgao(orgao: str) -> str:
     elif orgao_upper.startswith("TRT") and any(c.isdigit() for c in orgao):
         # Remove espaços e hífens para padronizar TRT 14 -> trt14
         return orgao_upper.replace(" ", "").replace("-", "").lower()
+    elif "TRIBUNAL REGIONAL DO TRABALHO" in orgao_upper:
+        m = re.search(r"(\d{1,2})", orgao_upper)
+        return f"trt{m.group(1)}" if m else "trt_indefinido"
 
     # TRF: Regionalizado (trf1, trf2...)
     elif orgao_upper.startswith("TRF"):
@@ -70,83 +156,291 @@ def normalize_orgao(orgao: str) -> str:
 
     return orgao.lower()
 
-def build_outputs(json_path: str, out_dir: str):
-    if not os.path.exists(json_path):
-        print(f"❌ Erro: {json_path} não encontrado.")
-        return
+def as_record(e) -> dict:
+    """
+    Normalizes an event to the audited JSON schema (name/type/...).
+    Accepts dicts in that schema or pipeline Events (nome/tipo/...).
+    """
+    if isinstance(e, dict) and "tipo" not in e:
+        return e
+    get = e.get if isinstance(e, dict) else (lambda k, default=None: getattr(e, k, default))
+    tipo = get("tipo", "evasão")
+    return {
+        "date": get("date", ""),
+        "name": get("nome", ""),
+        "type": "saída" if tipo == "evasão" else tipo,
+        "orgao": get("orgao"),
+        "role": get("role", "Não identificado"),
+        "destino": get("destino", ""),
+        "motivo": get("motivo", "Não identificado"),
+    }
+
+def load_events(events_or_path) -> list:
+    """Loads events from a JSON path, or normalizes an in-memory list of events."""
+    if isinstance(events_or_path, str):
+        if not os.path.exists(events_or_path):
+            print(f"❌ Erro: {events_or_path} não encontrado.")
+            return None
+        with open(events_or_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return [as_record(e) for e in events_or_path]
+
+ALLOWED_PREFIXES = ["stf", "cnj", "stj", "stm", "tse", "tst", "trt", "trf", "tre"]
+ROLLING_WINDOWS = (3, 6, 12)
+MONTH_RE = re.compile(r"\d{4}-(0[1-9]|1[0-2])")
+
+def is_allowed_orgao(label: str) -> bool:
+    return any(label.startswith(p) for p in ALLOWED_PREFIXES)
+
+# Data assumida para eventos sem data (contam no mês 2000-01)
+MISSING_DATE = "2000-01-01"
+
+def event_month(e) -> str:
+    """YYYY-MM a normalized event record is counted in; missing or None dates count as MISSING_DATE."""
+    return (e.get('date') or MISSING_DATE)[:7]
+
+def is_month(mes: str) -> bool:
+    """Whether mes is a valid YYYY-MM key (month 01-12)."""
+    return bool(MONTH_RE.fullmatch(mes))
+
+def month_range(first: str, last: str) -> List[str]:
+    """All YYYY-MM months from first to last (both valid, see is_month), inclusive."""
+    y, m = int(first[:4]), int(first[5:7])
+    months = []
+    while f"{y:04d}-{m:02d}" <= last:
+        months.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return months
+
+def rolling_sum(values: List[int], window: int) -> List[int]:
+    prefix = [0]
+    for v in values:
+        prefix.append(prefix[-1] + v)
+    return [prefix[i + 1] - prefix[max(0, i + 1 - window)] for i in range(len(values))]
+
+def compute_metrics(events: list) -> dict:
+    """
+    Precomputes the dashboard metrics in a single pass over the events,
+    as array-of-columns (one list per field) to keep the payload compact:
+    - meses: monthly evasões/ingressos, net balance (saldo), 3/6/12-month
+      rolling sums and year-over-year deltas, on a dense month axis;
+    - orgaos: totals per organ, average monthly rate and share of evasões.
+    """
+    counters = AggregateCounters()
+    for e in events:
+        counters.count_metrics(e)
+    return metrics_from_counts(counters.monthly, counters.per_orgao)
+
+def metrics_from_counts(monthly: dict, per_orgao: dict) -> dict:
+    """compute_metrics() from the monthly and per-organ [evasões, ingressos] counts."""
+    if not monthly:
+        return {"meses": {"mes": []}, "orgaos": {"orgao": []}, "totais": {"evasoes": 0, "ingressos": 0, "saldo": 0}}
+
+    meses = month_range(min(monthly), max(monthly))
+    evasoes = [monthly[m][0] if m in monthly else 0 for m in meses]
+    ingressos = [monthly[m][1] if m in monthly else 0 for m in meses]
+
+    cols = {
+        "mes": meses,
+        "evasoes": evasoes,
+        "ingressos": ingressos,
+        "saldo": [i - e for i, e in zip(ingressos, evasoes)],
+    }
+    for w in ROLLING_WINDOWS:
+        cols[f"evasoes_{w}m"] = rolling_sum(evasoes, w)
+    # Variação em relação ao mesmo mês do ano anterior (null no primeiro ano)
+    cols["evasoes_yoy"] = [v - evasoes[i - 12] if i >= 12 else None for i, v in enumerate(evasoes)]
+    cols["evasoes_12m_yoy"] = [
+        v - cols["evasoes_12m"][i - 12] if i >= 12 else None for i, v in enumerate(cols["evasoes_12m"])
+    ]
 
-    with open(json_path, 'r', encoding='utf-8') as f:
-        events = json.load(f)
-
-    # Filtrar apenas evasões
-    evasion_events = [e for e in events if e.get('type') == 'saída']
-    
-    # 1. Série Mensal
-    by_month = Counter()
-    for e in evasion_events:
-        date = e.get('date', '2000-01-01')
-        mes = date[:7]
-        by_month[mes] += 1
-    
-    series = [{"mes": m, "evasoes": by_month[m]} for m in sorted(by_month.keys())]
-
-    # 2. Top Órgãos (Origem)
-    trts_agg = defaultdict(list)
-    for e in evasion_events:
-        orgao_origem = e.get('orgao', 'desconhecido')
-        orgao_label = normalize_orgao(orgao_origem)
-        
+    total_evasoes = sum(evasoes)
+    orgaos = sorted(per_orgao, key=lambda o: (-per_orgao[o][0], o))
+    orgao_cols = {
+        "orgao": orgaos,
+        "evasoes": [per_orgao[o][0] for o in orgaos],
+        "ingressos": [per_orgao[o][1] for o in orgaos],
+        "saldo": [per_orgao[o][1] - per_orgao[o][0] for o in orgaos],
+        "taxa_mensal": [round(per_orgao[o][0] / len(meses), 4) for o in orgaos],
+        "participacao": [round(per_orgao[o][0] / total_evasoes, 4) if total_evasoes else 0 for o in orgaos],
+    }
+
+    return {
+        "meses": cols,
+        "orgaos": orgao_cols,
+        "totais": {
+            "evasoes": total_evasoes,
+            "ingressos": sum(ingressos),
+            "saldo": sum(ingressos) - total_evasoes,
+            "ultimo_mes": evasoes[-1],
+            "ultimos_12m": cols["evasoes_12m"][-1],
+        },
+    }
+
+def destino_category(destino: str) -> str:
+    """Macro-category of a destination: falecimento, aposentadoria or outros órgãos."""
+    dest = (destino or '').lower()
+    if "falecimento" in dest:
+        return "falecimento"
+    if "aposentadoria" in dest:
+        return "aposentadoria"
+    return "outros órgãos"
+
+def detail_sort_key(d: dict) -> tuple:
+    return (d["data"], d["nome"], d["destino"], d["role"], d["motivo"], d["cargo_destino"])
+
+class AggregateCounters:
+    """
+    The counts behind the dashboard outputs, updatable one event at a time
+    (sign=-1 removes an event), so they can be kept between runs and
+    maintained from deltas. Output order doesn't depend on event order.
+    """
+    def __init__(self):
+        self.series = Counter()                   # mes -> evasões (series_mensal)
+        self.details = defaultdict(list)          # orgao -> detalhes (top_orgaos)
+        self.destinos = Counter()                 # categoria -> evasões (top_destinos)
+        self.monthly = defaultdict(lambda: [0, 0])    # mes -> [evasoes, ingressos] (metricas)
+        self.per_orgao = defaultdict(lambda: [0, 0])  # orgao -> [evasoes, ingressos] (metricas)
+
+    def count_metrics(self, e, sign: int = 1):
+        tipo = e.get('type')
+        if tipo == 'saída':
+            col = 0
+        elif tipo == 'ingresso':
+            col = 1
+        else:
+            return
+        mes = event_month(e)
+        label = normalize_orgao(e.get('orgao', 'desconhecido'))
+        # Datas malformadas (mês 13, dd/mm/aaaa) ficam fora do eixo mensal denso
+        targets = ([(self.monthly, mes)] if is_month(mes) else []) + \
+            ([(self.per_orgao, label)] if is_allowed_orgao(label) else [])
+        for counts, k in targets:
+            counts[k][col] += sign
+            if counts[k] == [0, 0]:
+                del counts[k]
+
+    def add(self, e, sign: int = 1):
+        """Counts a normalized event record (as_record), or uncounts it with sign=-1."""
+        self.count_metrics(e, sign)
+        if e.get('type') != 'saída':
+            return
+
+        mes = event_month(e)
+        self.series[mes] += sign
+        cat = destino_category(e.get('destino', ''))
+        self.destinos[cat] += sign
+        for counter, k in ((self.series, mes), (self.destinos, cat)):
+            if counter[k] <= 0:
+                del counter[k]
+
+        orgao_label = normalize_orgao(e.get('orgao', 'desconhecido'))
+        if not is_allowed_orgao(orgao_label):
+            return
         # Formata o destino para exibição
         dest = e.get('destino', 'Outro Órgão')
         if not dest or dest == "Desconhecido":
             dest = "Outro Órgão"
-            
-        trts_agg[orgao_label].append({
+        detail = {
             "nome": e.get('name', 'Não identificado'),
-            "data": e.get('date', ''),
+            "data": e.get('date') or '',
             "destino": dest,
             "role": e.get('role', 'Não identificado'),
             "motivo": e.get('motivo', 'Não identificado'),
             "cargo_destino": e.get('cargo_destino', '')
-        })
-
-    top_orgaos = []
-    ALLOWED_PREFIXES = ["stf", "cnj", "stj", "stm", "tse", "tst", "trt", "trf", "tre"]
-    
-    for label, items in trts_agg.items():
-        is_allowed = any(label.startswith(p) for p in ALLOWED_PREFIXES)
-        if is_allowed:
-            top_orgaos.append({
-                "orgao": label,
-                "total": len(items),
-                "details": items
-            })
-    
-    top_orgaos.sort(key=lambda x: x["total"], reverse=True)
-
-    # 3. Top Destinos (Categorizados)
-    destino_categories = Counter()
-    for e in evasion_events:
-        dest = e.get('destino', '').lower()
-        if "falecimento" in dest:
-            cat = "falecimento"
-        elif "aposentadoria" in dest:
-            cat = "aposentadoria"
+        }
+        if sign > 0:
+            self.details[orgao_label].append(detail)
         else:
-            cat = "outros órgãos"
-        destino_categories[cat] += 1
-    
-    top_destinos = [{"destino": k, "total": v} for k, v in destino_categories.most_common()]
-
-    # Escrever arquivos
-    write_json(os.path.join(out_dir, "series_mensal.json"), series)
-    write_json(os.path.join(out_dir, "top_orgaos.json"), top_orgaos)
-    write_json(os.path.join(out_dir, "top_destinos.json"), top_destinos)
-    
-    print(f"✅ Agregados gerados com sucesso em {out_dir}")
+            self.details[orgao_label].remove(detail)
+            if not self.details[orgao_label]:
+                del self.details[orgao_label]
+
+    @staticmethod
+    def outputs_of(e) -> set:
+        """Names of the outputs a normalized event record is counted in."""
+        tipo = e.get('type')
+        if tipo == 'saída':
+            return set(OUTPUT_NAMES)
+        return {"metricas.json"} if tipo == 'ingresso' else set()
+
+    def outputs(self, names=None) -> dict:
+        """The dashboard outputs (file name -> payload); only `names`, if given."""
+        out = {}
+        # 1. Série Mensal
+        if names is None or "series_mensal.json" in names:
+            out["series_mensal.json"] = [{"mes": m, "evasoes": self.series[m]} for m in sorted(self.series)]
+
+        # 2. Top Órgãos (Origem)
+        if names is None or "top_orgaos.json" in names:
+            top_orgaos = [
+                {"orgao": label, "total": len(items), "details": sorted(items, key=detail_sort_key)}
+                for label, items in self.details.items()
+            ]
+            top_orgaos.sort(key=lambda x: (-x["total"], x["orgao"]))
+            out["top_orgaos.json"] = top_orgaos
+
+        # 3. Top Destinos (Categorizados)
+        if names is None or "top_destinos.json" in names:
+            out["top_destinos.json"] = [{"destino": k, "total": v}
+                                        for k, v in sorted(self.destinos.items(), key=lambda kv: (-kv[1], kv[0]))]
+
+        if names is None or "metricas.json" in names:
+            out["metricas.json"] = metrics_from_counts(self.monthly, self.per_orgao)
+        return out
+
+    def to_dict(self) -> dict:
+        return {
+            "series": dict(self.series),
+            "details": dict(self.details),
+            "destinos": dict(self.destinos),
+            "monthly": dict(self.monthly),
+            "per_orgao": dict(self.per_orgao),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AggregateCounters":
+        counters = cls()
+        counters.series.update(data.get("series", {}))
+        counters.details.update(data.get("details", {}))
+        counters.destinos.update(data.get("destinos", {}))
+        counters.monthly.update(data.get("monthly", {}))
+        counters.per_orgao.update(data.get("per_orgao", {}))
+        return counters
+
+def aggregate(events: list) -> dict:
+    """The dashboard outputs (file name -> payload) for normalized event records."""
+    counters = AggregateCounters()
+    for e in events:
+        counters.add(e)
+    return counters.outputs()
+
+def build_outputs(events_or_path, out_dir: str, diff_path: str = None):
+    events = load_events(events_or_path)
+    if events is None:
+        return
+
+    # Escrever arquivos (apenas os que mudaram)
+    from columnar import encode_events
+
+    outputs = aggregate(events)
+    if diff_path:
+        previous = read_json(os.path.join(out_dir, "top_orgaos.json"), [])
+        write_json(diff_path, diff_top_orgaos(previous, outputs["top_orgaos.json"]))
+    # Eventos em formato colunar, para o dashboard filtrar (columnar.py)
+    outputs["eventos.bin"] = encode_events(events)
+
+    changed = publish(out_dir, outputs)
+    if changed:
+        print(f"✅ Agregados atualizados em {out_dir}: {', '.join(changed)}")
+    else:
+        print(f"✅ Agregados sem alterações em {out_dir}")
+    return changed
 
 if __name__ == "__main__":
-    build_outputs(
-        json_path="pipeline/eventos_judiciario.json",
-        out_dir="site/public/data"
-    )
+    parser = argparse.ArgumentParser(description="Gera os JSONs agregados do dashboard")
+    parser.add_argument("--events", default="pipeline/eventos_judiciario.json")
+    parser.add_argument("--out-dir", default="site/public/data")
+    parser.add_argument("--diff", dest="diff_path", help="Grava o diff por órgão (eventos adicionados/removidos) neste caminho")
+    args = parser.parse_args()
+    build_outputs(args.events, args.out_dir, diff_path=args.diff_path)
@@ -0,0 +1,148 @@
+"""
+Shared on-disk cache, safe for several pipeline jobs on one machine
+(e.g. a scheduled DOU refresh and a DEJT backfill running at once).
+
+- Entries are written atomically (temp file in the same directory +
+  rename), so a reader never sees a half-written file.
+- Each key has an advisory lock (<path>.lock, fcntl.flock on POSIX,
+  msvcrt.locking on Windows). The OS drops it when the holder exits, so a
+  crashed job doesn't leave the key locked.
+- get_or_compute() is single-flight: the first job to miss computes the
+  entry while holding the lock; the others wait for it and then load the
+  result instead of computing it again. Threads of one process are
+  serialized the same way.
+"""
+import contextlib
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+LOCK_POLL_S = 0.2
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+def _read_umask() -> int:
+    # os.umask só lê trocando o valor: feito uma vez, na importação
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+UMASK = _read_umask()
+
+@contextlib.contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """
+    Yields a temp path next to `path`; once the block completes, the temp
+    file replaces `path` in one rename, with the permissions a plain
+    open() would give (mkstemp creates 0600 files). On error the temp file
+    is removed. Every atomic write of the pipeline goes through here.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # Sufixo próprio: quem lista *.parquet (ou *.json) no diretório não vê a entrada pela metade
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, 0o666 & ~UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+class FileLock:
+    """Exclusive advisory lock on `path` + ".lock", shared between processes."""
+    def __init__(self, path: str, timeout: Optional[float] = None, poll: float = LOCK_POLL_S):
+        self.path = path + ".lock"
+        self.timeout = timeout
+        self.poll = poll
+        self._f = None
+
+    def _try_lock(self) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self._f.seek(0)
+                msvcrt.locking(self._f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def acquire(self) -> bool:
+        """Blocks until the lock is held. Returns whether it had to wait for another holder."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._f = open(self.path, "a+b")
+        waited = False
+        start = time.monotonic()
+        while not self._try_lock():
+            if not waited:
+                print(f"⏳ Aguardando outro processo liberar {self.path}")
+                waited = True
+            if self.timeout is not None and time.monotonic() - start >= self.timeout:
+                self._f.close()
+                self._f = None
+                raise TimeoutError(f"Lock ocupado há mais de {self.timeout:.0f}s: {self.path}")
+            time.sleep(self.poll)
+        return waited
+
+    def release(self):
+        if self._f is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+            else:
+                self._f.seek(0)
+                msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._f.close()
+            self._f = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+# Um lock por chave entre as threads do processo (o lock de arquivo cobre os outros processos)
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+def _thread_lock(path: str) -> threading.Lock:
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+def get_or_compute(path: str, compute: Callable[[], Optional[T]], load: Callable[[str], T],
+                   save: Callable[[T, str], None], use_cache: bool = True,
+                   timeout: Optional[float] = None) -> Optional[T]:
+    """
+    The cache entry at `path`: load(path) if it exists, else compute() and
+    save(value, tmp_path) atomically. Concurrent callers of the same path
+    wait for the one computing it and reuse its result. use_cache=False
+    ignores entries written before the call (a refresh), but still reuses a
+    refresh that was in flight. A None from compute() is returned without
+    caching, so the next caller tries again.
+    """
+    if use_cache and os.path.exists(path):
+        return load(path)
+    requested_at = time.time()
+    with _thread_lock(path), FileLock(path, timeout):
+        # Quem esperou o lock encontra a entrada gravada por quem a calculou
+        if os.path.exists(path) and (use_cache or os.path.getmtime(path) >= requested_at):
+            return load(path)
+        value = compute()
+        if value is not None:
+            with atomic_path(path) as tmp_path:
+                save(value, tmp_path)
+        return value
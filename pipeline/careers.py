@@ -0,0 +1,252 @@
+"""
+Career timeline index: every detected and audited act per person
+(normalized name), ordered by date, kept in index_carreiras.json.
+
+It answers "full career path of X" and "Judiciário → outside transitions
+in a period" without rescanning the events, and is updated incrementally:
+run.py applies the events each detection run removed/added in the store,
+and the ground truth acts are replaced whenever the ground truth is
+applied.
+
+    python careers.py carreira "Fulano de Tal"
+    python careers.py transicoes --since 2023-01-01 --until 2023-12-31 --tipo externa
+    python careers.py rebuild
+"""
+import argparse
+import bisect
+import os
+import unicodedata
+from datetime import date as _date
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from build_aggregates import is_allowed_orgao, normalize_orgao, read_json, write_json
+
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+CAREERS_PATH = os.path.join(PIPELINE_DIR, "index_carreiras.json")
+# Janela (dias) para casar uma saída com o ingresso seguinte da mesma pessoa
+MATCH_WINDOW_DAYS = 45
+UNKNOWN_DESTINOS = {"", "desconhecido", "não identificado"}
+# Destinos que encerram o vínculo sem ida para outro órgão (classe própria)
+END_DESTINOS = {"aposentadoria": "aposentadoria", "falecimento": "falecimento"}
+# Órgãos superiores por nome, para achá-los dentro de um destino em texto livre
+SUPERIOR_NAMES = {
+    "SUPREMO TRIBUNAL FEDERAL": "stf",
+    "CONSELHO NACIONAL DE JUSTICA": "cnj",
+    "SUPERIOR TRIBUNAL DE JUSTICA": "stj",
+    "SUPERIOR TRIBUNAL MILITAR": "stm",
+    "TRIBUNAL SUPERIOR ELEITORAL": "tse",
+    "TRIBUNAL SUPERIOR DO TRABALHO": "tst",
+}
+
+def normalize_name(name):
+    if not name: return ""
+    # Remove acentos e coloca em maiúsculas
+    name = unicodedata.normalize('NFKD', name).encode('ASCII', 'ignore').decode('ASCII')
+    name = name.upper().strip()
+    return name
+
+def is_judiciario(label: Optional[str]) -> bool:
+    """Whether an organ label/name is a Judiciário organ (the ones counted in top_orgaos)."""
+    return bool(label) and is_allowed_orgao(normalize_orgao(label))
+
+def destino_orgao(destino: Optional[str]) -> Optional[str]:
+    """
+    Judiciário organ label named in a destino, None if there is none. DOU
+    destinos are paths ("Poder Judiciário/Tribunal Regional do Trabalho da
+    6ª Região/Diretoria-Geral" -> "trt6"): the first segment naming an
+    organ wins.
+    """
+    for part in (destino or "").split("/"):
+        part = part.strip()
+        if not part:
+            continue
+        label = normalize_orgao(part)
+        if is_allowed_orgao(label):
+            return label
+        plain = normalize_name(part)
+        for name, superior in SUPERIOR_NAMES.items():
+            if name in plain:
+                return superior
+    return None
+
+def act_from_event(e: Dict, auditado: bool = False) -> Dict:
+    """An act of the timeline from a detected event dict (or a ground truth event)."""
+    return {
+        "date": e.get("date", ""),
+        "tipo": e.get("tipo", "evasão"),
+        "orgao": normalize_orgao(e.get("orgao") or "desconhecido"),
+        "destino": e.get("destino", ""),
+        "role": e.get("role", ""),
+        "fonte": e.get("source_pdf", ""),
+        "auditado": auditado,
+    }
+
+def _act_order(act: Dict) -> tuple:
+    return (act["date"], act["tipo"], act["orgao"], act["fonte"], act["destino"], act["role"])
+
+def days_between(a: str, b: str) -> Optional[int]:
+    try:
+        return abs((_date.fromisoformat(a) - _date.fromisoformat(b)).days)
+    except ValueError:
+        return None
+
+class CareerIndex:
+    def __init__(self, path: str = CAREERS_PATH):
+        self.path = path
+        self.built = os.path.exists(path)
+        data = read_json(path, {})
+        # nome normalizado -> atos ordenados por data
+        self.people: Dict[str, List[Dict]] = data.get("people", {})
+
+    def save(self) -> bool:
+        return write_json(self.path, {"people": dict(sorted(self.people.items()))}, indent=None)
+
+    def add(self, nome: str, act: Dict):
+        key = normalize_name(nome)
+        if not key:
+            return
+        acts = self.people.setdefault(key, [])
+        acts.insert(bisect.bisect_right([_act_order(a) for a in acts], _act_order(act)), act)
+
+    def remove(self, nome: str, act: Dict):
+        key = normalize_name(nome)
+        acts = self.people.get(key, [])
+        if act in acts:
+            acts.remove(act)
+            if not acts:
+                del self.people[key]
+
+    def apply(self, removed: Iterable, added: Iterable):
+        """Applies an event store delta (Events removed/added by EventStore.merge)."""
+        for e in removed:
+            self.remove(e.nome, act_from_event(e.to_dict()))
+        for e in added:
+            self.add(e.nome, act_from_event(e.to_dict()))
+
+    def rebuild(self, events: Iterable):
+        """Rebuilds the detected acts from the full event store (keeps the audited ones)."""
+        audited = [(nome, a) for nome, acts in self.people.items() for a in acts if a["auditado"]]
+        self.people = {}
+        for nome, act in audited:
+            self.add(nome, act)
+        self.apply([], events)
+        self.built = True
+
+    def sync_ground_truth(self, gt_path: str) -> bool:
+        """Replaces the audited acts with the current ground truth. False if the file is missing."""
+        from apply_ground_truth import gt_to_event
+
+        gt_data = read_json(gt_path)
+        if gt_data is None:
+            return False
+        for key in list(self.people):
+            self.people[key] = [a for a in self.people[key] if not a["auditado"]]
+            if not self.people[key]:
+                del self.people[key]
+        for gt in gt_data:
+            gt_event = gt_to_event(gt)
+            self.add(gt.get("name", ""), act_from_event(gt_event, auditado=True))
+        return True
+
+    def career(self, nome: str) -> List[Dict]:
+        """Every act of a person, in date order."""
+        return list(self.people.get(normalize_name(nome), []))
+
+    def nearest(self, nome: str, date: str, tipo: str, window: int = MATCH_WINDOW_DAYS,
+                auditado_only: bool = False) -> Optional[Dict]:
+        """The act of `tipo` closest to `date` (within `window` days) in the person's timeline."""
+        best, best_diff = None, None
+        for act in self.people.get(normalize_name(nome), []):
+            if act["tipo"] != tipo or (auditado_only and not act["auditado"]):
+                continue
+            diff = days_between(act["date"], date)
+            if diff is not None and diff <= window and (best is None or diff < best_diff):
+                best, best_diff = act, diff
+        return best
+
+    def transitions(self, since: Optional[str] = None, until: Optional[str] = None,
+                    window: int = MATCH_WINDOW_DAYS) -> Iterator[Dict]:
+        """
+        Exits from a Judiciário organ in [since, until], each with the person's
+        nearest entry within `window` days, classified as:
+        - "interna": entry in another Judiciário organ (or a Judiciário destino)
+          — not an evasão;
+        - "externa": entry or destino outside the Judiciário;
+        - "aposentadoria" / "falecimento": the exit itself ends the career;
+        - "indefinida": no entry found and no destino recorded.
+        """
+        for nome, acts in self.people.items():
+            # Uma saída por data: o ato auditado prevalece sobre os detectados
+            # (e sobre o mesmo ato detectado em várias publicações)
+            exits = {}
+            for act in acts:
+                if act["tipo"] != "evasão" or not is_judiciario(act["orgao"]):
+                    continue
+                if (since and act["date"] < since) or (until and act["date"] > until):
+                    continue
+                if act["date"] not in exits or (act["auditado"] and not exits[act["date"]]["auditado"]):
+                    exits[act["date"]] = act
+            for act in exits.values():
+                destino = act["destino"].strip().lower()
+                entrada = None if destino in END_DESTINOS else self.nearest(nome, act["date"], "ingresso", window)
+                if destino in END_DESTINOS:
+                    tipo = END_DESTINOS[destino]
+                elif entrada is not None:
+                    tipo = "interna" if is_judiciario(entrada["orgao"]) else "externa"
+                elif destino in UNKNOWN_DESTINOS:
+                    tipo = "indefinida"
+                else:
+                    tipo = "interna" if destino_orgao(act["destino"]) else "externa"
+                yield {"nome": nome, "tipo": tipo, "saida": act, "entrada": entrada}
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice de carreiras (atos por pessoa)")
+    parser.add_argument("--index", default=CAREERS_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    c = sub.add_parser("carreira", help="Linha do tempo de uma pessoa")
+    c.add_argument("nome")
+    t = sub.add_parser("transicoes", help="Saídas do Judiciário num período, com o destino encontrado")
+    t.add_argument("--since", help="YYYY-MM-DD")
+    t.add_argument("--until", help="YYYY-MM-DD")
+    t.add_argument("--tipo", choices=["interna", "externa", "aposentadoria", "falecimento", "indefinida"])
+    t.add_argument("--window", type=int, default=MATCH_WINDOW_DAYS, help="Dias entre saída e ingresso")
+    r = sub.add_parser("rebuild", help="Reconstrói o índice a partir do store de eventos e do ground truth")
+    r.add_argument("--store", default=os.path.join(PIPELINE_DIR, "eventos_detectados.json"))
+    r.add_argument("--ground-truth", default=os.path.join(PIPELINE_DIR, "ground_truth.json"))
+    args = parser.parse_args()
+
+    index = CareerIndex(args.index)
+    if args.command == "rebuild":
+        from event_store import EventStore
+
+        index.rebuild(EventStore(args.store).events)
+        index.sync_ground_truth(args.ground_truth)
+        index.save()
+        print(f"✅ Índice de carreiras: {len(index.people)} pessoas, "
+              f"{sum(len(a) for a in index.people.values())} atos")
+        return
+
+    if not index.built:
+        raise SystemExit(f"❌ Índice não encontrado: {args.index} (rode `python careers.py rebuild`)")
+
+    if args.command == "carreira":
+        acts = index.career(args.nome)
+        if not acts:
+            print(f"Nenhum ato para {normalize_name(args.nome)}")
+        for a in acts:
+            mark = "📜" if a["auditado"] else "🔎"
+            print(f"{a['date']}  {mark} {a['tipo']:<9} {a['orgao']:<10} {a['destino'] or '-'}  ({a['fonte']})")
+        return
+
+    count = 0
+    for tr in sorted(index.transitions(args.since, args.until, args.window), key=lambda t: (t["saida"]["date"], t["nome"])):
+        if args.tipo and tr["tipo"] != args.tipo:
+            continue
+        count += 1
+        saida, entrada = tr["saida"], tr["entrada"]
+        destino = f"ingresso em {entrada['orgao']} ({entrada['date']})" if entrada else (saida["destino"] or "?")
+        print(f"{saida['date']}  {tr['tipo']:<10} {tr['nome']}: {saida['orgao']} -> {destino}")
+    print(f"\n{count} transições")
+
+if __name__ == "__main__":
+    main()
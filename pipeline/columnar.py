@@ -0,0 +1,222 @@
+"""
+Compact columnar encoding of the dashboard events (eventos.bin).
+
+The JSON outputs are pre-aggregated, so the dashboard can't filter them by
+organ or destination. eventos.bin carries the events themselves, one row
+per saída/ingresso, as typed-array columns plus one dictionary-encoded
+string table, so the site decodes it with zero-copy typed-array views in a
+Web Worker (site/src/lib/columnar.ts) and recomputes the aggregates for any
+filter off the main thread.
+
+Layout (little-endian, every section aligned to 4 bytes):
+
+    header     magic "OJEV", version u16, ncols u16, nrows u32, nstrings u32, strings_offset u32
+    directory  ncols x (name: 16 bytes ASCII, NUL-padded; width: u8 (1/2/4); 3 pad; offset: u32)
+    strings    (nstrings + 1) u32 byte offsets, then the UTF-8 bytes of every string
+    columns    nrows unsigned ints of `width` bytes each
+
+Column "data" holds the date as YYYYMMDD and "tipo" 0 (saída) or 1
+(ingresso); every other column holds indexes into the string table. Each
+column uses the narrowest width that fits its values.
+
+    python columnar.py bench --data-dir ../site/public/data --scale 100
+"""
+import argparse
+import gzip
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, Iterable, List
+
+from build_aggregates import MISSING_DATE, destino_category, normalize_orgao
+
+MAGIC = b"OJEV"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+COLUMN = struct.Struct("<16sB3xI")
+TIPOS = ("saída", "ingresso")
+# Colunas de índices na tabela de strings (a ordem é a do arquivo)
+STRING_COLUMNS = ("orgao", "categoria", "destino", "nome", "role", "motivo", "cargo_destino")
+TYPECODES = {1: "B", 2: "H", 4: "I"}
+# Ordem das linhas: dentro de um órgão, as saídas ficam na ordem dos detalhes do top_orgaos
+SORT_KEY = ("data", "nome", "tipo", "destino", "role", "motivo", "cargo_destino", "orgao", "categoria")
+
+def _align(n: int) -> int:
+    return (n + 3) & ~3
+
+def _width(max_value: int) -> int:
+    return 1 if max_value < 1 << 8 else 2 if max_value < 1 << 16 else 4
+
+def _pack(typecode: str, values: List[int]) -> bytes:
+    """Little-endian bytes of an unsigned int array, padded to 4 bytes."""
+    a = array(typecode, values)
+    if sys.byteorder != "little":
+        a.byteswap()
+    data = a.tobytes()
+    return data + b"\0" * (_align(len(data)) - len(data))
+
+def date_int(date: str) -> int:
+    """YYYY-MM-DD -> YYYYMMDD (MISSING_DATE when missing, as the aggregates count it)."""
+    try:
+        return int((date or MISSING_DATE)[:10].replace("-", ""))
+    except ValueError:
+        return 20000101
+
+def event_row(e: Dict) -> Dict:
+    """
+    The columns of a normalized event record (as_record), as in top_orgaos
+    details. Ingressos only carry date and organ (they only enter the
+    month axis and the metrics), which keeps their strings out of the table.
+    """
+    if e["type"] == "ingresso":
+        row = dict.fromkeys(STRING_COLUMNS, "")
+        row.update(data=date_int(e.get("date")), tipo=1, orgao=normalize_orgao(e.get("orgao", "desconhecido")))
+        return row
+    destino = e.get("destino") or ""
+    return {
+        "data": date_int(e.get("date")),
+        "tipo": 0,
+        "orgao": normalize_orgao(e.get("orgao", "desconhecido")),
+        "categoria": destino_category(destino),
+        "destino": "Outro Órgão" if not destino or destino == "Desconhecido" else destino,
+        "nome": e.get("name", "Não identificado"),
+        "role": e.get("role", "Não identificado"),
+        "motivo": e.get("motivo", "Não identificado"),
+        "cargo_destino": e.get("cargo_destino") or "",
+    }
+
+def encode_events(records: Iterable[Dict]) -> bytes:
+    """eventos.bin for normalized event records. Rows are sorted, so the bytes don't depend on input order."""
+    rows = sorted((event_row(e) for e in records if e.get("type") in TIPOS),
+                  key=lambda r: tuple(r[c] for c in SORT_KEY))
+
+    strings: Dict[str, int] = {}
+    columns = {"data": [r["data"] for r in rows], "tipo": [r["tipo"] for r in rows]}
+    for name in STRING_COLUMNS:
+        columns[name] = [strings.setdefault(r[name], len(strings)) for r in rows]
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    strings_offset = HEADER.size + COLUMN.size * len(columns)
+    strings_bytes = _pack("I", offsets) + b"".join(encoded)
+
+    directory, blobs = [], []
+    offset = _align(strings_offset + len(strings_bytes))
+    for name, values in columns.items():
+        width = _width(max(values, default=0))
+        directory.append(COLUMN.pack(name.encode("ascii"), width, offset))
+        blobs.append(_pack(TYPECODES[width], values))
+        offset += len(blobs[-1])
+
+    header = HEADER.pack(MAGIC, VERSION, len(columns), len(rows), len(strings), strings_offset)
+    body = header + b"".join(directory) + strings_bytes
+    return body + b"\0" * (_align(len(body)) - len(body)) + b"".join(blobs)
+
+def decode_events(data: bytes) -> List[Dict]:
+    """Rows of an eventos.bin, with the string columns resolved (for checks and the bench)."""
+    magic, version, ncols, nrows, nstrings, strings_offset = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"eventos.bin inválido (magic {magic!r}, versão {version})")
+
+    def read(typecode: str, offset: int, count: int) -> array:
+        a = array(typecode)
+        a.frombytes(data[offset:offset + count * a.itemsize])
+        if sys.byteorder != "little":
+            a.byteswap()
+        return a
+
+    offsets = read("I", strings_offset, nstrings + 1)
+    base = strings_offset + 4 * (nstrings + 1)
+    strings = [data[base + offsets[i]:base + offsets[i + 1]].decode("utf-8") for i in range(nstrings)]
+
+    columns = {}
+    for i in range(ncols):
+        raw_name, width, offset = COLUMN.unpack_from(data, HEADER.size + i * COLUMN.size)
+        name = raw_name.rstrip(b"\0").decode("ascii")
+        values = read(TYPECODES[width], offset, nrows)
+        columns[name] = values if name in ("data", "tipo") else [strings[v] for v in values]
+    return [{name: values[i] for name, values in columns.items()} for i in range(nrows)]
+
+def bench(data_dir: str, scale: int, repeat: int) -> Dict:
+    """
+    Payload size (raw and gzip, as served) and decode time of the JSON
+    outputs versus eventos.bin. With scale > 1 the events are replicated
+    (with distinct names) to project the sizes of a larger history.
+    """
+    from build_aggregates import COMPACT_OUTPUTS, aggregate, as_record
+
+    path = os.path.join(data_dir, "eventos.bin")
+    if not os.path.exists(path):
+        raise SystemExit(f"❌ {path} não encontrado (rode run.py ou build_aggregates.py antes)")
+    with open(path, "rb") as f:
+        rows = decode_events(f.read())
+
+    records = []
+    for k in range(scale):
+        for r in rows:
+            d = str(r["data"])
+            records.append({"date": f"{d[:4]}-{d[4:6]}-{d[6:]}", "name": f"{r['nome']} {k}" if k and r["nome"] else r["nome"],
+                            "type": TIPOS[r["tipo"]], "orgao": r["orgao"], "role": r["role"],
+                            "destino": r["destino"], "motivo": r["motivo"], "cargo_destino": r["cargo_destino"]})
+
+    outputs = aggregate([as_record(r) for r in records])
+    payloads = {
+        # Como publish() grava cada JSON
+        "json": [json.dumps(obj, ensure_ascii=False, indent=None if name in COMPACT_OUTPUTS else 2,
+                            separators=(",", ":") if name in COMPACT_OUTPUTS else None).encode("utf-8")
+                 for name, obj in outputs.items()],
+        "bin": [encode_events(records)],
+    }
+
+    def timed(fn) -> float:
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    results = {}
+    for fmt, blobs in payloads.items():
+        decode = (lambda: [json.loads(b) for b in blobs]) if fmt == "json" else (lambda: decode_events(blobs[0]))
+        results[fmt] = {
+            "bytes": sum(len(b) for b in blobs),
+            "gzip_bytes": sum(len(gzip.compress(b, 9)) for b in blobs),
+            "decode_ms": round(timed(decode) * 1000, 2),
+        }
+    return {"events": len(records), "scale": scale, "results": results}
+
+def main():
+    parser = argparse.ArgumentParser(description="Formato colunar binário dos eventos do dashboard")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench", help="Compara tamanho e tempo de leitura dos JSONs com o eventos.bin")
+    b.add_argument("--data-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "site", "public", "data"))
+    b.add_argument("--scale", type=int, default=1, help="Replica os eventos N vezes para projetar um histórico maior")
+    b.add_argument("--repeat", type=int, default=5, help="Repetições (vale a melhor)")
+    d = sub.add_parser("dump", help="Imprime as linhas de um eventos.bin como JSON")
+    d.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "dump":
+        with open(args.path, "rb") as f:
+            print(json.dumps(decode_events(f.read()), ensure_ascii=False, indent=2))
+        return
+
+    report = bench(args.data_dir, args.scale, args.repeat)
+    print(f"📦 {report['events']} eventos (escala {report['scale']}x)")
+    json_r, bin_r = report["results"]["json"], report["results"]["bin"]
+    for fmt, r in report["results"].items():
+        label = "JSONs agregados" if fmt == "json" else "eventos.bin"
+        print(f"   {label:<16} {r['bytes']:>10} bytes  {r['gzip_bytes']:>9} gzip  {r['decode_ms']:>9.2f} ms")
+    if json_r["bytes"]:
+        print(f"   eventos.bin = {bin_r['bytes'] / json_r['bytes']:.0%} do tamanho "
+              f"({bin_r['gzip_bytes'] / max(json_r['gzip_bytes'], 1):.0%} com gzip)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Ingestion-time deduplication of records.
+
+The same personnel act is often published more than once (DOU and DEJT,
+republications). Before detection, each record's text is normalized and
+fingerprinted with an exact hash plus a MinHash signature over word
+shingles (one-permutation hashing: each shingle is hashed once into one of
+NUM_PERM bins, so the cost is linear in the words instead of words x
+permutations); LSH buckets find near-duplicate candidates, which are confirmed
+by the estimated Jaccard similarity and by having exactly the same
+"identity" tokens (upper-case words and numbers: names, dates, act
+numbers), so template acts about different people are never merged.
+Duplicates are dropped from the stream and kept as back-references to
+their canonical (first seen) record. The index persists between runs;
+run.py re-detects the duplicates whose canonical left the store, was
+quarantined or changed (orphans()) and prunes ids the store no longer has.
+
+Fingerprints are per record: an act republished inside a larger record
+(a DOU act reprinted in a DEJT compilation) is not recognized, and both
+are detected. Cross-source duplicates like that are out of scope here.
+"""
+import hashlib
+import re
+import unicodedata
+import zlib
+from array import array
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from sources import Record
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16          # 16 bands x 4 rows
+THRESHOLD = 0.8     # estimated Jaccard to treat as near-duplicate
+
+_MERSENNE = (1 << 61) - 1
+_HASH_A, _HASH_B = 0x1F2D3C4B5A697887, 0x0123456789ABCDEF
+# Esquema das assinaturas salvas no índice; outro esquema não é comparável
+SIGNATURE_SCHEME = "oph-crc32"
+
+# Metadata header added by ingest_dou_jud.dou_row_to_text (date/url differ between republications)
+_HEADER_RE = re.compile(r"^(?:DATA|FONTE|ORGAO|URL):.*\n|^---\n", re.MULTILINE)
+_WORD_RE = re.compile(r"\w+")
+_IDENTITY_RE = re.compile(r"\b(?:[A-ZÀ-Ú]{3,}|\d+)\b")
+
+def normalize_text(text: str) -> List[str]:
+    """Words of the text without accents, case, punctuation or DOU metadata header."""
+    text = _HEADER_RE.sub("", text)
+    text = unicodedata.normalize("NFKD", text).encode("ASCII", "ignore").decode("ASCII")
+    return _WORD_RE.findall(text.lower())
+
+def identity(text: str) -> str:
+    """Hash of the names/numbers in the text; republications keep them unchanged."""
+    tokens = sorted(set(_IDENTITY_RE.findall(_HEADER_RE.sub("", text))))
+    return hashlib.sha1(" ".join(tokens).encode("utf-8")).hexdigest()
+
+def minhash(words: List[str]) -> array:
+    """
+    One-permutation MinHash: the minimum hash per bin, with empty bins
+    filled from the next non-empty one (rotation densification).
+    """
+    if len(words) <= SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    bins = [_MERSENNE] * NUM_PERM
+    for s in shingles:
+        h = (_HASH_A * zlib.crc32(s.encode("utf-8")) + _HASH_B) % _MERSENNE
+        b, v = h % NUM_PERM, h // NUM_PERM
+        if v < bins[b]:
+            bins[b] = v
+    sig = array("Q", bins)
+    for b in range(NUM_PERM):
+        if bins[b] == _MERSENNE:
+            # Bin vazio: empresta o vizinho à direita, deslocado pela distância
+            for dist in range(1, NUM_PERM):
+                v = bins[(b + dist) % NUM_PERM]
+                if v != _MERSENNE:
+                    sig[b] = v + dist * (_MERSENNE // NUM_PERM + 1)
+                    break
+    return sig
+
+def band_keys(sig: array) -> List[tuple]:
+    """LSH bucket keys: one per band of NUM_PERM // BANDS signature rows."""
+    rows = NUM_PERM // BANDS
+    return [(band, tuple(sig[band * rows:(band + 1) * rows])) for band in range(BANDS)]
+
+def similarity(sig_a: array, sig_b: array) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+class Deduplicator:
+    """
+    Streaming filter: `filter(records)` yields only canonical records.
+    `matches` maps each dropped duplicate to [canonical source_id, the
+    canonical's text hash when matched]; `duplicates` is the same grouped
+    by canonical. A canonical only suppresses a record while `live(id)`
+    holds for it (e.g. still in the event store and not quarantined) or
+    it was read in this run; orphans() lists the duplicates whose
+    canonical is gone or changed since, so they can be detected on their own.
+    """
+    def __init__(self, near: bool = True, threshold: float = THRESHOLD,
+                 live: Optional[Callable[[str], bool]] = None):
+        self.near = near
+        self.threshold = threshold
+        self.live = live
+        self.exact: Dict[str, str] = {}                   # text hash -> canonical id
+        self.digests: Dict[str, str] = {}                 # canonical id -> text hash
+        self.signatures: Dict[str, array] = {}            # canonical id -> MinHash
+        self.identities: Dict[str, str] = {}              # canonical id -> identity hash
+        self.buckets: Dict[tuple, List[str]] = defaultdict(list)
+        self.matches: Dict[str, List[str]] = {}           # duplicate id -> [canonical id, canonical hash]
+        self.seen: Set[str] = set()                       # canonicals read in this run
+        self.dropped = 0                                  # duplicates dropped in this run
+
+    @property
+    def duplicates(self) -> Dict[str, List[str]]:
+        """canonical source_id -> [duplicate source_ids]"""
+        grouped = defaultdict(list)
+        for dup, (canonical, _) in sorted(self.matches.items()):
+            grouped[canonical].append(dup)
+        return dict(grouped)
+
+    def usable(self, canonical: str) -> bool:
+        return canonical in self.seen or self.live is None or self.live(canonical)
+
+    def find_canonical(self, record: Record):
+        words = normalize_text(record.text)
+        digest = hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+        canonical = self.exact.get(digest)
+        if canonical == record.source_id or (canonical and not self.usable(canonical)):
+            canonical = None  # reprocessing the canonical record itself, or a canonical that is gone
+        if canonical or not self.near:
+            return canonical, digest, None, None, []
+
+        ident = identity(record.text)
+        sig = minhash(words)
+        keys = band_keys(sig)
+        seen = set()
+        for key in keys:
+            for cand in self.buckets.get(key, ()):
+                if cand in seen or cand == record.source_id:
+                    continue
+                seen.add(cand)
+                if not self.usable(cand):
+                    continue
+                if self.identities[cand] == ident and similarity(sig, self.signatures[cand]) >= self.threshold:
+                    return cand, digest, sig, ident, keys
+        return None, digest, sig, ident, keys
+
+    def filter(self, records: Iterable[Record]) -> Iterator[Record]:
+        for record in records:
+            sid = record.source_id
+            canonical, digest, sig, ident, keys = self.find_canonical(record)
+            if canonical:
+                self.dropped += 1
+                # Se era canônico de outros registros, deixa de ser (orphans() os devolve)
+                self.forget(sid)
+                self.matches[sid] = [canonical, self.digests.get(canonical)]
+                continue
+
+            self.matches.pop(sid, None)
+            if self.digests.get(sid) != digest:
+                self.forget(sid)  # texto mudou: a impressão anterior não vale mais
+            previous = self.exact.get(digest)
+            if previous and previous != sid:
+                self.forget(previous)  # canônico que não pode mais suprimir (fora do store, em quarentena)
+            self.exact[digest] = sid
+            self.digests[sid] = digest
+            if sig is not None:
+                self.add_signature(sid, sig, ident, keys)
+            self.seen.add(sid)
+            yield record
+
+    def add_signature(self, source_id: str, sig: array, ident: str, keys=None):
+        if source_id in self.signatures:
+            return
+        if keys is None:
+            keys = band_keys(sig)
+        self.signatures[source_id] = sig
+        self.identities[source_id] = ident
+        for key in keys:
+            self.buckets[key].append(source_id)
+
+    def forget(self, source_id: str):
+        """Drops a record's fingerprints: it no longer suppresses anything."""
+        digest = self.digests.pop(source_id, None)
+        if digest is not None and self.exact.get(digest) == source_id:
+            del self.exact[digest]
+        sig = self.signatures.pop(source_id, None)
+        if sig is not None:
+            del self.identities[source_id]
+            for key in band_keys(sig):
+                bucket = self.buckets.get(key)
+                if bucket and source_id in bucket:
+                    bucket.remove(source_id)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def orphans(self, live: Set[str]) -> Set[str]:
+        """
+        Live duplicates whose canonical is no longer live (left the corpus,
+        quarantined) or no longer has the text they matched.
+        """
+        return {
+            dup for dup, (canonical, digest) in self.matches.items()
+            if dup in live and (canonical not in live or self.digests.get(canonical) != digest)
+        }
+
+    def prune(self, known: Set[str]):
+        """Forgets fingerprints and duplicates of records no longer known (e.g. not in the event store)."""
+        for sid in [sid for sid in self.digests if sid not in known]:
+            self.forget(sid)
+        for sid in [sid for sid in self.signatures if sid not in known]:
+            self.forget(sid)
+        for dup in [dup for dup in self.matches if dup not in known]:
+            del self.matches[dup]
+
+    @classmethod
+    def load(cls, path: str, near: bool = True, live: Optional[Callable[[str], bool]] = None) -> "Deduplicator":
+        """Restores the fingerprints saved by a previous run (empty if missing)."""
+        from build_aggregates import read_json
+
+        dedup = cls(near=near, live=live)
+        data = read_json(path, {})
+        dedup.exact.update(data.get("exact", {}))
+        dedup.digests.update((sid, digest) for digest, sid in dedup.exact.items())
+        # Assinaturas de outro esquema são descartadas (os canônicos entram de novo ao serem relidos)
+        near = data.get("near", {}) if data.get("signatures") == SIGNATURE_SCHEME else {}
+        for source_id, (ident, sig_hex) in near.items():
+            sig = array("Q")
+            sig.frombytes(bytes.fromhex(sig_hex))
+            dedup.add_signature(source_id, sig, ident)
+        dedup.matches.update(data.get("matches", {}))
+        # Índices antigos só tinham canônico -> duplicados
+        for canonical, dups in data.get("duplicates", {}).items():
+            for dup in dups:
+                dedup.matches.setdefault(dup, [canonical, dedup.digests.get(canonical)])
+        return dedup
+
+    def save(self, path: str):
+        from build_aggregates import write_json
+
+        write_json(path, {
+            "exact": self.exact,
+            "signatures": SIGNATURE_SCHEME,
+            "near": {sid: [self.identities[sid], sig.tobytes().hex()] for sid, sig in self.signatures.items()},
+            "matches": dict(sorted(self.matches.items())),
+        }, indent=None)
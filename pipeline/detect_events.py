@@ -1,8 +1,11 @@
+import functools
 import re
-import spacy
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, fields
 from typing import List, Dict, Optional
 
+from patterns import rx
+
 # Lazy loader for SpaCy
 _nlp = None
 
@@ -25,6 +28,9 @@ def get_nlp():
     global _nlp
     if _nlp is None:
         try:
+            # Imported here so that stages that never reach the NER fallback
+            # (and build_aggregates) don't pay SpaCy's import cost
+            import spacy
             print("⏳ Carregando modelo SpaCy (pt_core_news_sm)...")
             _nlp = spacy.load("pt_core_news_sm")
             
@@ -37,10 +43,18 @@ def get_nlp():
             print("✅ Modelo carregado com dicionário de nomes!")
         except Exception as e:
             print(f"❌ Erro ao carregar SpaCy: {e}")
-            return None
-    return _nlp
+            # Don't retry (and re-log) on every block
+            _nlp = False
+    return _nlp or None
+
+# Campos categóricos (poucos valores distintos, muito repetidos): internados
+# para que milhares de eventos compartilhem a mesma instância de string.
+CATEGORICAL_FIELDS = ("orgao", "destino", "mes", "confidence", "source_pdf", "role", "tipo")
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
 
-@dataclass
+@dataclass(slots=True)
 class Event:
     orgao: str
     destino: str
@@ -53,6 +67,49 @@ class Event:
     ref_date: str = "" # Reference publication date cited in text
     tipo: str = "evasão" # "evasão" or "ingresso"
 
+    def __post_init__(self):
+        for f in CATEGORICAL_FIELDS:
+            setattr(self, f, _intern(getattr(self, f)))
+
+    def __reduce__(self):
+        # Rebuild through __init__ so strings are re-interned after unpickling
+        # (events come back from worker processes)
+        return (Event, tuple(getattr(self, f) for f in EVENT_FIELDS))
+
+    def to_dict(self) -> Dict:
+        return {f: getattr(self, f) for f in EVENT_FIELDS}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "Event":
+        """Builds an Event from a dict, ignoring keys that are not Event fields."""
+        return cls(**{f: d[f] for f in EVENT_FIELDS if f in d})
+
+EVENT_FIELDS = tuple(f.name for f in fields(Event))
+
+def events_to_dicts(events: List[Event]) -> List[Dict]:
+    return [e.to_dict() for e in events]
+
+def events_from_dicts(dicts: List[Dict]) -> List[Event]:
+    return [Event.from_dict(d) for d in dicts]
+
+def events_to_arrow(events: List[Event]):
+    """
+    Converts events to a pyarrow Table. Categorical fields are dictionary-encoded
+    (small-int codes + lookup table), so repeated strings are stored once.
+    """
+    import pyarrow as pa
+
+    columns = {}
+    for f in EVENT_FIELDS:
+        arr = pa.array([getattr(e, f) for e in events], type=pa.string())
+        columns[f] = arr.dictionary_encode() if f in CATEGORICAL_FIELDS else arr
+    return pa.table(columns)
+
+def events_from_arrow(table) -> List[Event]:
+    cols = [table.column(f).to_pylist() if f in table.column_names else None for f in EVENT_FIELDS]
+    present = [(f, c) for f, c in zip(EVENT_FIELDS, cols) if c is not None]
+    return [Event(**{f: c[i] for f, c in present}) for i in range(table.num_rows)]
+
 # Noise blacklist (names of presidents, departments, boilerplate text, etc.)
 BLACKLIST = [
     "SUA PUBLICAÇÃO", "HORTA",
@@ -78,59 +135,67 @@ BLACKLIST = [
     "NÍVEL SUPERIOR", "NÍVEL INTERMEDIÁRIO", "NIVEL SUPERIOR", "NIVEL INTERMEDIARIO"
 ]
 
+# Patterns for Brazilian Judicial and Public Roles
+ROLE_PATTERNS = [rx(p, re.IGNORECASE, name=f"role_{i}") for i, p in enumerate([
+    # Match common roles with their areas/specialties
+    r"(?:cargo\s+de\s+)?((?:Analista|T[ée]cnico|Auxiliar)\s+Judici[áa]rio(?:\s*[,-]\s*[^;.]+)?)"
+])]
+
+# Clean up trailing noise (common in administrative acts)
+ROLE_TRIM_PATTERNS = [rx(p, re.IGNORECASE, name=f"role_trim_{i}") for i, p in enumerate([
+    r",?\s+do\s+Quadro", r",?\s+n[íi]vel", r",?\s+da\s+Secretaria", r",?\s+matr[íi]cula",
+])]
+
 def extract_role(block: str) -> str:
     """
     Extracts the job role from the text block.
     """
-    # Patterns for Brazilian Judicial and Public Roles
-    patterns = [
-        # Match common roles with their areas/specialties
-        r"(?:cargo\s+de\s+)?((?:Analista|T[ée]cnico|Auxiliar)\s+Judici[áa]rio(?:\s*[,-]\s*[^;.]+)?)"
-    ]
-
-    for p in patterns:
-        m = re.search(p, block, re.IGNORECASE)
+    for p in ROLE_PATTERNS:
+        m = p.search(block)
         if m:
             role = m.group(1).strip()
-            # Clean up trailing noise (common in administrative acts)
-            role = re.split(r",?\s+do\s+Quadro", role, flags=re.IGNORECASE)[0]
-            role = re.split(r",?\s+n[íi]vel", role, flags=re.IGNORECASE)[0]
-            role = re.split(r",?\s+da\s+Secretaria", role, flags=re.IGNORECASE)[0]
-            role = re.split(r",?\s+matr[íi]cula", role, flags=re.IGNORECASE)[0]
+            for trim in ROLE_TRIM_PATTERNS:
+                role = trim.split(role)[0]
             # Strip trailing dots or spaces
             return role.strip(". ")
 
     return "Não identificado"
 
-def extract_nome(block: str) -> str:
-    # List of patterns to find names in administrative acts
-    patterns = [
-        # Colon nomination (very strong signal): Nomear ... : NAME
-        r"(?:[Nn]omear|NOMEAR|[Ee]xonerar|EXONERAR)\b(?:.{1,300}?)[:]\s*([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
-        # Nomear NAME (Direct) - Robust for legal noise
-        r"(?:[Nn]omear|NOMEAR|[Ee]xonerar|EXONERAR)\b.{1,500}?\b([A-ZÀ-Ú][A-ZÀ-Ú ]{12,60})\b",
-         # Broad nomination with MANDATORY candidate/servidor anchor AND gap after
-        r"(?:[Nn]omear|NOMEAR|[Ee]xonerar|EXONERAR|[Nn]omea[çc][ãa]o\b|NOMEA[ÇC][ÃA]O\s+(?:de|DE)?)(?:[^;]{1,300}?)(?:o|a|os|as)?\s*(?:seguintes?)?\s*(?:[Cc]andidat|[Ss]ervido)(?:[oa]s?|r|ra|res?)(?:[^;]{1,300}?)\s+([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
-        # Fallback broad match (careful)
-        r"(?:[Tt]ornar\s+sem\s+efeito|TORNAR\s+SEM\s+EFEITO|[Dd]eclarar\s+vago|DECLARAR\s+VAGO)\b.*?\s+(?:o|a)?\s+(?:[Ss]ervidor|[Cc]andidato|(?:[Nn]omea[çc][ãa]o)\s+(?:de|DE))\s+([A-ZÀ-Ú ][A-ZÀ-Ú ]{4,60})",
-        # Pattern for lists: 1º lugar - NAME (allowing "pela lista...")
-        r"(?:\d+º\s+(?:lugar|LUGAR)\s+(?:.*?)-\s+)([A-ZÀ-Ú ][A-ZÀ-Ú ]{4,60})",
-        # List format: NAME/ classification
-        r"^([A-ZÀ-Ú ][A-ZÀ-Ú ]{4,60})/\s+\d+º\s+(?:colocado|COLOCADO|lugar|LUGAR|classificado|CLASSIFICADO)",
-        # List format: NAME, classificado em
-        r"([A-ZÀ-Ú ][A-ZÀ-Ú ]{4,60}),?\s+(?:classificado|CLASSIFICADO)\s+(?:em|EM)",
-        # "ocupado por [Nome]" - refined for pelo(a) and cleanup
-        r"(?:[Oo]cupado|OCUPADO)\s+(?:pelo|PELO|pela|PELA|por|POR|pl|PL|p)(?:[a-z\(\)A-Z]+)?(?:.*?)\s+(?:[Ss]ervidor|SERVIDOR)(?:a|A)?\s+[^A-ZÀ-Ú]*?([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
-        # Broad Ocupado (Strict Uppercase Name) - Catches "ocupado por JOSINALDO"
-        r"(?:[Oo]cupado|OCUPADO)\s+(?:pelo|PELO|pela|PELA|por|POR)\s+[^A-ZÀ-Ú]*?([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
-        # "referente ao candidato abaixo relacionado: NAME"
-        r"(?:[Cc]andidato|CANDIDATO)\s+(?:abaixo|ABAIXO)\s+(?:relacionado|RELACIONADO):\s*([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
-        # Explicit "Dispensar o servidor NAME" (TRT4)
-        r"(?:[Dd]ispensar|DISPENSAR)\s+(?:o|a|O|A)?\s+(?:[Ss]ervidor|SERVIDOR)(?:a|A)?\s+[^A-ZÀ-Ú]*?([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
-    ]
-    
-    for p in patterns:
-        m = re.search(p, block) # NO IGNORECASE!
+# List of patterns to find names in administrative acts (NO IGNORECASE!)
+NOME_PATTERNS = [rx(p, name=f"nome_{i}") for i, p in enumerate([
+    # Colon nomination (very strong signal): Nomear ... : NAME
+    r"(?:[Nn]omear|NOMEAR|[Ee]xonerar|EXONERAR)\b(?:.{1,300}?)[:]\s*([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
+    # Nomear NAME (Direct) - Robust for legal noise
+    r"(?:[Nn]omear|NOMEAR|[Ee]xonerar|EXONERAR)\b.{1,500}?\b([A-ZÀ-Ú][A-ZÀ-Ú ]{12,60})\b",
+    # Broad nomination with MANDATORY candidate/servidor anchor AND gap after
+    r"(?:[Nn]omear|NOMEAR|[Ee]xonerar|EXONERAR|[Nn]omea[çc][ãa]o\b|NOMEA[ÇC][ÃA]O\s+(?:de|DE)?)(?:[^;]{1,300}?)(?:o|a|os|as)?\s*(?:seguintes?)?\s*(?:[Cc]andidat|[Ss]ervido)(?:[oa]s?|r|ra|res?)(?:[^;]{1,300}?)\s+([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
+    # Fallback broad match (careful)
+    r"(?:[Tt]ornar\s+sem\s+efeito|TORNAR\s+SEM\s+EFEITO|[Dd]eclarar\s+vago|DECLARAR\s+VAGO)\b.*?\s+(?:o|a)?\s+(?:[Ss]ervidor|[Cc]andidato|(?:[Nn]omea[çc][ãa]o)\s+(?:de|DE))\s+([A-ZÀ-Ú ][A-ZÀ-Ú ]{4,60})",
+    # Pattern for lists: 1º lugar - NAME (allowing "pela lista...")
+    r"(?:\d+º\s+(?:lugar|LUGAR)\s+(?:.*?)-\s+)([A-ZÀ-Ú ][A-ZÀ-Ú ]{4,60})",
+    # List format: NAME/ classification
+    r"^([A-ZÀ-Ú ][A-ZÀ-Ú ]{4,60})/\s+\d+º\s+(?:colocado|COLOCADO|lugar|LUGAR|classificado|CLASSIFICADO)",
+    # List format: NAME, classificado em
+    r"([A-ZÀ-Ú ][A-ZÀ-Ú ]{4,60}),?\s+(?:classificado|CLASSIFICADO)\s+(?:em|EM)",
+    # "ocupado por [Nome]" - refined for pelo(a) and cleanup
+    r"(?:[Oo]cupado|OCUPADO)\s+(?:pelo|PELO|pela|PELA|por|POR|pl|PL|p)(?:[a-z\(\)A-Z]+)?(?:.*?)\s+(?:[Ss]ervidor|SERVIDOR)(?:a|A)?\s+[^A-ZÀ-Ú]*?([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
+    # Broad Ocupado (Strict Uppercase Name) - Catches "ocupado por JOSINALDO"
+    r"(?:[Oo]cupado|OCUPADO)\s+(?:pelo|PELO|pela|PELA|por|POR)\s+[^A-ZÀ-Ú]*?([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
+    # "referente ao candidato abaixo relacionado: NAME"
+    r"(?:[Cc]andidato|CANDIDATO)\s+(?:abaixo|ABAIXO)\s+(?:relacionado|RELACIONADO):\s*([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
+    # Explicit "Dispensar o servidor NAME" (TRT4)
+    r"(?:[Dd]ispensar|DISPENSAR)\s+(?:o|a|O|A)?\s+(?:[Ss]ervidor|SERVIDOR)(?:a|A)?\s+[^A-ZÀ-Ú]*?([A-ZÀ-Ú][A-ZÀ-Ú ]{4,60})",
+])]
+
+# Clean up: stop at common delimiters after the name
+NOME_CUT_RE = rx(r"[,;.]|\s+matr[íi]cula|\s+para\s+|\s+do\s+cargo|\s+em\s+virtude|\s+que\s+nomeou|\s+vaga\s+|\s+e\s+(?=[A-ZÀ-Ú])|\s+Art\.|vigência|decorrência|classificado|colocado|\s+cargo\s+criado|\s+cargo\s+decorrente|\s+desta\s+Universidade", re.IGNORECASE, name="nome_cut")
+# Clean Prefix: "Nível Superior NAME"
+NOME_PREFIX_RE = rx(r"^(?:N[ÍI]VEL\s+(?:SUPERIOR|INTERMEDI[ÁA]RIO)|T[Éé]CNICO\s+JUDICI[ÁA]RIO|ANALISTA\s+JUDICI[ÁA]RIO)\s+", re.IGNORECASE, name="nome_prefix")
+NOME_TITLE_RE = rx(r"^(O|A)\s+(CANDIDATO|CANDIDATA|SERVIDOR|SERVIDORA)\s+", re.IGNORECASE, name="nome_title")
+
+def extract_nome(block: str, use_ner: bool = True) -> str:
+    for p in NOME_PATTERNS:
+        m = p.search(block)
         if m:
             raw = m.group(1).strip()
             # Uppercase check: if we are relying on regex case-insensitivity, we must verify the content
@@ -140,15 +205,15 @@ def extract_nome(block: str) -> str:
                 continue
 
             # Clean up: stop at common delimiters after the name
-            clean = re.split(r"[,;.]|\s+matr[íi]cula|\s+para\s+|\s+do\s+cargo|\s+em\s+virtude|\s+que\s+nomeou|\s+vaga\s+|\s+e\s+(?=[A-ZÀ-Ú])|\s+Art\.|vigência|decorrência|classificado|colocado|\s+cargo\s+criado|\s+cargo\s+decorrente|\s+desta\s+Universidade", raw, flags=re.IGNORECASE)[0].strip()
+            clean = NOME_CUT_RE.split(raw)[0].strip()
             
             # Clean Prefix: "Nível Superior NAME"
-            clean = re.sub(r"^(?:N[ÍI]VEL\s+(?:SUPERIOR|INTERMEDI[ÁA]RIO)|T[Éé]CNICO\s+JUDICI[ÁA]RIO|ANALISTA\s+JUDICI[ÁA]RIO)\s+", "", clean, flags=re.IGNORECASE).strip()
+            clean = NOME_PREFIX_RE.sub("", clean).strip()
 
             # Strip titles
             
             # Strip titles
-            clean = re.sub(r"^(O|A)\s+(CANDIDATO|CANDIDATA|SERVIDOR|SERVIDORA)\s+", "", clean, flags=re.IGNORECASE)
+            clean = NOME_TITLE_RE.sub("", clean)
             
             # Final sanity check: names should have at least 2 words and not be too generic
             if len(clean.split()) >= 2:
@@ -160,7 +225,7 @@ def extract_nome(block: str) -> str:
                 
     # --- FALLBACK: SPACY NER ---
     # If regex failed, try to use Named Entity Recognition
-    nlp = get_nlp()
+    nlp = get_nlp() if use_ner else None
     if nlp:
         # Limit text window to avoid processing huge blocks
         doc = nlp(block)
@@ -192,10 +257,12 @@ def extract_nome(block: str) -> str:
 
     return ""
 
+# Look for "a partir de DD/MM/YYYY" or "a contar de DD/MM/YYYY"
+# Removed "em" because it matches legislative dates (e.g. "Lei de 1996")
+EVENT_DATE_RE = rx(r"(?:a partir de|a contar de|efeitos a partir de)\s+(\d{1,2}/\d{1,2}/\d{2,4})", re.IGNORECASE, name="event_date")
+
 def extract_event_date(block: str) -> str:
-    # Look for "a partir de DD/MM/YYYY" or "a contar de DD/MM/YYYY"
-    # Removed "em" because it matches legislative dates (e.g. "Lei de 1996")
-    m = re.search(r"(?:a partir de|a contar de|efeitos a partir de)\s+(\d{1,2}/\d{1,2}/\d{2,4})", block, re.IGNORECASE)
+    m = EVENT_DATE_RE.search(block)
     if m:
         dstr = m.group(1)
         parts = dstr.split("/")
@@ -205,55 +272,68 @@ def extract_event_date(block: str) -> str:
             return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
     return ""
 
+WHITESPACE_RE = rx(r"\s+", name="whitespace")
+
 def norm(s: str) -> str:
-    return re.sub(r"\s+", " ", s).strip()
+    return WHITESPACE_RE.sub(" ", s).strip()
+
+@functools.lru_cache(maxsize=64)
+def keyword_regex(keywords: tuple, name: Optional[str] = None):
+    # Escape keywords to avoid regex errors, and join them: \b(k1|k2|...)\b
+    return rx(r"\b(" + "|".join(re.escape(k) for k in keywords) + r")\b", re.IGNORECASE, name=name)
 
 def contains_any(text: str, keywords: List[str]) -> bool:
     # Use regex with word boundaries for safer matching
     # simple text search: any(k.lower() in t for k in keywords) was too greedy
-    # We join distinct keywords into a big regex pattern: \b(k1|k2|...)\b
     if not keywords: 
         return False
-    
-    # Escape keywords to avoid regex errors, and join them
-    pattern = r"\b(" + "|".join(re.escape(k) for k in keywords) + r")\b"
-    return bool(re.search(pattern, text, re.IGNORECASE))
+    return bool(keyword_regex(tuple(keywords)).search(text))
+
+TRT_SIGLA_RE = rx(r"\bTRT[-\s]?(\d{1,2})\b", re.IGNORECASE, name="ctx_trt_sigla")
+TRT_NOME_RE = rx(r"TRIBUNAL\s+REGIONAL\s+DO\s+TRABALHO\s+DA\s+(\d{1,2})", re.IGNORECASE, name="ctx_trt_nome")
+TRF_SIGLA_RE = rx(r"\bTRF[-\s]?(\d{1,2})\b", re.IGNORECASE, name="ctx_trf_sigla")
+TRF_NOME_RE = rx(r"TRIBUNAL\s+REGIONAL\s+FEDERAL\s+DA\s+(\d{1,2})", re.IGNORECASE, name="ctx_trf_nome")
+TRE_ESTADO_RE = rx(r"TRIBUNAL\s+REGIONAL\s+ELEITORAL\s+(?:DO|DA|DE)\s+([A-ZÀ-Ú ]+)", re.IGNORECASE, name="ctx_tre_estado")
+TRE_RE = rx(r"TRIBUNAL\s+REGIONAL\s+ELEITORAL", re.IGNORECASE, name="ctx_tre")
+TSE_NOME_RE = rx(r"TRIBUNAL\s+SUPERIOR\s+ELEITORAL", re.IGNORECASE, name="ctx_tse")
+TST_NOME_RE = rx(r"TRIBUNAL\s+SUPERIOR\s+DO\s+TRABALHO", re.IGNORECASE, name="ctx_tst")
+ESTADO_PREFIX_RE = rx(r"Estado\s+(?:do|da|de)\s+", re.IGNORECASE, name="estado_prefix")
 
 def find_trt_context(text: str) -> str:
     # Heurística: tenta achar "TRT-xx" ou o nome por extenso
-    m = re.search(r"\bTRT[-\s]?(\d{1,2})\b", text, re.IGNORECASE)
+    m = TRT_SIGLA_RE.search(text)
     if m:
         return f"TRT{m.group(1)}"
         
-    m2 = re.search(r"TRIBUNAL\s+REGIONAL\s+DO\s+TRABALHO\s+DA\s+(\d{1,2})", text, re.IGNORECASE)
+    m2 = TRT_NOME_RE.search(text)
     if m2:
         return f"TRT{m2.group(1)}"
 
     # TRF Match
-    m3 = re.search(r"\bTRF[-\s]?(\d{1,2})\b", text, re.IGNORECASE)
+    m3 = TRF_SIGLA_RE.search(text)
     if m3:
         return f"TRF{m3.group(1)}"
 
-    m4 = re.search(r"TRIBUNAL\s+REGIONAL\s+FEDERAL\s+DA\s+(\d{1,2})", text, re.IGNORECASE)
+    m4 = TRF_NOME_RE.search(text)
     if m4:
         return f"TRF{m4.group(1)}"
 
     # TRE Match
-    m5 = re.search(r"TRIBUNAL\s+REGIONAL\s+ELEITORAL\s+(?:DO|DA|DE)\s+([A-ZÀ-Ú ]+)", text, re.IGNORECASE)
+    m5 = TRE_ESTADO_RE.search(text)
     if m5:
         state_name = m5.group(1).split("/")[0].strip()
-        state_name = re.sub(r"Estado\s+(?:do|da|de)\s+", "", state_name, flags=re.IGNORECASE)
+        state_name = ESTADO_PREFIX_RE.sub("", state_name)
         # Take up to 4 words for state name (catches "MATO GROSSO DO SUL")
         state_name = " ".join(state_name.split()[:4])
         return f"TRE {state_name}"
 
-    if re.search(r"TRIBUNAL\s+REGIONAL\s+ELEITORAL", text, re.IGNORECASE):
+    if TRE_RE.search(text):
         return "TRE"
 
     # TSE/TST
-    if re.search(r"TRIBUNAL\s+SUPERIOR\s+ELEITORAL", text, re.IGNORECASE):
+    if TSE_NOME_RE.search(text):
         return "TSE"
-    if re.search(r"TRIBUNAL\s+SUPERIOR\s+DO\s+TRABALHO", text, re.IGNORECASE):
+    if TST_NOME_RE.search(text):
         return "TST"
         
     return "DESCONHECIDO"
@@ -273,198 +353,235 @@ def split_blocks(text: str) -> List[str]:
         blocks.append(" ".join(cur))
     return blocks
 
+# tenta capturar o texto após "para o/a/em/no/na", mas ignora "em virtude/substituição/consonância/estágio/fins"
+# Negative lookahead para evitar pegar "em virtude", "em substituição", etc.
+DESTINO_RE = rx(r"\b(?:para|no|na|em)\b\s+(?!virtude|substitui|conson|estágio|fins|avalia)(.{10,120})", re.IGNORECASE, name="destino")
+# corta em separadores comuns
+DESTINO_CUT_RE = rx(r"[.;]|,?\s+lotad[oa]|,?\s+com\s+exerc", name="destino_cut")
+
 def extract_destino(block: str) -> str:
-    # tenta capturar o texto após "para o/a/em/no/na", mas ignora "em virtude/substituição/consonância/estágio/fins"
-    # Negative lookahead para evitar pegar "em virtude", "em substituição", etc.
-    pattern = r"\b(?:para|no|na|em)\b\s+(?!virtude|substitui|conson|estágio|fins|avalia)(.{10,120})"
-    m = re.search(pattern, block, flags=re.IGNORECASE)
+    m = DESTINO_RE.search(block)
     if not m:
         return ""
     dest = m.group(1)
-    # corta em separadores comuns
-    dest = re.split(r"[.;]|,?\s+lotad[oa]|,?\s+com\s+exerc", dest, maxsplit=1)[0]
+    dest = DESTINO_CUT_RE.split(dest, maxsplit=1)[0]
     return norm(dest)
 
-def detect_events(text: str, rules: Dict, date_yyyy_mm_dd: str, source_pdf: str) -> List[Event]:
-    blocks = split_blocks(text)
+def orgao_from_meta(raw_orgao: str) -> str:
+    """Organ label from the ORGAO metadata of a DOU record (e.g. trt7, tre-SÃO PAULO)."""
+    # TRT Match
+    m_trt_num = TRT_NOME_RE.search(raw_orgao)
+    # TRF Match
+    # Ex: "Tribunal Regional Federal da 1ª Região" ou "TRF1"
+    # Updated to handle "1ª", "5a", etc.
+    m_trf_num = TRF_NOME_RE.search(raw_orgao)
+
+    # TRE Match
+    # Ex: "Tribunal Regional Eleitoral de Mato Grosso"
+    m_tre = TRE_ESTADO_RE.search(raw_orgao)
+
+    # TSE
+    m_tse = TSE_NOME_RE.search(raw_orgao)
+
+    if m_trt_num:
+        return f"trt{m_trt_num.group(1)}"
+    elif m_trf_num:
+        return f"trf{m_trf_num.group(1)}"
+    elif m_tre:
+        state_name = m_tre.group(1).split("/")[0].strip()
+        # Remove "Estado do"
+        state_name = ESTADO_PREFIX_RE.sub("", state_name)
+        # Take up to 4 words for state name
+        state_name = " ".join(state_name.split()[:4])
+        return f"tre-{state_name}"
+    elif m_tse:
+        return "tse"
+    else:
+        # Remove prefixes
+        cleaned = raw_orgao.replace("Poder Judiciário/", "").split("/")[0].strip()
+        return cleaned
+
+# Regex para capturar cabeçalhos de TRT (ex: "Tribunal Regional do Trabalho da 23ª Região")
+HEADER_REGEX = r"TRIBUNAL\s+REGIONAL\s+DO\s+TRABALHO\s+DA\s+(\d{1,2})\b"
+
+# Regex para capturar metadado ORGAO inserido pelo ingest_dou.py
+# Como split_blocks remove quebras de linha, procuramos ORGAO em qualquer lugar do bloco
+ORGAO_META_REGEX = r"ORGAO:\s*(.*?)(?:\s+URL:|\s+---|$)"
+
+HEADER_RE = rx(HEADER_REGEX, re.IGNORECASE, name="header")
+ORGAO_META_RE = rx(ORGAO_META_REGEX, re.IGNORECASE, name="orgao_meta")
+
+def block_contexts(text: str, blocks: List[str]):
+    """
+    Sequential context pass: the organ in effect at each block (carried
+    forward from ORGAO metadata / TRT headers) and the normalized blocks.
+    Cheap compared to detection, and the only part that depends on the
+    blocks before it, so detect_blocks can run on any slice of its output.
+    """
     # Valor inicial (fallback)
     orgao_val = find_trt_context(text)
-    mes = date_yyyy_mm_dd[:7]
-
-    out: List[Event] = []
-    
-    # Regex para capturar cabeçalhos de TRT (ex: "Tribunal Regional do Trabalho da 23ª Região")
-    header_regex = r"TRIBUNAL\s+REGIONAL\s+DO\s+TRABALHO\s+DA\s+(\d{1,2})\b"
-    
-    # Regex para capturar metadado ORGAO inserido pelo ingest_dou.py
-    # Como split_blocks remove quebras de linha, procuramos ORGAO em qualquer lugar do bloco
-    orgao_meta_regex = r"ORGAO:\s*(.*?)(?:\s+URL:|\s+---|$)"
+    bnorms, contexts = [], []
 
     for b in blocks:
         bnorm = norm(b)
-        
+
         # 0) Contexto: Tenta pegar do metadado ORGAO primeiro (mais confiável para DOU)
-        m_orgao = re.search(orgao_meta_regex, b, re.IGNORECASE)
+        m_orgao = ORGAO_META_RE.search(b)
         if m_orgao:
-            raw_orgao = m_orgao.group(1).strip()
-            
-            # TRT Match
-            m_trt_num = re.search(r"TRIBUNAL\s+REGIONAL\s+DO\s+TRABALHO\s+DA\s+(\d{1,2})", raw_orgao, re.IGNORECASE)
-            # TRF Match
-            # Ex: "Tribunal Regional Federal da 1ª Região" ou "TRF1"
-            # Updated to handle "1ª", "5a", etc.
-            m_trf_num = re.search(r"TRIBUNAL\s+REGIONAL\s+FEDERAL\s+DA\s+(\d{1,2})", raw_orgao, re.IGNORECASE)
-            
-            # TRE Match
-            # Ex: "Tribunal Regional Eleitoral de Mato Grosso"
-            m_tre = re.search(r"TRIBUNAL\s+REGIONAL\s+ELEITORAL\s+(?:DO|DA|DE)\s+([A-ZÀ-Ú ]+)", raw_orgao, re.IGNORECASE)
-            
-            # TSE
-            m_tse = re.search(r"Tribunal\s+Superior\s+Eleitoral", raw_orgao, re.IGNORECASE)
-
-            if m_trt_num:
-                orgao_val = f"trt{m_trt_num.group(1)}"
-            elif m_trf_num:
-                orgao_val = f"trf{m_trf_num.group(1)}"
-            elif m_tre:
-                state_name = m_tre.group(1).split("/")[0].strip()
-                # Remove "Estado do"
-                state_name = re.sub(r"Estado\s+(?:do|da|de)\s+", "", state_name, flags=re.IGNORECASE)
-                # Take up to 4 words for state name
-                state_name = " ".join(state_name.split()[:4])
-                orgao_val = f"tre-{state_name}"
-            elif m_tse:
-                orgao_val = "tse"
-            else:
-                # Remove prefixes
-                cleaned = raw_orgao.replace("Poder Judiciário/", "").split("/")[0].strip()
-                orgao_val = cleaned
-        
+            orgao_val = orgao_from_meta(m_orgao.group(1).strip())
+
         # Se não achou no metadado, tenta procurar no texto (cabeçalho padrão de PDF)
         # Note: cabeçalhos de TRF/TRE podem variar, vamos focar no metadado pois vem do DOU estruturado
-        m_head = re.search(header_regex, bnorm, re.IGNORECASE)
+        m_head = HEADER_RE.search(bnorm)
         if m_head and orgao_val == "DESCONHECIDO": # Só sobrescreve se ainda for o default genérico
             orgao_val = f"trt{m_head.group(1)}"
-        
-        # 1) filtros de exclusão (Retificação)
-        if contains_any(bnorm, rules.get("skip_patterns", [])):
-            continue
-            
-        # 2) Identificar se é ENTRADA (Ingresso) vs SAÍDA (Evasão)
-        is_ingresso = contains_any(bnorm, rules.get("entry_patterns", []))
-        is_saida = contains_any(bnorm, rules["exit_patterns"])
-        
-        if not is_saida and not is_ingresso:
-            continue
-            
-        # 4) Extrair nome da pessoa (O SUJEITO)
-        nome_pessoa = extract_nome(bnorm) or "Não identificado"
-
-        # 4.1) Extrair cargo (ROLE)
-        cargo = extract_role(bnorm)
-
-        if not contains_any(bnorm, rules["ti_keywords"]):
-            continue
-
-        # FILTRO DE CARGO: Apenas servidores de TI
-        # Se o cargo identificado contiver explicitamente áreas administrativas ou outras sem TI, ignoramos.
-        ti_keywords = rules.get("ti_keywords", [])
-        is_ti_role = contains_any(cargo, ti_keywords)
-
-        # Se o cargo não é identificado ou não contém keywords de TI,
-        # mas o bloco contém TI keywords, pode ser que o cargo esteja mal extraído.
-        # No entanto, se o cargo for explicitamente ADMINISTRATIVO, devemos ignorar.
-        non_ti_patterns = ["ADMINISTRATIVA", "JUDICIÁRIA", "MÉDICO", "ENFERMEIRO", "OFICIAL DE JUSTIÇA", "ODONTÓLOGO", "PSICÓLOGO", "SOCIAL"]
-        if any(p in cargo.upper() for p in non_ti_patterns) and not is_ti_role:
-            continue
-
-        # Se não conseguimos identificar o cargo mas o bloco tem TI keywords,
-        # damos o benefício da dúvida apenas se não houver outros cargos fortes citados.
-        if cargo == "Não identificado":
-            if any(p in bnorm.upper() for p in non_ti_patterns):
-                # Se tem administrativ/judiciari no bloco e não identificamos cargo de TI, melhor ignorar
-                if not is_ti_role:
-                    continue
 
-        # 5) destino + classificação
-        destino = extract_destino(bnorm)
-        data_efetiva = extract_event_date(bnorm) or date_yyyy_mm_dd
-
-        # Categorização de motivos
-        # PRIORIDADE: se é ingresso (Nomeação), marcamos como tal primeiro.
-        # Se também tiver exit_patterns (ex: "Nomear... vago por aposentadoria de X"),
-        # o ingresso vence para o TI principal.
-        if is_ingresso:
-            tipo = "ingresso"
-            confidence = "confirmada_ingresso"
-        elif is_saida:
-            tipo = "evasão"
-            confidence = "confirmada_saida"
-            
-            # Checar motivos específicos APENAS se o nome for o sujeito
-            # Heurística: "aposentadoria de [NOME]" ou similar
-            # Vamos ver se "aposentadoria" e "X" estão próximos
-            has_aposentar = "aposentadoria" in bnorm or "aposentar" in bnorm
-            has_falecer = "falecimento" in bnorm or "falecer" in bnorm
-            
-            if has_aposentar:
-                # Checa se o termo aposentadoria está perto do nome extraído
-                # (evita pegar aposentadoria de terceiros citada no texto)
-                aposent_regex = rf"(?:aposentadoria|aposentar).{{0,50}}\b{re.escape(nome_pessoa)}\b"
-                if re.search(aposent_regex, bnorm, re.IGNORECASE):
-                    destino = "Aposentadoria"
-                    confidence = "confirmada_aposentar"
-                elif "conceder aposentadoria" in bnorm.lower():
-                    # Caso genérico de portaria de concessão
-                    destino = "Aposentadoria"
-                    confidence = "confirmada_aposentar"
-            
-            if has_falecer and confidence != "confirmada_aposentar":
-                falecer_regex = rf"(?:falecimento|falecer).{{0,50}}\b{re.escape(nome_pessoa)}\b"
-                if re.search(falecer_regex, bnorm, re.IGNORECASE):
-                    destino = "Falecimento"
-                    confidence = "confirmada_falecer"
-
-            # Se não foi aposentadoria/falecimento, checa vacância por posse
-            if confidence == "confirmada_saida":
-                vocab_regex = r"posse\s+em\s+(?:outro\s+)?cargo\s+(?:público\s+)?inacumul"
-                is_vacancia = bool(re.search(vocab_regex, bnorm, re.IGNORECASE))
-
-                if is_vacancia:
-                    if destino and contains_any(destino, rules["judiciario_keywords"]):
-                        continue
-                    if destino and not contains_any(destino, rules["fora_judiciario_keywords"]):
-                        destino = "Outro Órgão (Cargo Inacumulável)"
-                    if not destino:
-                        destino = "Não informado (Cargo Inacumulável)"
-                    confidence = "confirmada_vacancia"
-                elif destino:
-                    if contains_any(destino, rules["judiciario_keywords"]):
-                        continue
-                    if not contains_any(destino, rules["fora_judiciario_keywords"]):
-                        continue
-                    confidence = "confirmada_destino"
-                else:
-                    # Se não achou motivo nem destino validado, ignoramos para o dashboard
-                    continue
-        else:
-            continue
-
-        out.append(Event(
-            orgao=orgao_val,
-            destino=destino or "Desconhecido",
-            date=data_efetiva,
-            mes=data_efetiva[:7],
-            confidence=confidence,
-            source_pdf=source_pdf,
-            nome=nome_pessoa,
-            role=cargo,
-            ref_date=extract_cited_date(bnorm, nome_pessoa) or "",
-            tipo=tipo
-        ))
+        bnorms.append(bnorm)
+        contexts.append(orgao_val)
+
+    return bnorms, contexts
 
+VACANCIA_RE = rx(r"posse\s+em\s+(?:outro\s+)?cargo\s+(?:público\s+)?inacumul", re.IGNORECASE, name="vacancia")
+
+def detect_block(bnorm: str, orgao_val: str, rules: Dict, date_yyyy_mm_dd: str, source_pdf: str,
+                 use_ner: bool = True) -> Optional[Event]:
+    """
+    Detects the event in one normalized block, given the organ context for it.
+    With use_ner=False, names come from the regexes only (no SpaCy fallback).
+    """
+    # 1) filtros de exclusão (Retificação)
+    if contains_any(bnorm, rules.get("skip_patterns", [])):
+        return None
+
+    # 2) Identificar se é ENTRADA (Ingresso) vs SAÍDA (Evasão)
+    is_ingresso = contains_any(bnorm, rules.get("entry_patterns", []))
+    is_saida = contains_any(bnorm, rules["exit_patterns"])
+
+    if not is_saida and not is_ingresso:
+        return None
+
+    # 4) Extrair nome da pessoa (O SUJEITO)
+    nome_pessoa = extract_nome(bnorm, use_ner) or "Não identificado"
+
+    # 4.1) Extrair cargo (ROLE)
+    cargo = extract_role(bnorm)
+
+    if not contains_any(bnorm, rules["ti_keywords"]):
+        return None
+
+    # FILTRO DE CARGO: Apenas servidores de TI
+    # Se o cargo identificado contiver explicitamente áreas administrativas ou outras sem TI, ignoramos.
+    ti_keywords = rules.get("ti_keywords", [])
+    is_ti_role = contains_any(cargo, ti_keywords)
+
+    # Se o cargo não é identificado ou não contém keywords de TI,
+    # mas o bloco contém TI keywords, pode ser que o cargo esteja mal extraído.
+    # No entanto, se o cargo for explicitamente ADMINISTRATIVO, devemos ignorar.
+    non_ti_patterns = ["ADMINISTRATIVA", "JUDICIÁRIA", "MÉDICO", "ENFERMEIRO", "OFICIAL DE JUSTIÇA", "ODONTÓLOGO", "PSICÓLOGO", "SOCIAL"]
+    if any(p in cargo.upper() for p in non_ti_patterns) and not is_ti_role:
+        return None
+
+    # Se não conseguimos identificar o cargo mas o bloco tem TI keywords,
+    # damos o benefício da dúvida apenas se não houver outros cargos fortes citados.
+    if cargo == "Não identificado":
+        if any(p in bnorm.upper() for p in non_ti_patterns):
+            # Se tem administrativ/judiciari no bloco e não identificamos cargo de TI, melhor ignorar
+            if not is_ti_role:
+                return None
+
+    # 5) destino + classificação
+    destino = extract_destino(bnorm)
+    data_efetiva = extract_event_date(bnorm) or date_yyyy_mm_dd
+
+    # Categorização de motivos
+    # PRIORIDADE: se é ingresso (Nomeação), marcamos como tal primeiro.
+    # Se também tiver exit_patterns (ex: "Nomear... vago por aposentadoria de X"),
+    # o ingresso vence para o TI principal.
+    if is_ingresso:
+        tipo = "ingresso"
+        confidence = "confirmada_ingresso"
+    elif is_saida:
+        tipo = "evasão"
+        confidence = "confirmada_saida"
+
+        # Checar motivos específicos APENAS se o nome for o sujeito
+        # Heurística: "aposentadoria de [NOME]" ou similar
+        # Vamos ver se "aposentadoria" e "X" estão próximos
+        has_aposentar = "aposentadoria" in bnorm or "aposentar" in bnorm
+        has_falecer = "falecimento" in bnorm or "falecer" in bnorm
+
+        if has_aposentar:
+            # Checa se o termo aposentadoria está perto do nome extraído
+            # (evita pegar aposentadoria de terceiros citada no texto)
+            aposent_regex = rf"(?:aposentadoria|aposentar).{{0,50}}\b{re.escape(nome_pessoa)}\b"
+            if rx(aposent_regex, re.IGNORECASE).search(bnorm):
+                destino = "Aposentadoria"
+                confidence = "confirmada_aposentar"
+            elif "conceder aposentadoria" in bnorm.lower():
+                # Caso genérico de portaria de concessão
+                destino = "Aposentadoria"
+                confidence = "confirmada_aposentar"
+
+        if has_falecer and confidence != "confirmada_aposentar":
+            falecer_regex = rf"(?:falecimento|falecer).{{0,50}}\b{re.escape(nome_pessoa)}\b"
+            if rx(falecer_regex, re.IGNORECASE).search(bnorm):
+                destino = "Falecimento"
+                confidence = "confirmada_falecer"
+
+        # Se não foi aposentadoria/falecimento, checa vacância por posse
+        if confidence == "confirmada_saida":
+            is_vacancia = bool(VACANCIA_RE.search(bnorm))
+
+            if is_vacancia:
+                if destino and contains_any(destino, rules["judiciario_keywords"]):
+                    return None
+                if destino and not contains_any(destino, rules["fora_judiciario_keywords"]):
+                    destino = "Outro Órgão (Cargo Inacumulável)"
+                if not destino:
+                    destino = "Não informado (Cargo Inacumulável)"
+                confidence = "confirmada_vacancia"
+            elif destino:
+                if contains_any(destino, rules["judiciario_keywords"]):
+                    return None
+                if not contains_any(destino, rules["fora_judiciario_keywords"]):
+                    return None
+                confidence = "confirmada_destino"
+            else:
+                # Se não achou motivo nem destino validado, ignoramos para o dashboard
+                return None
+    else:
+        return None
+
+    return Event(
+        orgao=orgao_val,
+        destino=destino or "Desconhecido",
+        date=data_efetiva,
+        mes=data_efetiva[:7],
+        confidence=confidence,
+        source_pdf=source_pdf,
+        nome=nome_pessoa,
+        role=cargo,
+        ref_date=extract_cited_date(bnorm, nome_pessoa) or "",
+        tipo=tipo
+    )
+
+def detect_blocks(bnorms: List[str], contexts: List[str], rules: Dict,
+                  date_yyyy_mm_dd: str, source_pdf: str) -> List[Event]:
+    out: List[Event] = []
+    for bnorm, orgao_val in zip(bnorms, contexts):
+        event = detect_block(bnorm, orgao_val, rules, date_yyyy_mm_dd, source_pdf)
+        if event is not None:
+            out.append(event)
     return out
 
+def detect_events(text: str, rules: Dict, date_yyyy_mm_dd: str, source_pdf: str) -> List[Event]:
+    bnorms, contexts = block_contexts(text, split_blocks(text))
+    return detect_blocks(bnorms, contexts, rules, date_yyyy_mm_dd, source_pdf)
+
+CITED_DATE_RE = rx(r"publicada?\s+em\s+(\d{1,2}/\d{1,2}/(?:\d{2,4}))", re.IGNORECASE, name="cited_date")
+# Regex flexível para o formato de data por extenso
+CITED_DATE_EXTENSO_RE = rx(r"publicada?\s+em\s+(\d{1,2})\s+de\s+(janeiro|fevereiro|março|marco|abril|maio|junho|julho|agosto|setembro|outubro|novembro|dezembro)\s+de\s+(\d{4})", re.IGNORECASE, name="cited_date_extenso")
+
 def extract_cited_date(block: str, name: str) -> str:
     """
     Looks for strings like 'publicada em 30 de setembro de 2021' following the name.
@@ -483,10 +600,10 @@ def extract_cited_date(block: str, name: str) -> str:
     # Pattern: publicada em DD de MONTH de YYYY
     # Or: publicada em DD/MM/YYYY
     # Regex flexível para o formato de data por extenso
-    m = re.search(r"publicada?\s+em\s+(\d{1,2}/\d{1,2}/(?:\d{2,4}))", window, re.IGNORECASE)
+    m = CITED_DATE_RE.search(window)
     if not m:
         # Tenta formato por extenso: 30 de setembro de 2021
-        m = re.search(r"publicada?\s+em\s+(\d{1,2})\s+de\s+(janeiro|fevereiro|março|marco|abril|maio|junho|julho|agosto|setembro|outubro|novembro|dezembro)\s+de\s+(\d{4})", window, re.IGNORECASE)
+        m = CITED_DATE_EXTENSO_RE.search(window)
         if m:
             day = m.group(1).zfill(2)
             month_name = m.group(2).lower()
@@ -0,0 +1,173 @@
+"""
+Run-to-run event diff: the events added, removed and changed between two
+event sets, with field-level differences and a summary per organ.
+
+Both sets are sorted by a stable key (normalized name, date, organ label)
+and walked together in one merge-join pass. Events sharing a key are
+paired by identical content first, then in order, so a key that holds
+several acts (e.g. the same act in two publications) still diffs
+cleanly.
+
+Accepts event lists (eventos_judiciario.json, audited or detected schema)
+and event store files (eventos_detectados.json). run.py keeps the store
+as it was when the aggregates were last published in
+eventos_detectados.anterior.json (and `run.py --max-changes N` checks
+this same diff before publishing), so:
+
+    python diff_events.py                       # publicado x atual
+    python diff_events.py antigo.json novo.json --out diff.json
+    python diff_events.py --max-changes 0       # gate: sai com 1 se algo mudou
+"""
+import argparse
+import functools
+import os
+import sys
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from build_aggregates import normalize_orgao, read_json, write_json
+from careers import normalize_name
+
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+CURRENT_PATH = os.path.join(PIPELINE_DIR, "eventos_detectados.json")
+PREVIOUS_PATH = os.path.join(PIPELINE_DIR, "eventos_detectados.anterior.json")
+# Campos derivados de outros (não contam como mudança)
+IGNORED_FIELDS = {"mes"}
+
+Key = Tuple[str, str, str]
+
+def load_event_set(path: str) -> List[Dict]:
+    """Events of a JSON list or of an event store file."""
+    data = read_json(path)
+    if data is None:
+        raise SystemExit(f"❌ Arquivo não encontrado: {path}")
+    return data.get("events", []) if isinstance(data, dict) else data
+
+@functools.lru_cache(maxsize=None)
+def _orgao_label(orgao: Optional[str]) -> str:
+    # Poucos órgãos distintos: o rótulo é calculado uma vez por grafia
+    return normalize_orgao(orgao or "desconhecido")
+
+def event_key(e: Dict) -> Key:
+    name = e.get("name") if "name" in e else e.get("nome", "")
+    return (normalize_name(name), e.get("date") or "", _orgao_label(e.get("orgao")))
+
+def field_diff(old: Dict, new: Dict) -> Dict[str, list]:
+    if old == new:
+        return {}
+    return {k: [old.get(k), new.get(k)] for k in sorted(set(old) | set(new))
+            if k not in IGNORED_FIELDS and old.get(k) != new.get(k)}
+
+def _groups(events: List[Tuple[Key, Dict]]) -> Iterator[Tuple[Key, List[Dict]]]:
+    """Consecutive runs of equal keys in a key-sorted list."""
+    i, n = 0, len(events)
+    while i < n:
+        key = events[i][0]
+        j = i + 1
+        while j < n and events[j][0] == key:
+            j += 1
+        yield key, [e for _, e in events[i:j]]
+        i = j
+
+def _pair(key: Key, old: List[Dict], new: List[Dict], out: Dict):
+    """Diffs the events of one key: identical events first, then the rest in order."""
+    new_left = list(new)
+    old_left = []
+    # Grupos pequenos (quase sempre 1 x 1): a busca quadrática é mais barata que serializar
+    for e in old:
+        for i, candidate in enumerate(new_left):
+            if not field_diff(e, candidate):
+                del new_left[i]
+                out["inalterados"] += 1
+                break
+        else:
+            old_left.append(e)
+    for before, after in zip(old_left, new_left):
+        out["alterados"].append({"chave": list(key), "campos": field_diff(before, after), "antes": before, "depois": after})
+    out["removidos"].extend(old_left[len(new_left):])
+    out["adicionados"].extend(new_left[len(old_left):])
+
+def diff_events(old_events: List[Dict], new_events: List[Dict]) -> Dict:
+    """
+    {"adicionados", "removidos", "alterados", "inalterados", "por_orgao"}
+    between two event sets: a sort by key plus one merge-join pass.
+    """
+    def keyed(events):
+        # Ordenação estável: eventos de mesma chave mantêm a ordem do arquivo
+        return sorted(((event_key(e), e) for e in events), key=lambda t: t[0])
+
+    out = {"adicionados": [], "removidos": [], "alterados": [], "inalterados": 0}
+    old_groups, new_groups = _groups(keyed(old_events)), _groups(keyed(new_events))
+    old_g, new_g = next(old_groups, None), next(new_groups, None)
+    while old_g is not None or new_g is not None:
+        if new_g is None or (old_g is not None and old_g[0] < new_g[0]):
+            _pair(old_g[0], old_g[1], [], out)
+            old_g = next(old_groups, None)
+        elif old_g is None or new_g[0] < old_g[0]:
+            _pair(new_g[0], [], new_g[1], out)
+            new_g = next(new_groups, None)
+        else:
+            _pair(old_g[0], old_g[1], new_g[1], out)
+            old_g, new_g = next(old_groups, None), next(new_groups, None)
+
+    por_orgao = defaultdict(lambda: {"adicionados": 0, "removidos": 0, "alterados": 0})
+    for kind in ("adicionados", "removidos"):
+        for e in out[kind]:
+            por_orgao[event_key(e)[2]][kind] += 1
+    for change in out["alterados"]:
+        por_orgao[change["chave"][2]]["alterados"] += 1
+    out["por_orgao"] = dict(sorted(por_orgao.items()))
+    return out
+
+def total_changes(diff: Dict) -> int:
+    return len(diff["adicionados"]) + len(diff["removidos"]) + len(diff["alterados"])
+
+def _label(e: Dict) -> str:
+    name = e.get("name") if "name" in e else e.get("nome", "")
+    return f"{e.get('date', '')} {_orgao_label(e.get('orgao')):<8} {name}"
+
+def print_diff(diff: Dict, limit: int):
+    print(f"📊 +{len(diff['adicionados'])} adicionados, -{len(diff['removidos'])} removidos, "
+          f"~{len(diff['alterados'])} alterados, {diff['inalterados']} inalterados")
+    if diff["por_orgao"]:
+        print("\n   órgão        +      -      ~")
+        for orgao, c in sorted(diff["por_orgao"].items(), key=lambda kv: (-sum(kv[1].values()), kv[0])):
+            print(f"   {orgao:<10} {c['adicionados']:>5}  {c['removidos']:>5}  {c['alterados']:>5}")
+    for kind, mark in (("adicionados", "+"), ("removidos", "-")):
+        items = diff[kind]
+        if items:
+            print(f"\n{kind.capitalize()}:")
+            for e in items[:limit]:
+                print(f"   {mark} {_label(e)}")
+            if len(items) > limit:
+                print(f"   ... e mais {len(items) - limit}")
+    if diff["alterados"]:
+        print("\nAlterados:")
+        for change in diff["alterados"][:limit]:
+            campos = "; ".join(f"{k}: {a!r} -> {b!r}" for k, (a, b) in change["campos"].items())
+            print(f"   ~ {_label(change['depois'])}: {campos}")
+        if len(diff["alterados"]) > limit:
+            print(f"   ... e mais {len(diff['alterados']) - limit}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Diferença de eventos entre duas execuções (adicionados/removidos/alterados)")
+    parser.add_argument("anterior", nargs="?", default=PREVIOUS_PATH, help="Eventos da última publicação")
+    parser.add_argument("atual", nargs="?", default=CURRENT_PATH, help="Eventos da execução atual")
+    parser.add_argument("--out", help="Grava o diff completo (JSON) neste caminho")
+    parser.add_argument("--limit", type=int, default=20, help="Exemplos mostrados por tipo de mudança")
+    parser.add_argument("--max-changes", type=int,
+                        help="Gate de publicação: sai com 1 se houver mais mudanças que isso (0 = qualquer mudança)")
+    args = parser.parse_args(argv)
+
+    diff = diff_events(load_event_set(args.anterior), load_event_set(args.atual))
+    print_diff(diff, args.limit)
+    if args.out:
+        write_json(args.out, diff)
+        print(f"\n💾 Diff completo em {args.out}")
+    if args.max_changes is not None and total_changes(diff) > args.max_changes:
+        print(f"\n❌ {total_changes(diff)} mudanças (limite: {args.max_changes})")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
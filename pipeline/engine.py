@@ -0,0 +1,332 @@
+"""
+Detection engine: runs detect_events over a stream of Records, optionally
+in a pool of worker processes. Input is consumed lazily with a bounded
+number of records in flight, and results come back in input order.
+
+Large documents (e.g. 500-page DEJT compilations) are split inside the
+pool: the parent runs the cheap sequential context pass (block_contexts)
+and the blocks are then detected in parallel chunks, which yields the
+same events as the sequential path.
+
+Each task runs under a time budget: a worker that overruns it (huge OCR
+text, regex blowup, SpaCy stall) is killed and replaced, and its record is
+set aside. Set-aside records are retried at the end in a slow lane with a
+relaxed budget; the ones that still fail are reported as quarantined.
+
+With on_candidates, the workers also collect the audit candidates
+(export_candidates.block_candidates) in the same pass over the blocks,
+under the same budget.
+"""
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from detect_events import Event, block_contexts, detect_blocks, detect_events, split_blocks
+from sources import Record
+
+# Documentos com mais blocos que isso são divididos em pedaços de BLOCKS_PER_CHUNK
+BLOCKS_PER_CHUNK = 64
+SPLIT_THRESHOLD = BLOCKS_PER_CHUNK * 2
+
+# Orçamento por tarefa (registro ou pedaço de documento) e o da faixa lenta
+RECORD_TIMEOUT_S = 120
+SLOW_LANE_FACTOR = 10
+
+_worker_rules = None
+# Blocos vizinhos incluídos no contexto dos candidatos (None = sem candidatos)
+_worker_context = None
+
+def _init_worker(rules: Dict, context: Optional[int] = None):
+    global _worker_rules, _worker_context
+    _worker_rules, _worker_context = rules, context
+
+def _detect_record(record: Record) -> Tuple[List[Event], List[Dict]]:
+    if _worker_context is None:
+        return detect_events(record.text, _worker_rules, record.date, source_pdf=record.source_id), []
+    bnorms, contexts = block_contexts(record.text, split_blocks(record.text))
+    return _detect_chunk(bnorms, contexts, record.date, record.source_id)
+
+def _detect_chunk(bnorms: List[str], contexts: List[str], date: str, source_id: str,
+                  first: int = 0, last: Optional[int] = None, offset: int = 0) -> Tuple[List[Event], List[Dict]]:
+    """(events, candidates) of blocks first..last; the blocks around them are only candidate context."""
+    if _worker_context is None:
+        return detect_blocks(bnorms[first:last], contexts[first:last], _worker_rules, date, source_id), []
+    from export_candidates import block_candidates
+    return block_candidates(bnorms, contexts, _worker_rules, date, source_id, first, last, offset, _worker_context)
+
+class TaskFailed(Exception):
+    """A task that timed out, crashed its worker or raised."""
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason   # "timeout" | "crash" | "erro"
+        self.detail = detail
+
+def _worker_main(conn, rules: Dict, context: Optional[int] = None):
+    _init_worker(rules, context)
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg is None:
+            return
+        fn, args = msg
+        try:
+            conn.send((True, fn(*args)))
+        except Exception as e:
+            conn.send((False, repr(e)))
+
+class _Task:
+    __slots__ = ("pool", "fn", "args", "done", "value", "error")
+
+    def __init__(self, pool, fn, args):
+        self.pool, self.fn, self.args = pool, fn, args
+        self.done, self.value, self.error = False, None, None
+
+    def result(self):
+        """Blocks until the task finishes; raises TaskFailed if it didn't."""
+        self.pool.wait(self)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def cancel(self):
+        self.pool.cancel(self)
+
+class _Worker:
+    __slots__ = ("proc", "conn", "task", "started")
+
+    def __init__(self, proc, conn):
+        self.proc, self.conn = proc, conn
+        self.task, self.started = None, 0.0
+
+class SupervisedPool:
+    """
+    Worker processes that run one task at a time, each under a time budget.
+    A worker that overruns it, or dies, is killed and replaced; its task
+    fails with TaskFailed. Same submit()/result() shape as an executor.
+    With `context` (neighbor blocks), the workers also collect audit candidates.
+    """
+    def __init__(self, workers: int, rules: Dict, timeout: Optional[float] = None,
+                 context: Optional[int] = None):
+        import multiprocessing
+
+        self.ctx = multiprocessing.get_context()
+        self.rules = rules
+        self.context = context
+        self.timeout = timeout or None
+        self.queue = deque()
+        self.workers = [self._spawn() for _ in range(max(1, workers))]
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self.ctx.Pipe()
+        proc = self.ctx.Process(target=_worker_main, args=(child_conn, self.rules, self.context), daemon=True)
+        proc.start()
+        child_conn.close()
+        return _Worker(proc, parent_conn)
+
+    def submit(self, fn: Callable, *args) -> _Task:
+        task = _Task(self, fn, args)
+        self.queue.append(task)
+        self._dispatch()
+        return task
+
+    def cancel(self, task: _Task):
+        if not task.done and task in self.queue:
+            self.queue.remove(task)
+            self._finish(task, error=TaskFailed("cancelado"))
+
+    def wait(self, task: _Task):
+        while not task.done:
+            self._poll()
+
+    def _finish(self, task: _Task, value=None, error: Optional[TaskFailed] = None):
+        task.done, task.value, task.error = True, value, error
+
+    def _dispatch(self):
+        for w in self.workers:
+            if w.task is None and self.queue:
+                task = self.queue.popleft()
+                w.task, w.started = task, time.monotonic()
+                try:
+                    w.conn.send((task.fn, task.args))
+                except (BrokenPipeError, OSError):
+                    self._replace(w, TaskFailed("crash", "worker indisponível"))
+
+    def _replace(self, w: _Worker, error: TaskFailed):
+        """Kills a worker, fails its task and starts a fresh worker in its place."""
+        task = w.task
+        w.proc.kill()
+        w.proc.join()
+        w.conn.close()
+        self.workers[self.workers.index(w)] = self._spawn()
+        if task is not None:
+            self._finish(task, error=error)
+
+    def _poll(self):
+        """Waits for the next result, worker death or deadline, then refills idle workers."""
+        from multiprocessing.connection import wait
+
+        busy = [w for w in self.workers if w.task is not None]
+        if not busy:
+            self._dispatch()
+            return
+        wait_s = None
+        if self.timeout:
+            wait_s = max(0.0, min(w.started for w in busy) + self.timeout - time.monotonic())
+        ready = wait([w.conn for w in busy], wait_s)
+        now = time.monotonic()
+        for w in busy:
+            if w.conn in ready:
+                try:
+                    ok, value = w.conn.recv()
+                except (EOFError, OSError):
+                    w.proc.join(timeout=1)
+                    self._replace(w, TaskFailed("crash", f"worker terminou (exit {w.proc.exitcode})"))
+                    continue
+                task, w.task = w.task, None
+                if ok:
+                    self._finish(task, value)
+                else:
+                    self._finish(task, error=TaskFailed("erro", value))
+            elif self.timeout and now - w.started >= self.timeout:
+                self._replace(w, TaskFailed("timeout", f"mais de {self.timeout:g}s"))
+        self._dispatch()
+
+    def close(self):
+        for w in self.workers:
+            try:
+                w.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for w in self.workers:
+            w.proc.join(timeout=5)
+            if w.proc.is_alive():
+                w.proc.kill()
+                w.proc.join()
+            w.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def submit_record(pool, record: Record, blocks_per_chunk: int = None) -> list:
+    """Submits a record as one task, or as several block chunks if it is large."""
+    blocks_per_chunk = blocks_per_chunk or BLOCKS_PER_CHUNK
+    blocks = split_blocks(record.text)
+    if len(blocks) < max(SPLIT_THRESHOLD, blocks_per_chunk * 2):
+        return [pool.submit(_detect_record, record)]
+
+    bnorms, contexts = block_contexts(record.text, blocks)
+    # Com candidatos, cada pedaço leva também os blocos vizinhos (só como contexto)
+    k = pool.context or 0
+    tasks = []
+    for i in range(0, len(bnorms), blocks_per_chunk):
+        lo, hi = max(0, i - k), i + blocks_per_chunk + k
+        last = min(len(bnorms), i + blocks_per_chunk)
+        tasks.append(pool.submit(_detect_chunk, bnorms[lo:hi], contexts[lo:hi], record.date, record.source_id,
+                                 i - lo, last - lo, lo))
+    return tasks
+
+def _run_pool(pool: SupervisedPool, records: Iterable[Record], max_in_flight: int, governor=None):
+    """
+    Yields (record, (events, candidates) or TaskFailed) in input order. With a governor
+    (memory.MemoryGovernor), tasks in flight and chunk sizes follow its
+    current sizes instead of the fixed ones.
+    """
+    def collect(entry):
+        record, futures = entry
+        events, candidates = [], []
+        for i, fut in enumerate(futures):
+            try:
+                chunk_events, chunk_candidates = fut.result()
+            except TaskFailed as e:
+                # Um pedaço falhou: o registro inteiro vai para a quarentena
+                for other in futures[i + 1:]:
+                    other.cancel()
+                return record, e
+            events.extend(chunk_events)
+            candidates.extend(chunk_candidates)
+        return record, (events, candidates)
+
+    pending = deque()
+    in_flight = 0
+    for record in records:
+        if governor is not None:
+            governor.adjust()
+            max_in_flight = governor.in_flight.value
+        futures = submit_record(pool, record, governor.chunk.value if governor is not None else None)
+        pending.append((record, futures))
+        in_flight += len(futures)
+        while pending and in_flight >= max_in_flight:
+            entry = pending.popleft()
+            in_flight -= len(entry[1])
+            yield collect(entry)
+    while pending:
+        yield collect(pending.popleft())
+
+def detect_records(records: Iterable[Record], rules: Dict, workers: int = 1,
+                   max_in_flight: int = None, timeout: Optional[float] = RECORD_TIMEOUT_S,
+                   slow_timeout: Optional[float] = None,
+                   on_quarantine: Callable[[Record, TaskFailed, str], None] = None,
+                   on_retry: Callable[[Record, TaskFailed], None] = None,
+                   on_slow_lane: Callable[[int, Optional[float]], None] = None,
+                   governor=None, on_candidates: Callable[[Record, List[Dict]], None] = None,
+                   candidate_context: int = 1) -> Iterator[Tuple[Record, List[Event]]]:
+    """
+    Yields (record, events) for each record, in input order; records that
+    time out or crash are retried after the main pass with slow_timeout
+    (default timeout * SLOW_LANE_FACTOR). Records that fail for good are
+    passed to on_quarantine(record, error, lane) instead of being yielded.
+    Records set aside go to on_retry(record, error), and the slow lane
+    starts with on_slow_lane(count, slow_timeout).
+    With on_candidates, each yielded record's audit candidates (with
+    candidate_context neighbor blocks) are passed to
+    on_candidates(record, candidates) first.
+    With workers <= 1 and no timeout (and no memory governor), detection
+    runs in this process.
+    """
+    context = candidate_context if on_candidates is not None else None
+    if workers <= 1 and not timeout and governor is None:
+        _init_worker(rules, context)
+        for record in records:
+            events, candidates = _detect_record(record)
+            if on_candidates is not None:
+                on_candidates(record, candidates)
+            yield record, events
+        return
+
+    max_in_flight = max_in_flight or max(1, workers) * 4
+    on_quarantine = on_quarantine or (lambda record, error, lane: None)
+    on_retry = on_retry or (lambda record, error: None)
+
+    def done(record, result):
+        events, candidates = result
+        if on_candidates is not None:
+            on_candidates(record, candidates)
+        return record, events
+
+    retry = []
+    with SupervisedPool(workers, rules, timeout, context) as pool:
+        for record, result in _run_pool(pool, records, max_in_flight, governor):
+            if not isinstance(result, TaskFailed):
+                yield done(record, result)
+            elif result.reason in ("timeout", "crash"):
+                on_retry(record, result)
+                retry.append(record)
+            else:
+                on_quarantine(record, result, "principal")
+
+    if not retry:
+        return
+    slow_timeout = slow_timeout or (timeout * SLOW_LANE_FACTOR if timeout else None)
+    if on_slow_lane is not None:
+        on_slow_lane(len(retry), slow_timeout)
+    with SupervisedPool(min(max(1, workers), len(retry)), rules, slow_timeout, context) as pool:
+        for record, result in _run_pool(pool, retry, max_in_flight, governor):
+            if isinstance(result, TaskFailed):
+                on_quarantine(record, result, "lenta")
+            else:
+                yield done(record, result)
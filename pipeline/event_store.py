@@ -0,0 +1,76 @@
+"""
+Persistent store of detected events (before ground truth), indexed by the
+record (source_id) that produced them, so partial reruns can replace only
+the slice of records they reprocessed.
+"""
+import os
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from build_aggregates import read_json, write_bytes, write_json
+from detect_events import Event
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eventos_detectados.json")
+
+def event_key(e: Event) -> Tuple[str, str]:
+    """Same key as apply_ground_truth.event_key: (NOME, date)."""
+    return e.nome.upper(), e.date
+
+class EventStore:
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        data = read_json(path, {})
+        # source_id -> {"source": nome da fonte, "date": publicação, "orgao": rótulo}
+        self.sources: Dict[str, Dict] = data.get("sources", {})
+        self.events: List[Event] = [Event.from_dict(d) for d in data.get("events", [])]
+        # rules.yaml used in the last detection run (for rules_impact)
+        self.rules: Optional[Dict] = data.get("rules")
+        # source name -> extraction settings (Source.settings) its stored records were read with
+        self.extraction: Dict[str, Dict] = data.get("extraction", {})
+        # (NOME, date) of events added/removed since the aggregates were last
+        # synced (consumed by aggregate_state.py)
+        self.dirty: Set[Tuple[str, str]] = {tuple(k) for k in data.get("dirty", [])}
+        # (NOME, date) -> events with that key, in store order (aggregate_state reads only the dirty keys)
+        self.by_key: Dict[Tuple[str, str], List[Event]] = defaultdict(list)
+        for e in self.events:
+            self.by_key[event_key(e)].append(e)
+
+    def save(self) -> bool:
+        return write_json(self.path, {
+            "rules": self.rules,
+            "extraction": dict(sorted(self.extraction.items())),
+            "dirty": sorted(self.dirty),
+            "sources": dict(sorted(self.sources.items())),
+            "events": [e.to_dict() for e in self.events],
+        })
+
+    def snapshot(self, path: str) -> bool:
+        """Copies the saved store file to `path` (run.py: the store as last published, for diff_events.py)."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb") as f:
+            return write_bytes(path, f.read())
+
+    def merge(self, run_sources: Dict[str, Dict], new_events: List[Event],
+              in_scope: Callable[[str, Dict], bool] = lambda source_id, meta: True):
+        """
+        Replaces the slice covered by a run: stored records whose metadata is
+        in scope (or that were reprocessed) are dropped with their events,
+        then the run's records and events are added. Returns (removed, added).
+        """
+        replaced = {sid for sid, meta in self.sources.items() if in_scope(sid, meta)} | set(run_sources)
+        removed = [e for e in self.events if e.source_pdf in replaced]
+        self.events = [e for e in self.events if e.source_pdf not in replaced] + list(new_events)
+        for sid in replaced:
+            self.sources.pop(sid, None)
+        self.sources.update(run_sources)
+        for k in {event_key(e) for e in removed}:
+            kept = [e for e in self.by_key[k] if e.source_pdf not in replaced]
+            if kept:
+                self.by_key[k] = kept
+            else:
+                del self.by_key[k]
+        for e in new_events:
+            self.by_key[event_key(e)].append(e)
+        self.dirty.update(event_key(e) for e in removed + list(new_events))
+        return removed, list(new_events)
@@ -0,0 +1,235 @@
+"""
+Audit candidate export.
+
+Blocks that pass the TI screen and the exit/entry screen but that the
+detector rejected, or extracted with missing fields ("Não identificado",
+unknown destino), are written to size-bounded JSONL shards for review,
+one JSON object per line with the record id, the block, the surrounding
+blocks as context and the detector's partial extraction. Candidates
+already resolved in ground_truth.json (same person within
+MATCH_WINDOW_DAYS) are skipped.
+
+run.py exports the candidates of the records each run reads (stage
+"candidates", into candidatos/<timestamp>-<pid>-<n>/): the detection
+workers collect them with block_candidates in the same pass that detects
+the events, so they share its extraction (NER names included), time
+budget and quarantine. This script exports the whole corpus:
+
+    python export_candidates.py --out candidatos/completo
+"""
+import argparse
+import json
+import os
+import itertools
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from careers import MATCH_WINDOW_DAYS, days_between, normalize_name
+from detect_events import (Event, block_contexts, contains_any, detect_block, extract_destino, extract_event_date,
+                           extract_nome, extract_role, split_blocks)
+
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPORT_DIR = os.path.join(PIPELINE_DIR, "candidatos")
+SHARD_BYTES = 8 * 1024 * 1024
+# Blocos vizinhos incluídos como contexto, e o limite de caracteres de cada lado
+CONTEXT_BLOCKS = 1
+CONTEXT_CHARS = 600
+
+NAO_IDENTIFICADO = "Não identificado"
+# Lotes de uma mesma execução (--watch roda vários por segundo)
+_batches = itertools.count(1)
+
+class ShardWriter:
+    """JSONL writer that rotates to a new shard past max_bytes; shards appear on disk complete."""
+    def __init__(self, directory: str, max_bytes: int = SHARD_BYTES, prefix: str = "candidatos"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.paths: List[str] = []
+        self.count = 0
+        self._f = None
+        self._size = 0
+
+    def _rotate(self):
+        self._close_current()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.prefix}-{len(self.paths) + 1:05d}.jsonl")
+        self.paths.append(path)
+        self._f = open(path + ".tmp", "wb")
+        self._size = 0
+
+    def _close_current(self):
+        if self._f is not None:
+            self._f.close()
+            os.replace(self._f.name, self.paths[-1])
+            self._f = None
+
+    def write(self, obj: Dict):
+        line = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._f is None or (self._size and self._size + len(line) > self.max_bytes):
+            self._rotate()
+        self._f.write(line)
+        self._size += len(line)
+        self.count += 1
+
+    def close(self) -> List[str]:
+        self._close_current()
+        return self.paths
+
+def load_resolved(gt_path: Optional[str]) -> Dict[str, List[str]]:
+    """Normalized name -> dates of the ground truth entries."""
+    from build_aggregates import read_json
+
+    resolved: Dict[str, List[str]] = {}
+    for gt in (read_json(gt_path, []) if gt_path else []):
+        resolved.setdefault(normalize_name(gt.get("name", "")), []).append(gt.get("date", ""))
+    return resolved
+
+def _clip(text: str, limit: int, tail: bool) -> str:
+    if len(text) <= limit:
+        return text
+    return "…" + text[-limit:] if tail else text[:limit] + "…"
+
+def _screened(bnorm: str, rules: Dict) -> bool:
+    """Whether a block passes the TI screen and the exit/entry screen (and isn't a retification)."""
+    if contains_any(bnorm, rules.get("skip_patterns", [])):
+        return False
+    if not contains_any(bnorm, rules.get("entry_patterns", [])) and not contains_any(bnorm, rules["exit_patterns"]):
+        return False
+    return contains_any(bnorm, rules["ti_keywords"])
+
+def block_candidates(bnorms: List[str], contexts: List[str], rules: Dict, date: str, source_id: str,
+                     first: int = 0, last: Optional[int] = None, offset: int = 0,
+                     context_blocks: int = CONTEXT_BLOCKS) -> Tuple[List[Event], List[Dict]]:
+    """
+    (events, candidates) of blocks first..last, detecting each block once:
+    the events are the ones detect_blocks would return, the candidates the
+    screened blocks the detector rejected or extracted with missing fields.
+    Blocks outside first..last are only context; `offset` is the index of
+    bnorms[0] in the record.
+    """
+    last = len(bnorms) if last is None else last
+    events, candidates = [], []
+    for i in range(first, last):
+        bnorm = bnorms[i]
+        event = detect_block(bnorm, contexts[i], rules, date, source_id)
+        if event is not None:
+            events.append(event)
+            extracao = {"nome": event.nome, "cargo": event.role, "destino": event.destino,
+                        "data": event.date, "tipo": event.tipo, "confidence": event.confidence}
+            motivos = []
+            if event.nome == NAO_IDENTIFICADO:
+                motivos.append("nome não identificado")
+            if event.role == NAO_IDENTIFICADO:
+                motivos.append("cargo não identificado")
+            if event.destino == "Desconhecido" or event.destino.startswith("Não informado"):
+                motivos.append("destino não identificado")
+            if not motivos:
+                continue
+        elif _screened(bnorm, rules):
+            is_ingresso = contains_any(bnorm, rules.get("entry_patterns", []))
+            extracao = {"nome": extract_nome(bnorm) or NAO_IDENTIFICADO,
+                        "cargo": extract_role(bnorm), "destino": extract_destino(bnorm),
+                        "data": extract_event_date(bnorm) or date,
+                        "tipo": "ingresso" if is_ingresso else "evasão", "confidence": None}
+            motivos = ["rejeitado pelo detector"]
+        else:
+            continue
+
+        k = context_blocks
+        candidates.append({
+            "id": f"{source_id}#{offset + i}",
+            "source_id": source_id,
+            "bloco": offset + i,
+            "publicacao": date,
+            "orgao": contexts[i],
+            "motivos": motivos,
+            "extracao": extracao,
+            "texto": bnorm,
+            "contexto": {
+                "antes": _clip(" ".join(bnorms[max(0, i - k):i]), CONTEXT_CHARS, tail=True),
+                "depois": _clip(" ".join(bnorms[i + 1:i + 1 + k]), CONTEXT_CHARS, tail=False),
+            },
+        })
+    return events, candidates
+
+class CandidateExporter:
+    def __init__(self, rules: Dict, out_dir: str, gt_path: Optional[str] = None,
+                 max_bytes: int = SHARD_BYTES, context_blocks: int = CONTEXT_BLOCKS):
+        self.rules = rules
+        self.writer = ShardWriter(out_dir, max_bytes)
+        self.resolved = load_resolved(gt_path)
+        self.context_blocks = context_blocks
+        self.skipped_resolved = 0
+
+    def is_resolved(self, nome: str, date: str) -> bool:
+        dates = self.resolved.get(normalize_name(nome)) if nome else None
+        if not dates:
+            return False
+        for d in dates:
+            diff = days_between(d, date)
+            if d == date or (diff is not None and diff <= MATCH_WINDOW_DAYS):
+                return True
+        return False
+
+    def candidates(self, record) -> List[Dict]:
+        """Candidate blocks of a Record, with their partial extraction (detected in this process)."""
+        bnorms, contexts = block_contexts(record.text, split_blocks(record.text))
+        return block_candidates(bnorms, contexts, self.rules, record.date, record.source_id,
+                                context_blocks=self.context_blocks)[1]
+
+    def add(self, record, candidates: Iterable[Dict]):
+        """Writes a record's candidates, skipping the ones resolved in the ground truth (engine on_candidates)."""
+        for candidate in candidates:
+            extracao = candidate["extracao"]
+            nome = extracao["nome"] if extracao["nome"] != NAO_IDENTIFICADO else ""
+            if self.is_resolved(nome, extracao["data"]):
+                self.skipped_resolved += 1
+                continue
+            self.writer.write(candidate)
+
+    def export(self, record):
+        self.add(record, self.candidates(record))
+
+    def close(self) -> List[str]:
+        return self.writer.close()
+
+    def report(self) -> str:
+        return (f"{self.writer.count} candidatos em {len(self.writer.paths)} shards"
+                f" ({self.skipped_resolved} já resolvidos no ground truth)")
+
+def batch_dir(base: str = EXPORT_DIR) -> str:
+    """Directory for one run's batch: candidatos/<timestamp>-<pid>-<n>, unique across runs and processes."""
+    return os.path.join(base, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_batches)}")
+
+def main():
+    import yaml
+
+    from sources import iter_records, load_sources
+
+    parser = argparse.ArgumentParser(description="Exporta candidatos para auditoria (JSONL em shards)")
+    parser.add_argument("--out", default=None, help="Diretório dos shards (padrão: candidatos/<timestamp>)")
+    parser.add_argument("--sources", default="", help="Fontes de sources.yaml, separadas por vírgula (padrão: todas)")
+    parser.add_argument("--rules", default=os.path.join(PIPELINE_DIR, "rules.yaml"))
+    parser.add_argument("--ground-truth", default=os.path.join(PIPELINE_DIR, "ground_truth.json"))
+    parser.add_argument("--shard-mb", type=float, default=SHARD_BYTES / (1024 * 1024), help="Tamanho máximo de cada shard")
+    parser.add_argument("--context", type=int, default=CONTEXT_BLOCKS, help="Blocos vizinhos de cada lado")
+    args = parser.parse_args()
+
+    with open(args.rules, "r", encoding="utf-8") as f:
+        rules = yaml.safe_load(f)
+    only = [s.strip() for s in args.sources.split(",") if s.strip()]
+    sources = load_sources(os.path.join(PIPELINE_DIR, "sources.yaml"), only=only, rules=rules)
+
+    t0 = time.perf_counter()
+    exporter = CandidateExporter(rules, args.out or batch_dir(), args.ground_truth,
+                                 int(args.shard_mb * 1024 * 1024), args.context)
+    for record in iter_records(sources):
+        exporter.export(record)
+    paths = exporter.close()
+    print(f"📝 {exporter.report()} em {time.perf_counter() - t0:.1f}s")
+    for path in paths:
+        print(f"   {path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,229 @@
-from pypdf import PdfReader
+"""
+PDF text extraction with pluggable backends: pypdf, pdfminer.six and
+poppler's `pdftotext` (subprocess), whichever are installed.
 
-def pdf_to_text(pdf_path: str) -> str:
-    reader = PdfReader(pdf_path)
-    parts = []
+The "auto" backend uses the one picked by the benchmark, recorded in
+extract_backend.json, and falls back to the first available backend:
+
+    python extract_text.py bench --sample 20
+
+The bench extracts a sample of our PDFs with every backend, measures
+throughput and text similarity against the reference backend, and selects
+the fastest one whose text yields exactly the same detected events.
+"""
+import argparse
+import functools
+import importlib.util
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from typing import BinaryIO, Callable, Dict, Iterator, List, Union
+
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+SELECTION_PATH = os.path.join(PIPELINE_DIR, "extract_backend.json")
+DEFAULT_BACKEND = "pypdf"
+
+PdfInput = Union[str, BinaryIO]
+
+def _pypdf_pages(pdf: PdfInput) -> Iterator[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf)
     for page in reader.pages:
-        parts.append(page.extract_text() or "")
-    return "\n".join(parts)
+        yield page.extract_text() or ""
+
+def _pdfminer_pages(pdf: PdfInput) -> Iterator[str]:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+
+    for layout in extract_pages(pdf):
+        yield "".join(el.get_text() for el in layout if isinstance(el, LTTextContainer))
+
+def _pdftotext_pages(pdf: PdfInput) -> Iterator[str]:
+    # pdftotext precisa de um arquivo; streams são copiados para um temporário
+    tmp = None
+    if not isinstance(pdf, str):
+        tmp = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+        with tmp:
+            shutil.copyfileobj(pdf, tmp)
+        pdf = tmp.name
+    try:
+        out = subprocess.run(["pdftotext", "-enc", "UTF-8", pdf, "-"],
+                             capture_output=True, check=True).stdout.decode("utf-8", "replace")
+    finally:
+        if tmp is not None:
+            os.unlink(tmp.name)
+    pages = out.split("\f")
+    # pdftotext termina cada página com \f, inclusive a última
+    if pages and not pages[-1]:
+        pages.pop()
+    yield from pages
+
+# nome -> (extrator de páginas, teste de disponibilidade), em ordem de preferência
+BACKENDS: Dict[str, tuple] = {
+    "pypdf": (_pypdf_pages, lambda: importlib.util.find_spec("pypdf") is not None),
+    "pdfminer": (_pdfminer_pages, lambda: importlib.util.find_spec("pdfminer") is not None),
+    "pdftotext": (_pdftotext_pages, lambda: shutil.which("pdftotext") is not None),
+}
+
+def available_backends() -> List[str]:
+    return [name for name, (_, available) in BACKENDS.items() if available()]
+
+@functools.lru_cache(maxsize=None)
+def resolve_backend(backend: str = "auto") -> str:
+    """Backend name for "auto" (benchmark selection, else first available) or a checked explicit name."""
+    if backend != "auto":
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de extração desconhecido: {backend}")
+        return backend
+
+    from build_aggregates import read_json
+
+    selected = read_json(SELECTION_PATH, {}).get("backend")
+    available = available_backends()
+    if selected in available:
+        return selected
+    return available[0] if available else DEFAULT_BACKEND
+
+def iter_pages(pdf: PdfInput, backend: str = "auto") -> Iterator[str]:
+    """
+    Yields the text of each page (one page in memory at a time). `pdf` is
+    a path or a seekable binary stream (e.g. a member read from an archive).
+    """
+    extract: Callable = BACKENDS[resolve_backend(backend)][0]
+    return extract(pdf)
+
+def pdf_to_text(pdf: PdfInput, backend: str = "auto") -> str:
+    return "\n".join(iter_pages(pdf, backend))
+
+def text_similarity(a: str, b: str) -> float:
+    """Word-multiset overlap in [0, 1] (order-insensitive, cheap on long texts)."""
+    wa, wb = Counter(a.split()), Counter(b.split())
+    total = max(sum(wa.values()), sum(wb.values()))
+    return sum((wa & wb).values()) / total if total else 1.0
+
+def sample_pdfs(pdf_dir: str, n: int, seed: int = 0) -> List[tuple]:
+    """Reservoir sample of n (source_id, buffer) PDFs, loose or inside archives."""
+    import random
+    from sources import DejtPdfDirSource, buffer_stream
+
+    rng = random.Random(seed)
+    sample = []
+    for i, (source_id, stream) in enumerate(DejtPdfDirSource(pdf_dir).documents()):
+        if len(sample) < n:
+            sample.append((source_id, buffer_stream(stream)[1]))
+        else:
+            j = rng.randrange(i + 1)
+            if j < n:
+                sample[j][1].close()
+                sample[j] = (source_id, buffer_stream(stream)[1])
+    return sorted(sample, key=lambda item: item[0])
+
+def bench(pdf_dir: str, n: int, reference: str, rules: Dict) -> Dict:
+    """
+    Extracts the sample with every available backend. The selected backend
+    is the fastest one whose detections match the reference on every PDF.
+    """
+    from datetime import datetime, timezone
+
+    from detect_events import detect_events
+    from sources import date_from_name
+
+    backends = available_backends()
+    if reference not in backends:
+        raise SystemExit(f"❌ Backend de referência indisponível: {reference} (disponíveis: {', '.join(backends) or 'nenhum'})")
+    sample = sample_pdfs(pdf_dir, n)
+    if not sample:
+        raise SystemExit(f"❌ Nenhum PDF em {pdf_dir}")
+    print(f"⌛ Bench: {len(sample)} PDFs, backends: {', '.join(backends)} (referência: {reference})")
+
+    texts: Dict[str, Dict[str, str]] = {}
+    results = {}
+    for name in [reference] + [b for b in backends if b != reference]:
+        texts[name] = {}
+        pages = chars = 0
+        failures = []
+        t0 = time.perf_counter()
+        for source_id, buf in sample:
+            buf.seek(0)
+            try:
+                page_texts = list(iter_pages(buf, name))
+            except Exception as e:
+                failures.append(f"{source_id}: {e}")
+                page_texts = []
+            pages += len(page_texts)
+            chars += sum(len(p) for p in page_texts)
+            texts[name][source_id] = "\n".join(page_texts)
+        elapsed = time.perf_counter() - t0
+        results[name] = {
+            "seconds": round(elapsed, 3),
+            "pages": pages,
+            "pages_per_s": round(pages / elapsed, 1) if elapsed else None,
+            "chars": chars,
+            "failures": failures,
+        }
+
+    def events_of(name: str, source_id: str) -> List[Dict]:
+        date = date_from_name(source_id.rsplit("/", 1)[-1])
+        return [e.to_dict() for e in detect_events(texts[name][source_id], rules, date, source_pdf=source_id)]
+
+    ref_events = {source_id: events_of(reference, source_id) for source_id, _ in sample}
+    for name, result in results.items():
+        sims, identical = [], not result["failures"]
+        for source_id, _ in sample:
+            sims.append(text_similarity(texts[reference][source_id], texts[name][source_id]))
+            if identical and name != reference:
+                identical = events_of(name, source_id) == ref_events[source_id]
+        result["similarity"] = round(min(sims), 4)
+        result["identical_events"] = identical
+        print(f"   {name:<10} {result['seconds']:>8.2f}s  {result['pages_per_s'] or 0:>8} pág/s  "
+              f"similaridade mín. {result['similarity']:.3f}  eventos {'idênticos' if identical else 'DIFERENTES'}"
+              + (f"  ({len(result['failures'])} falhas)" if result["failures"] else ""))
+
+    eligible = [name for name, r in results.items() if r["identical_events"]] or [reference]
+    selected = min(eligible, key=lambda name: results[name]["seconds"])
+    for source_id, buf in sample:
+        buf.close()
+    return {
+        "backend": selected,
+        "reference": reference,
+        "sample": [source_id for source_id, _ in sample],
+        "results": results,
+        "benchmarked_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+def main():
+    import yaml
+
+    from build_aggregates import write_json
+
+    parser = argparse.ArgumentParser(description="Extração de texto de PDFs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench", help="Compara os backends numa amostra de PDFs e seleciona o do modo auto")
+    b.add_argument("--pdfs", default=os.path.join(PIPELINE_DIR, "pdfs"), help="Diretório de PDFs/arquivos compactados")
+    b.add_argument("--sample", type=int, default=20, help="Número de PDFs na amostra")
+    b.add_argument("--reference", default=DEFAULT_BACKEND, help="Backend de referência (detecções e similaridade)")
+    b.add_argument("--rules", default=os.path.join(PIPELINE_DIR, "rules.yaml"))
+    b.add_argument("--dry-run", action="store_true", help="Não grava a seleção")
+    t = sub.add_parser("text", help="Imprime o texto de um PDF")
+    t.add_argument("pdf")
+    t.add_argument("--backend", default="auto", choices=["auto"] + list(BACKENDS))
+    args = parser.parse_args()
+
+    if args.command == "text":
+        print(pdf_to_text(args.pdf, args.backend))
+        return
+
+    with open(args.rules, "r", encoding="utf-8") as f:
+        rules = yaml.safe_load(f)
+    selection = bench(args.pdfs, args.sample, args.reference, rules)
+    print(f"🏁 Backend selecionado: {selection['backend']}")
+    if not args.dry_run:
+        write_json(SELECTION_PATH, selection)
+        print(f"💾 Seleção gravada em {SELECTION_PATH}")
+
+if __name__ == "__main__":
+    main()
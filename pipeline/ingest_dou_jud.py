@@ -3,15 +3,12 @@ Ingest data from DOU (Diário Oficial da União) via Base dos Dados / BigQuery
 
 Source: basedosdados.br_imprensa_nacional_dou.secao_2
 """
-import pandas_gbq
-import pandas as pd
 import json
 import os
 from datetime import datetime
 
-# Cache directory
+# Cache directory (created on first write, not at import time)
 CACHE_DIR = "cache"
-os.makedirs(CACHE_DIR, exist_ok=True)
 
 def get_project_id():
     """Get Google Cloud project ID from cache"""
@@ -27,17 +24,39 @@ def get_project_id():
     print("   Execute primeiro: python test_oauth.py")
     return None
 
+def dou_cache_path(start_date: str, end_date: str) -> str:
+  """Parquet cache file of a query_dou_history date range."""
+  cache_name = f"dou_historical_jud_{start_date.replace('-', '')}_{end_date.replace('-', '')}.parquet"
+  return os.path.join(CACHE_DIR, cache_name)
+
 def query_dou_history(start_date="2019-01-01", end_date="2024-12-31", use_cache=True):
   """
   Query DOU para eventos do Poder Judiciário com TI (nomeações, vacâncias, etc.)
+
+  The result is cached in cache/*.parquet through cache.get_or_compute:
+  written atomically, and jobs running at the same time wait for a single
+  BigQuery download of the range instead of repeating it.
   """
-  cache_name = f"dou_historical_jud_{start_date.replace('-', '')}_{end_date.replace('-', '')}.parquet"
-  cache_path = os.path.join(CACHE_DIR, cache_name)
-    
-  if use_cache and os.path.exists(cache_path):
-    print(f"📦 Carregando dados do cache: {cache_path}")
-    return pd.read_parquet(cache_path)
+  from cache import get_or_compute
+
+  cache_path = dou_cache_path(start_date, end_date)
     
+  import pandas as pd
+
+  def load(path):
+    print(f"📦 Carregando dados do cache: {path}")
+    return pd.read_parquet(path)
+
+  def save(df, tmp_path):
+    df.to_parquet(tmp_path, index=False)
+    print(f"💾 Dados salvos em cache: {cache_path}")
+
+  return get_or_compute(cache_path, lambda: download_dou_history(start_date, end_date), load, save, use_cache)
+
+def download_dou_history(start_date, end_date):
+  """Runs the BigQuery query; None when nothing could be downloaded (nothing is cached then)."""
+  import pandas as pd
+
   project_id = get_project_id()
   if not project_id:
     return None
@@ -81,6 +100,8 @@ def query_dou_history(start_date="2019-01-01", end_date="2024-12-31", use_cache=
   """
     
   try:
+    import pandas_gbq
+
     print("📊 Executando query (pode levar alguns minutos)...")
     df = pandas_gbq.read_gbq(query, project_id=project_id)
         
@@ -91,15 +112,26 @@ def query_dou_history(start_date="2019-01-01", end_date="2024-12-31", use_cache=
       if 'data_publicacao' in df.columns:
         df['data_publicacao'] = pd.to_datetime(df['data_publicacao']).dt.date
             
-      df.to_parquet(cache_path, index=False)
-      print(f"💾 Dados salvos em cache: {cache_path}")
-            
       return df
         
   except Exception as e:
     print(f"❌ Erro ao consultar BigQuery: {e}")
     return None
 
+def dou_row_to_text(row) -> str:
+  """
+  Formats a DOU record (mapping or namedtuple) as a text block with the
+  metadata header expected by detect_events.py
+  """
+  get = row.get if hasattr(row, 'get') else (lambda k: getattr(row, k))
+  block = f"DATA: {get('data_publicacao')}\n"
+  block += f"FONTE: DOU Seção {get('secao')}\n"
+  block += f"ORGAO: {get('orgao')}\n"
+  block += f"URL: {get('url')}\n"
+  block += "---\n"
+  block += get('texto')
+  return block
+
 def load_dou_as_text_blocks(df):
   """
   Converts DOU records to the format expected by detect_events.py
@@ -108,22 +140,14 @@ def load_dou_as_text_blocks(df):
     return []
     
   text_blocks = []
-  for _, row in df.iterrows():
-    # Combine metadata into a block format
-    block = f"DATA: {row['data_publicacao']}\n"
-    block += f"FONTE: DOU Seção {row['secao']}\n"
-    block += f"ORGAO: {row['orgao']}\n"
-    block += f"URL: {row['url']}\n"
-    block += "---\n"
-    block += row['texto']
-        
+  for row in df.itertuples(index=False):
     text_blocks.append({
-      'text': block,
-      'source': f"DOU_{row['data_publicacao']}",
-      'date': str(row['data_publicacao'])
+      'text': dou_row_to_text(row),
+      'source': f"DOU_{row.data_publicacao}",
+      'date': str(row.data_publicacao)
     })
         
-    return text_blocks
+  return text_blocks
 
 def main():
   print("=== DOU Historical Data Ingestion ===\n")
@@ -0,0 +1,164 @@
+"""
+Memory accounting for run.py.
+
+Usage is the RSS of this process plus its worker processes (from /proc),
+or the Python heap via tracemalloc where /proc isn't available. A sampler
+thread keeps the peak of each stage, and AdaptiveSize (AIMD: halve under
+pressure, grow by a step when there is headroom) sizes the detection
+batches to stay under --memory-budget.
+
+The batches are the records in flight and the blocks per chunk of large
+documents. There is no separate NER batch size: SpaCy runs one block at
+a time inside the workers, so those two sizes are what bounds its memory.
+"""
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Acima de HIGH_WATER do orçamento os lotes encolhem; abaixo de LOW_WATER, crescem
+HIGH_WATER = 0.85
+LOW_WATER = 0.6
+SAMPLE_INTERVAL_S = 0.2
+
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+def parse_size(text: str) -> int:
+    """'4G', '3500M', '2.5GB' -> bytes (plain numbers are MB)."""
+    m = _SIZE_RE.match(str(text))
+    if not m:
+        raise ValueError(f"Tamanho inválido: {text}")
+    value, unit = float(m.group(1)), m.group(2).upper()
+    return int(value * (_UNITS[unit] if unit else _UNITS["M"]))
+
+def format_size(n: Optional[int]) -> str:
+    if n is None:
+        return "?"
+    for unit in ("GB", "MB", "KB"):
+        scale = _UNITS[unit[0]]
+        if n >= scale:
+            return f"{n / scale:.1f} {unit}"
+    return f"{n} B"
+
+def process_rss(pid="self") -> Optional[int]:
+    """Resident set size of a process in bytes (Linux /proc), None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def current_usage() -> Dict[str, int]:
+    """{"main": bytes, "workers": bytes}; falls back to the tracemalloc heap."""
+    import multiprocessing
+
+    main = process_rss()
+    if main is None:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return {"main": tracemalloc.get_traced_memory()[0], "workers": 0}
+    workers = sum(process_rss(p.pid) or 0 for p in multiprocessing.active_children())
+    return {"main": main, "workers": workers}
+
+class AdaptiveSize:
+    """AIMD-controlled size: halves above the high-water mark, grows by `step` below the low one."""
+    def __init__(self, initial: int, minimum: int, maximum: int, step: int = 1):
+        self.value = initial
+        self.minimum, self.maximum, self.step = minimum, maximum, step
+
+    def update(self, usage: int, budget: int) -> int:
+        if usage > budget * HIGH_WATER:
+            self.value = max(self.minimum, self.value // 2)
+        elif usage < budget * LOW_WATER:
+            self.value = min(self.maximum, self.value + self.step)
+        return self.value
+
+class MemoryMonitor:
+    """Samples memory usage in a background thread and keeps the peak per stage."""
+    def __init__(self, budget: Optional[int] = None, interval: float = SAMPLE_INTERVAL_S):
+        self.budget = budget
+        self.interval = interval
+        self.stage: Optional[str] = None
+        self.peaks: Dict[str, Dict[str, int]] = {}
+        self.last = {"main": 0, "workers": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> int:
+        """Measures now, records it for the current stage and returns the total."""
+        usage = current_usage()
+        total = usage["main"] + usage["workers"]
+        with self._lock:
+            self.last = usage
+            if self.stage:
+                peak = self.peaks.setdefault(self.stage, {"total": 0, "main": 0, "workers": 0})
+                peak["total"] = max(peak["total"], total)
+                peak["main"] = max(peak["main"], usage["main"])
+                peak["workers"] = max(peak["workers"], usage["workers"])
+        return total
+
+    def enter(self, stage: str):
+        """Starts attributing samples to `stage`."""
+        self.sample()
+        self.stage = stage
+        self.sample()
+
+    def stop(self):
+        self.sample()
+        self._stop.set()
+        self._thread.join()
+
+    def report(self) -> List[str]:
+        lines = []
+        for stage, peak in self.peaks.items():
+            over = " ⚠️ acima do orçamento" if self.budget and peak["total"] > self.budget else ""
+            lines.append(f"   {stage}: pico {format_size(peak['total'])} "
+                         f"(principal {format_size(peak['main'])}, workers {format_size(peak['workers'])}){over}")
+        return lines
+
+class MemoryGovernor:
+    """
+    Adapts the detection batch sizes to a memory budget: records in flight
+    (ingestion into the pool) and blocks per chunk of large documents.
+    """
+    def __init__(self, monitor: MemoryMonitor, max_in_flight: int, blocks_per_chunk: int,
+                 min_interval: float = 0.25):
+        self.monitor = monitor
+        self.budget = monitor.budget
+        self.in_flight = AdaptiveSize(max_in_flight, 1, max_in_flight * 2)
+        self.chunk = AdaptiveSize(blocks_per_chunk, 8, blocks_per_chunk * 4, step=8)
+        self.min_interval = min_interval
+        self._last_check = 0.0
+        self.shrinks = 0
+        self._warned = False
+
+    def adjust(self):
+        """Re-measures (at most every min_interval) and resizes the batches."""
+        now = time.monotonic()
+        if now - self._last_check < self.min_interval:
+            return
+        self._last_check = now
+        usage = self.monitor.sample()
+        before = self.in_flight.value
+        self.in_flight.update(usage, self.budget)
+        self.chunk.update(usage, self.budget)
+        if self.in_flight.value < before:
+            self.shrinks += 1
+        if usage > self.budget and self.in_flight.value == self.in_flight.minimum and not self._warned:
+            self._warned = True
+            print(f"⚠️  Uso de memória ({format_size(usage)}) acima do orçamento mesmo com lotes mínimos")
+
+    def summary(self) -> str:
+        return (f"lotes finais: {self.in_flight.value} registros em voo, {self.chunk.value} blocos por pedaço; "
+                f"{self.shrinks} reduções por pressão de memória")
@@ -0,0 +1,350 @@
+"""
+Regex registry for the detection patterns.
+
+Every pattern is compiled once through rx(). When google-re2 is installed
+(and REGEX_ENGINE isn't "re"), patterns run on RE2, whose matching time is
+linear in the input, so a malformed OCR block can't make a worker hang on
+backtracking. Patterns RE2 can't express keep running on Python's `re`:
+
+- lookarounds, backreferences, atomic groups, conditionals;
+- `\\b` in the middle of a pattern (RE2's `\\b` is ASCII-only, and a
+  boundary next to "ã" or "ç" would match differently).
+
+To keep results identical, Unicode classes are rewritten (`\\s`, `\\d` and
+`\\w` are ASCII-only in RE2), and a `\\b` at either end of the pattern is
+rewritten as "start/end of text or a non-word character" when the adjacent
+atom always matches a word character. That rewrite consumes the neighbour
+character, so the groups are exact but group(0)/span() may include it:
+such patterns are "search-only" and findall()/split()/sub() run them on `re`.
+
+    python patterns.py          # compatibility report
+"""
+import functools
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+ENGINE = os.environ.get("REGEX_ENGINE", "auto")   # auto | re | re2
+
+# Equivalentes RE2 das classes Unicode do `re` (conteúdo de classe, sem colchetes)
+_WORD = r"\p{L}\p{N}_"
+_CLASS_TRANSLATIONS = {
+    "s": r"\s\x{0b}\x{1c}-\x{1f}\x{85}\pZ",
+    "d": r"\p{Nd}",
+    "w": _WORD,
+}
+_LEAD_BOUNDARY = r"(?:^|[^" + _WORD + r"])"
+_TRAIL_BOUNDARY = r"(?:[^" + _WORD + r"]|$)"
+_SUPPORTED_FLAGS = {re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s"}
+
+# Caracteres que não são de palavra (para checar se uma classe só casa letras/dígitos)
+_NONWORD_PROBE = "".join(c for c in map(chr, range(0x3000)) if not (c.isalnum() or c == "_"))
+
+_re2_module = None
+
+def _re2():
+    """The re2 module, or None if not installed or disabled via REGEX_ENGINE=re."""
+    global _re2_module
+    if _re2_module is None:
+        _re2_module = False
+        if ENGINE != "re":
+            try:
+                import re2
+                _re2_module = re2
+            except ImportError:
+                if ENGINE == "re2":
+                    print("⚠️  REGEX_ENGINE=re2, mas google-re2 não está instalado: usando re")
+    return _re2_module or None
+
+class Unsupported(Exception):
+    """Pattern feature that needs the backtracking engine."""
+
+def _class_end(body: str, i: int) -> int:
+    """Index just past the character class that opens at body[i]."""
+    j = i + 1
+    if j < len(body) and body[j] == "^":
+        j += 1
+    if j < len(body) and body[j] == "]":
+        j += 1
+    while j < len(body) and body[j] != "]":
+        j += 2 if body[j] == "\\" else 1
+    return j + 1
+
+def _atoms(body: str) -> List[Tuple[str, str]]:
+    """Splits a pattern into top-level (atom, quantifier) pairs. Alternation bars are atoms too."""
+    out = []
+    i, n = 0, len(body)
+    while i < n:
+        c = body[i]
+        if c == "\\":
+            j = i + 2
+        elif c == "[":
+            j = _class_end(body, i)
+        elif c == "(":
+            depth, j = 0, i
+            while j < n:
+                if body[j] == "\\":
+                    j += 2
+                    continue
+                if body[j] == "[":
+                    j = _class_end(body, j)
+                    continue
+                if body[j] == "(":
+                    depth += 1
+                elif body[j] == ")":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                j += 1
+            j += 1
+        else:
+            j = i + 1
+        atom = body[i:j]
+        q_start = j
+        if j < n and body[j] in "?*+":
+            j += 1
+        elif j < n and body[j] == "{":
+            m = re.match(r"\{\d*(?:,\d*)?\}", body[j:])
+            if m:
+                j += m.end()
+        if j > q_start and j < n and body[j] in "?+":
+            # lazy (ok) or possessive (backtracking-only)
+            if body[j] == "+":
+                raise Unsupported("quantificador possessivo")
+            j += 1
+        out.append((atom, body[q_start:j]))
+        i = j
+    return out
+
+def _alternatives(atoms: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+    alts = [[]]
+    for atom, q in atoms:
+        if atom == "|":
+            alts.append([])
+        else:
+            alts[-1].append((atom, q))
+    return alts
+
+def _group_body(atom: str) -> str:
+    inner = atom[1:-1]
+    if inner.startswith("?:"):
+        return inner[2:]
+    m = re.match(r"\?P<\w+>", inner)
+    return inner[m.end():] if m else inner
+
+def _always_word(atoms: List[Tuple[str, str]], at_end: bool, flags: int) -> bool:
+    """Whether every match of the sequence starts (or ends) with a word character."""
+    for alt in _alternatives(atoms):
+        if not alt:
+            return False
+        atom, q = alt[-1] if at_end else alt[0]
+        if q.startswith("?") or q.startswith("*") or q.startswith("{0") or q.startswith("{,"):
+            return False
+        if atom.startswith("("):
+            if atom.startswith("(?") and not atom.startswith(("(?:", "(?P<")):
+                return False
+            if not _always_word(_atoms(_group_body(atom)), at_end, flags):
+                return False
+        elif atom.startswith("["):
+            try:
+                if re.search(atom, _NONWORD_PROBE, flags):
+                    return False
+            except re.error:
+                return False
+        elif atom.startswith("\\"):
+            # \d e \w casam só caracteres de palavra; os demais escapes são
+            # classes especiais ou pontuação literal
+            if atom[1:] not in ("d", "w"):
+                return False
+        elif not (atom.isalnum() or atom == "_"):
+            return False
+    return True
+
+def _translate_classes(body: str) -> str:
+    """Rewrites \\s, \\d, \\w (and negations) with their Unicode meaning in Python's re."""
+    out = []
+    i, n, in_class = 0, len(body), False
+    while i < n:
+        c = body[i]
+        if c == "\\" and i + 1 < n:
+            e = body[i + 1]
+            if e in _CLASS_TRANSLATIONS:
+                cls = _CLASS_TRANSLATIONS[e]
+                out.append(cls if in_class else f"[{cls}]")
+            elif e in ("S", "D", "W"):
+                if in_class:
+                    raise Unsupported(f"\\{e} dentro de classe")
+                out.append(f"[^{_CLASS_TRANSLATIONS[e.lower()]}]")
+            elif e in ("b", "B") and not in_class:
+                raise Unsupported("\\b no meio do padrão (fronteira Unicode)")
+            elif e.isdigit() and e != "0":
+                raise Unsupported("referência a grupo")
+            elif e in ("A", "Z"):
+                out.append(r"\A" if e == "A" else r"\z")
+            else:
+                out.append(body[i:i + 2])
+            i += 2
+            continue
+        if in_class:
+            if c == "]":
+                in_class = False
+        elif c == "[":
+            in_class = True
+            out.append(c)
+            i += 1
+            # ']' ou '^]' logo após a abertura são literais
+            if i < n and body[i] == "^":
+                out.append("^")
+                i += 1
+            if i < n and body[i] == "]":
+                out.append(r"\]")
+                i += 1
+            continue
+        elif c == "(" and body.startswith(("(?=", "(?!", "(?<=", "(?<!"), i):
+            raise Unsupported("lookaround")
+        elif c == "(" and body.startswith(("(?P=", "(?>", "(?("), i):
+            raise Unsupported("referência/grupo atômico/condicional")
+        out.append(c)
+        i += 1
+    return "".join(out)
+
+def translate(pattern: str, flags: int = 0) -> Tuple[str, bool]:
+    """
+    Returns (RE2 pattern, search_only) equivalent to the `re` pattern, or
+    raises Unsupported with the reason.
+    """
+    extra = flags & ~sum(_SUPPORTED_FLAGS)
+    if extra & ~re.UNICODE:
+        raise Unsupported("flags não suportadas")
+
+    body = pattern
+    lead = body.startswith("\\b")
+    if lead:
+        body = body[2:]
+    trail = False
+    if body.endswith("\\b"):
+        # Garante que o último átomo é mesmo \b (e não um "\\" seguido de "b")
+        atoms = _atoms(body)
+        trail = bool(atoms) and atoms[-1][0] == "\\b"
+        if trail:
+            body = body[:-2]
+
+    atoms = _atoms(body)
+    if lead and not _always_word(atoms, at_end=False, flags=flags):
+        raise Unsupported("\\b inicial ao lado de caractere que não é de palavra")
+    if trail and not _always_word(atoms, at_end=True, flags=flags):
+        raise Unsupported("\\b final ao lado de caractere que não é de palavra")
+
+    translated = _translate_classes(body)
+    if lead or trail:
+        # O corpo entra num grupo não-capturante para a alternância não vazar
+        translated = (_LEAD_BOUNDARY if lead else "") + f"(?:{translated})" + (_TRAIL_BOUNDARY if trail else "")
+    inline = "".join(ch for flag, ch in _SUPPORTED_FLAGS.items() if flags & flag)
+    return (f"(?{inline})" if inline else "") + translated, lead or trail
+
+class Pattern:
+    """A compiled pattern with a re-like search/split/sub on the best available engine."""
+    __slots__ = ("name", "pattern", "flags", "py", "re2", "search_only", "reason")
+
+    def __init__(self, pattern: str, flags: int = 0, name: Optional[str] = None):
+        self.name = name
+        self.pattern = pattern
+        self.flags = flags
+        self.py = re.compile(pattern, flags)
+        self.re2 = None
+        self.search_only = False
+        self.reason = ""
+        re2 = _re2()
+        if re2 is None:
+            self.reason = "re2 indisponível"
+            return
+        try:
+            translated, self.search_only = translate(pattern, flags)
+            self.re2 = re2.compile(translated)
+        except Unsupported as e:
+            self.reason = str(e)
+        except Exception as e:
+            self.reason = f"re2: {e}"
+
+    @property
+    def engine(self) -> str:
+        return "re2" if self.re2 is not None else "re"
+
+    def search(self, text: str):
+        return (self.re2 or self.py).search(text)
+
+    def findall(self, text: str) -> List:
+        engine = self.py if self.re2 is None or self.search_only else self.re2
+        return engine.findall(text)
+
+    def split(self, text: str, maxsplit: int = 0) -> List[str]:
+        engine = self.py if self.re2 is None or self.search_only else self.re2
+        return engine.split(text, maxsplit)
+
+    def sub(self, repl, text: str, count: int = 0) -> str:
+        engine = self.py if self.re2 is None or self.search_only else self.re2
+        return engine.sub(repl, text, count)
+
+# nome -> Pattern, para o relatório de compatibilidade
+REGISTRY: Dict[str, Pattern] = {}
+
+@functools.lru_cache(maxsize=2048)
+def _compile(pattern: str, flags: int) -> Pattern:
+    return Pattern(pattern, flags)
+
+def rx(pattern: str, flags: int = 0, name: Optional[str] = None) -> Pattern:
+    """
+    Compiles a pattern once (cached by pattern and flags). Named patterns
+    are listed in the compatibility report.
+    """
+    compiled = _compile(pattern, flags)
+    if name:
+        compiled.name = compiled.name or name
+        REGISTRY[name] = compiled
+    return compiled
+
+def compat_report() -> List[Dict]:
+    return [
+        {"name": name, "engine": p.engine, "search_only": p.search_only, "reason": p.reason, "pattern": p.pattern}
+        for name, p in REGISTRY.items()
+    ]
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Relatório de compatibilidade dos padrões de detecção com RE2")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    import yaml
+
+    # Importa como módulo (não __main__) para usar o mesmo registro que detect_events
+    from detect_events import keyword_regex
+    from patterns import compat_report
+    from rules_impact import RULE_LISTS
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.yaml"), "r", encoding="utf-8") as f:
+        rules = yaml.safe_load(f) or {}
+    for key in RULE_LISTS:
+        if rules.get(key):
+            keyword_regex(tuple(rules[key]), name=f"rules:{key}")
+
+    report = compat_report()
+    if args.json:
+        import json
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+    from patterns import _re2 as re2_module
+    if re2_module() is None:
+        print("⚠️  google-re2 indisponível (ou REGEX_ENGINE=re): todos os padrões rodam no re.")
+    on_re2 = [r for r in report if r["engine"] == "re2"]
+    print(f"📋 {len(on_re2)} de {len(report)} padrões rodam em RE2 (tempo linear)")
+    for r in report:
+        mark = "✅" if r["engine"] == "re2" else "↩️ "
+        note = " (só search)" if r["search_only"] else (f" — {r['reason']}" if r["reason"] else "")
+        print(f"   {mark} {r['name']}: {r['engine']}{note}")
+
+if __name__ == "__main__":
+    main()
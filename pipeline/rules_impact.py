@@ -0,0 +1,146 @@
+"""
+Rule-change impact analysis.
+
+At ingestion every record's words are added to an inverted index
+(word -> records). Rule terms are matched by detect_events.contains_any
+with word boundaries and case-insensitively, so a record can only change
+its detection outcome when a changed term occurs in it, i.e. when it holds
+every word of that term. Given old and new rules, the records to reprocess
+are the union of the postings of the terms that were added or removed.
+
+PDFs go through page triage before detection (triage.py), so sources
+hand the index their full text (Source.index_text): a term added to the
+exit/entry lists must also reach the pages the old lists discarded.
+
+    python rules_impact.py old_rules.yaml rules.yaml
+"""
+import argparse
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from build_aggregates import read_json, write_json
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "index_termos.json")
+# Muda quando o que é indexado muda; um índice de outra versão é descartado e
+# os registros voltam a contar como nunca indexados (run.py --rules-delta os refaz)
+INDEX_VERSION = 2
+
+# Listas de termos do rules.yaml usadas pela detecção
+RULE_LISTS = [
+    "exit_patterns", "entry_patterns", "skip_patterns",
+    "ti_keywords", "judiciario_keywords", "fora_judiciario_keywords",
+]
+
+_WORD_RE = re.compile(r"\w+")
+
+def words(text: str) -> Set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+class TermIndex:
+    """Inverted index word -> record ids, persisted as JSON with integer postings."""
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        data = read_json(path, {})
+        if data.get("version") != INDEX_VERSION:
+            data = {}
+        self.record_ids: List[str] = data.get("records", [])
+        self.positions: Dict[str, int] = {sid: i for i, sid in enumerate(self.record_ids)}
+        self.postings: Dict[str, Set[int]] = {w: set(p) for w, p in data.get("postings", {}).items()}
+
+    def add(self, source_id: str, text: str):
+        pos = self.positions.get(source_id)
+        if pos is None:
+            pos = self.positions[source_id] = len(self.record_ids)
+            self.record_ids.append(source_id)
+        for w in words(text):
+            self.postings.setdefault(w, set()).add(pos)
+
+    def indexing(self, records: Iterable) -> Iterator:
+        """Passes records through, indexing each one."""
+        for record in records:
+            self.add(record.source_id, record.text)
+            yield record
+
+    def save(self) -> bool:
+        return write_json(self.path, {
+            "version": INDEX_VERSION,
+            "records": self.record_ids,
+            "postings": {w: sorted(p) for w, p in sorted(self.postings.items())},
+        }, indent=None)
+
+    def records_with(self, term: str) -> Optional[Set[str]]:
+        """Records that may contain the term; None means "can't tell" (no word characters)."""
+        term_words = _WORD_RE.findall(term.lower())
+        if not term_words:
+            return None
+        hits = None
+        for w in term_words:
+            p = self.postings.get(w, set())
+            hits = set(p) if hits is None else hits & p
+            if not hits:
+                return set()
+        return {self.record_ids[i] for i in hits}
+
+def changed_terms(old_rules: Dict, new_rules: Dict) -> Dict[str, Dict[str, List[str]]]:
+    """Terms added/removed per rule list (case-insensitive, like the matching)."""
+    changes = {}
+    for key in RULE_LISTS:
+        old = {t.lower(): t for t in old_rules.get(key) or []}
+        new = {t.lower(): t for t in new_rules.get(key) or []}
+        added = [new[t] for t in sorted(set(new) - set(old))]
+        removed = [old[t] for t in sorted(set(old) - set(new))]
+        if added or removed:
+            changes[key] = {"added": added, "removed": removed}
+    return changes
+
+def affected_records(index: TermIndex, old_rules: Dict, new_rules: Dict):
+    """
+    Returns (record ids whose outcome could change, per-term hit counts).
+    Returns None for the ids when the change can't be narrowed down
+    (a non-list rule changed or a term has no word characters).
+    """
+    other_keys = (set(old_rules) | set(new_rules)) - set(RULE_LISTS)
+    if any(old_rules.get(k) != new_rules.get(k) for k in other_keys):
+        return None, {}
+
+    affected: Set[str] = set()
+    per_term = {}
+    for key, change in changed_terms(old_rules, new_rules).items():
+        for term in change["added"] + change["removed"]:
+            hits = index.records_with(term)
+            if hits is None:
+                return None, per_term
+            per_term[f"{key}: {term}"] = len(hits)
+            affected |= hits
+    return affected, per_term
+
+def main():
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Registros afetados por uma mudança no rules.yaml")
+    parser.add_argument("old_rules")
+    parser.add_argument("new_rules")
+    parser.add_argument("--index", default=DEFAULT_PATH)
+    parser.add_argument("--list", action="store_true", help="Lista os ids dos registros afetados")
+    args = parser.parse_args()
+
+    with open(args.old_rules, "r", encoding="utf-8") as f:
+        old_rules = yaml.safe_load(f) or {}
+    with open(args.new_rules, "r", encoding="utf-8") as f:
+        new_rules = yaml.safe_load(f) or {}
+
+    index = TermIndex(args.index)
+    affected, per_term = affected_records(index, old_rules, new_rules)
+    for term, count in per_term.items():
+        print(f"   {term}: {count} registros")
+    if affected is None:
+        print("⚠️  Mudança não delimitável pelo índice: é preciso reprocessar tudo.")
+        return
+    print(f"📌 {len(affected)} de {len(index.record_ids)} registros indexados podem mudar de resultado.")
+    if args.list:
+        for sid in sorted(affected):
+            print(sid)
+
+if __name__ == "__main__":
+    main()
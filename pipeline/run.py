@@ -1,105 +1,606 @@
+import time
+_T0 = time.perf_counter()
+
+import argparse
 import os
-import yaml
-from extract_text import pdf_to_text
-from detect_events import detect_events
-from build_aggregates import build_outputs
-from apply_ground_truth import apply_ground_truth
+import sys
+
+# Heavy dependencies are imported only inside the stage that needs them
+# (see STAGES below); importing run.py itself must stay cheap.
+HEAVY_MODULES = ["spacy", "pandas", "pandas_gbq", "pypdf", "pdfminer", "pyarrow"]
+STARTUP_BUDGET_S = 0.5
 
 # Onde o site lê os dados
 # Se estiver dentro de 'pipeline', volta um nível
 PROJECT_ROOT = ".." if os.path.basename(os.getcwd()) == "pipeline" else "."
 OUT_DIR = os.path.join(PROJECT_ROOT, "site", "public", "data")
+# Artefatos gerados pelo pipeline (relatórios, índices) ficam ao lado deste script
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+DUPLICATES_PATH = os.path.join(PIPELINE_DIR, "duplicados.json")
+DEDUP_INDEX_PATH = os.path.join(PIPELINE_DIR, "dedup_index.json")
+TERM_INDEX_PATH = os.path.join(PIPELINE_DIR, "index_termos.json")
+QUARANTINE_PATH = os.path.join(PIPELINE_DIR, "quarentena.json")
+SAMPLE_PATH = os.path.join(PIPELINE_DIR, "amostra.json")
+# Rodadas de detecção por execução: a normal + as que refazem duplicados sem canônico
+DEDUP_PASSES = 3
+# Store como estava na última publicação dos agregados (base do diff_events.py e do --max-changes)
+PREVIOUS_STORE_PATH = os.path.join(PIPELINE_DIR, "eventos_detectados.anterior.json")
+# Lock do estado (store, índices, quarentena, carreiras, agregados): run.lock
+RUN_LOCK_PATH = os.path.join(PIPELINE_DIR, "run")
 
-def main():
-    # 1) regras
+# (nome, descrição, dependências pesadas)
+STAGES = [
+    ("detect", "Detecção de eventos nas fontes de sources.yaml", ["pypdf/pdfminer/pdftotext", "pandas", "pyarrow", "spacy (fallback NER)"]),
+    ("candidates", "Exportação de candidatos para auditoria (JSONL, junto com a detecção)", []),
+    ("ground_truth", "Aplicação do ground truth auditado", []),
+    ("aggregates", "Geração dos JSONs do dashboard", []),
+]
+STAGE_NAMES = [s[0] for s in STAGES]
+
+def find_config(name: str) -> str:
     # Assumes running from pipeline directory or project root
-    rules_path = "rules.yaml" if os.path.exists("rules.yaml") else os.path.join("pipeline", "rules.yaml")
-    with open(rules_path, "r", encoding="utf-8") as f:
-        rules = yaml.safe_load(f)
+    return name if os.path.exists(name) else os.path.join("pipeline", name)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline do Observatório de Evasão de TI")
+    parser.add_argument("--stages", default=",".join(STAGE_NAMES),
+                        help=f"Etapas a executar, separadas por vírgula ({','.join(STAGE_NAMES)})")
+    parser.add_argument("--sources", default="",
+                        help="Fontes de sources.yaml a processar, separadas por vírgula (padrão: todas)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processos de detecção em paralelo")
+    parser.add_argument("--record-timeout", type=float, default=120,
+                        help="Orçamento em segundos por registro; quem estoura é morto e vai para a faixa lenta (0 = sem limite)")
+    parser.add_argument("--slow-timeout", type=float,
+                        help="Orçamento da faixa lenta, em segundos (padrão: 10x o --record-timeout)")
+    parser.add_argument("--retry-quarantine", action="store_true",
+                        help="Reprocessa apenas os registros em quarentena, já com o orçamento da faixa lenta")
+    parser.add_argument("--memory-budget",
+                        help="Orçamento de memória (ex.: 3.5G, 3500M): os lotes de detecção encolhem sob pressão e crescem com folga")
+    parser.add_argument("--since", help="Processa apenas publicações a partir desta data (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Processa apenas publicações até esta data (YYYY-MM-DD)")
+    parser.add_argument("--orgao", default="",
+                        help="Processa apenas estes órgãos, separados por vírgula (ex.: trt7,trt16)")
+    parser.add_argument("--rules-delta", action="store_true",
+                        help="Reprocessa apenas os registros que a mudança no rules.yaml (desde a última execução) pode afetar")
+    parser.add_argument("--store", help="Arquivo do store de eventos detectados (padrão: pipeline/eventos_detectados.json)")
+    parser.add_argument("--dedup", choices=["off", "exact", "near"], default="near",
+                        help="Deduplicação de registros antes da detecção (padrão: exatos + quase-duplicados)")
+    parser.add_argument("--max-changes", type=int,
+                        help="Gate de publicação: com mais mudanças que isso desde a última publicação (diff_events.py), "
+                             "os agregados não são publicados e a execução sai com 1 (0 = qualquer mudança)")
+    parser.add_argument("--verify-aggregates", action="store_true",
+                        help="Compara os agregados incrementais com um recálculo completo (sai com 1 se divergirem)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Fica observando as entradas das fontes e processa só o que chegar ou mudar")
+    parser.add_argument("--watch-interval", type=float, default=5,
+                        help="Intervalo entre varreduras do --watch, em segundos")
+    parser.add_argument("--debounce", type=float, default=10,
+                        help="Silêncio exigido antes de processar um lote de chegadas, em segundos")
+    parser.add_argument("--sample", type=int, metavar="N",
+                        help="Prévia: detecta só numa amostra estratificada de N registros (órgão × ano × tipo de ato) "
+                             "e projeta os totais do corpus, sem gravar nada")
+    parser.add_argument("--seed", type=int, default=42, help="Semente da amostra do --sample")
+    parser.add_argument("--explain", "--dry-run", action="store_true", dest="explain",
+                        help="Mostra o plano de execução e o tempo de inicialização, sem processar nada")
+    args = parser.parse_args(argv)
+    args.stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    args.sources = [s.strip() for s in args.sources.split(",") if s.strip()]
+    args.orgao = [s.strip() for s in args.orgao.split(",") if s.strip()]
+    # Registros específicos a reprocessar (preenchido pelo --watch)
+    args.source_ids = None
+    unknown = [s for s in args.stages if s not in STAGE_NAMES]
+    if unknown:
+        parser.error(f"etapas desconhecidas: {', '.join(unknown)}")
+    return args
+
+def record_filter(args):
+    from sources import RecordFilter
+    from build_aggregates import normalize_orgao
+
+    return RecordFilter(args.since, args.until, frozenset(normalize_orgao(o) for o in args.orgao),
+                        args.source_ids)
+
+def track_sources(source, records, run_sources):
+    """Records the metadata of every record a source yields (for the event store)."""
+    from sources import orgao_label
+
+    for record in records:
+        label = orgao_label(record.orgao_hint) if record.orgao_hint else None
+        run_sources[record.source_id] = {"source": source.name, "date": record.date, "orgao": label}
+        yield record
 
-    events = []
-
-    # 2) Process PDFs (DEJT)
-    pdf_dir = "pdfs" if os.path.exists("pdfs") else os.path.join("pipeline", "pdfs")
-    date_pdf = os.environ.get("DATA_REF", "2026-01-30")
-
-    if os.path.exists(pdf_dir) and os.path.isdir(pdf_dir):
-        print("📄 Processando PDFs do DEJT...")
-        for name in os.listdir(pdf_dir):
-            if not name.lower().endswith(".pdf"):
-                continue
-            path = os.path.join(pdf_dir, name)
-            text = pdf_to_text(path)
-            events.extend(detect_events(text, rules, date_pdf, source_pdf=name))
-
-    # 3) Process DOU Historical Data (BigQuery Cache)
-    # We use the specific functions from our ingestion script
-    from ingest_dou import query_dou_history, load_dou_as_text_blocks
-    
-    print("\n🔍 Verificando dados históricos do DOU...")
-    # This will load from cache if already downloaded (9,187 records)
+def explain(args) -> int:
+    """
+    Prints the execution plan and checks the startup-time budget.
+    Returns a non-zero exit code if startup exceeded STARTUP_BUDGET_S or
+    a heavy dependency was imported eagerly, so it can be used as a CI check.
+    """
+    startup = time.perf_counter() - _T0
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    print("📋 Plano de execução:")
+    for name, desc, deps in STAGES:
+        mark = "▶" if name in args.stages else "·"
+        deps_str = f" [{', '.join(deps)}]" if deps else ""
+        print(f"   {mark} {name}: {desc}{deps_str}")
+    if "detect" in args.stages:
+        from sources import load_sources
+        for source in load_sources(find_config("sources.yaml"), only=args.sources):
+            print(f"       - {source.name}: {source.describe()}")
+        print(f"       workers: {args.workers}, deduplicação: {args.dedup}")
+        filt = record_filter(args)
+        if filt.active:
+            print(f"       filtro: {filt.since or '...'} a {filt.until or '...'}, órgãos: {', '.join(sorted(filt.orgaos)) or 'todos'}")
+    print(f"\n⏱️  Inicialização: {startup * 1000:.0f} ms (orçamento: {STARTUP_BUDGET_S * 1000:.0f} ms)")
+    if loaded:
+        print(f"⚠️  Dependências pesadas importadas na inicialização: {', '.join(loaded)}")
+
+    return 0 if startup <= STARTUP_BUDGET_S and not loaded else 1
+
+def watch(args, stop=lambda: False) -> int:
+    """
+    Daemon mode: polls the watch files of every source (PDFs, archives,
+    parquet partitions, text dumps) and, for each debounced batch of
+    new/changed/removed files, reruns detection on just those records,
+    source by source, then ground truth and aggregates once.
+    """
+    from collections import defaultdict
+
+    from sources import load_sources
+    from watch import FileWatcher
+
+    sources = load_sources(find_config("sources.yaml"), only=args.sources)
+
+    def list_files():
+        for source in sources:
+            for path in source.watch_files():
+                yield path, source.name
+
+    def source_of(path):
+        name = watcher.owner(path)
+        if name:
+            return name
+        # Estado antigo, sem a fonte de cada arquivo: a fonte cujo diretório o contém
+        for source in sources:
+            base = getattr(source, "path", None)
+            if base and (path == base or path.startswith(os.path.join(base, ""))):
+                return source.name
+        return None
+
+    watcher = FileWatcher(list_files, interval=args.watch_interval, debounce=args.debounce,
+                          sources={s.name for s in sources})
+    print(f"👀 Observando {', '.join(s.name for s in sources) or 'nenhuma fonte'} "
+          f"(varredura a cada {args.watch_interval:g}s, lotes após {args.debounce:g}s sem chegadas; Ctrl+C para parar)")
     try:
-        df_dou = query_dou_history(start_date="2019-01-01", end_date="2024-12-31", use_cache=True)
-    except Exception as e:
-        print(f"⚠️ Erro ao acessar BigQuery: {e}")
-        df_dou = None
-    
-    if df_dou is not None and len(df_dou) > 0:
-        print(f"⌛ Processando {len(df_dou)} registros do DOU...")
-        dou_blocks = load_dou_as_text_blocks(df_dou)
-        
-        # We can process in batches if needed, but 9k is manageable in memory
-        for i, block in enumerate(dou_blocks):
-            if i % 500 == 0 and i > 0:
-                print(f"   ... {i} registros processados")
-                
-            # Process each DOU record as a separate source
-            # detect_events extraction logic is the same for text
-            dou_events = detect_events(
-                block['text'], 
-                rules, 
-                block['date'], 
-                source_pdf=f"DOU_{block['date']}"
+        for batch in watcher.batches(stop):
+            print(f"\n👀 {len(batch)} arquivos novos/alterados/removidos")
+            per_source = defaultdict(list)
+            for path in batch:
+                per_source[source_of(path)].append(path)
+
+            # Sem fonte conhecida (estado antigo de uma fonte que saiu do sources.yaml): só esquece
+            done = per_source.pop(None, [])
+            for path in done:
+                print(f"⚠️  {path}: nenhuma fonte observada o reconhece; removido do estado do watch")
+            for source in sources:
+                changed = per_source.get(source.name)
+                if not changed:
+                    continue
+                run_args = argparse.Namespace(**vars(args))
+                run_args.watch = False
+                run_args.stages = [s for s in args.stages if s in ("detect", "candidates")]
+                run_args.sources = [source.name]
+                run_args.source_ids = source.watch_ids(changed)
+                try:
+                    run(run_args)
+                except Exception as e:
+                    # Fica pendente: o próximo lote tenta de novo
+                    print(f"❌ {source.name}: {e!r}")
+                    continue
+                done.extend(changed)
+
+            post_stages = [s for s in args.stages if s not in ("detect", "candidates")]
+            if done and post_stages:
+                run_args = argparse.Namespace(**vars(args))
+                run_args.watch = False
+                run_args.stages = post_stages
+                run(run_args)
+            watcher.commit(done)
+    except KeyboardInterrupt:
+        print("\n👋 Watch encerrado")
+    return 0
+
+def sample(args) -> int:
+    """
+    Preview mode: detection on a stratified, seeded sample of the records
+    only. Reports the funnel, "Não identificado" rates, per-term hits and
+    projected corpus counts; the store, indexes and JSONs are not touched.
+    """
+    import yaml
+    from build_aggregates import write_json
+    from event_store import EventStore, DEFAULT_PATH
+    from rules_impact import TermIndex
+    from sample import SampleStats, StratifiedReservoir, frame_from_store, print_report, text_stratum
+    from sources import load_sources
+
+    with open(find_config("rules.yaml"), "r", encoding="utf-8") as f:
+        rules = yaml.safe_load(f)
+    t0 = time.perf_counter()
+    sources = load_sources(find_config("sources.yaml"), only=args.sources, rules=rules)
+    filt = record_filter(args)
+    reservoir = StratifiedReservoir(args.sample, args.seed)
+
+    frame = frame_from_store(EventStore(args.store or DEFAULT_PATH), TermIndex(TERM_INDEX_PATH), rules,
+                             {s.name for s in sources}, filt)
+    if frame:
+        # Metadados das execuções anteriores: só os registros sorteados são lidos
+        for sid in sorted(frame):
+            reservoir.offer(frame[sid], sid)
+    else:
+        # O reservatório guarda só ids e estratos; os sorteados são lidos de novo abaixo
+        print("⚠️  Store sem metadados destas fontes: lendo o corpus uma vez para sortear a amostra")
+        for s in sources:
+            for r in s.records(filt):
+                reservoir.offer(text_stratum(r, rules), r.source_id)
+    chosen = {sid: stratum for stratum, ids in reservoir.sample().items() for sid in ids}
+    print(f"🎲 {len(chosen)} registros sorteados de {sum(reservoir.sizes.values())}"
+          + (" conhecidos pelo store" if frame else "") + f" (semente {args.seed})")
+    filt = filt._replace(source_ids=frozenset(chosen))
+    sampled = ((r, chosen[r.source_id]) for s in sources for r in s.records(filt) if r.source_id in chosen)
+
+    stats = SampleStats(rules)
+    for record, stratum in sampled:
+        stats.detect(record, stratum)
+    report = stats.report(dict(reservoir.sizes))
+    print_report(report, sum(reservoir.sizes.values()), time.perf_counter() - t0)
+    write_json(SAMPLE_PATH, dict(report, semente=args.seed, populacao=sum(reservoir.sizes.values())))
+    print(f"💾 Relatório da amostra em {SAMPLE_PATH}")
+    return 0
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.explain:
+        return explain(args)
+    if args.sample:
+        return sample(args)
+    if args.watch:
+        return watch(args)
+    return run(args)
+
+def within_max_changes(store, max_changes: int) -> bool:
+    """Diffs the store against the last published one; False (with a report) past max_changes."""
+    from build_aggregates import read_json
+    from detect_events import events_to_dicts
+    from diff_events import diff_events, print_diff, total_changes
+
+    previous = read_json(PREVIOUS_STORE_PATH)
+    if previous is None:
+        print("⚠️  Nenhuma publicação anterior registrada: todos os eventos contam como adicionados")
+    diff = diff_events((previous or {}).get("events", []), events_to_dicts(store.events))
+    print_diff(diff, limit=10)
+    if total_changes(diff) > max_changes:
+        print(f"❌ {total_changes(diff)} mudanças desde a última publicação (limite: {max_changes}): "
+              f"agregados não publicados. Confira com `python diff_events.py` e publique sem o --max-changes.")
+        return False
+    return True
+
+def run(args) -> int:
+    """
+    Runs the selected stages once. The stages read, merge and write back
+    the event store and the state around it, so a run holds RUN_LOCK_PATH
+    throughout: a second job started meanwhile waits for it.
+    """
+    from cache import FileLock
+
+    with FileLock(RUN_LOCK_PATH):
+        return run_stages(args)
+
+def run_stages(args) -> int:
+    import yaml
+    from detect_events import events_to_dicts
+    from memory import MemoryMonitor, format_size, parse_size
+
+    budget = parse_size(args.memory_budget) if args.memory_budget else None
+    monitor = MemoryMonitor(budget)
+
+    # 1) regras
+    with open(find_config("rules.yaml"), "r", encoding="utf-8") as f:
+        rules = yaml.safe_load(f)
+
+    from event_store import EventStore, DEFAULT_PATH
+    store = EventStore(args.store or DEFAULT_PATH)
+
+    # 2) Detecção: todas as fontes (DEJT, DOU, ...) passam pelo mesmo motor
+    if "detect" in args.stages:
+        monitor.enter("detect")
+        from sources import load_sources
+        from engine import BLOCKS_PER_CHUNK, SLOW_LANE_FACTOR, detect_records
+
+        from rules_impact import TermIndex, affected_records
+
+        sources = load_sources(find_config("sources.yaml"), only=args.sources, rules=rules)
+        filt = record_filter(args)
+        # Rodada que deixa o store inteiro coerente com as regras atuais (uma rodada
+        # --rules-delta só conta se nenhum outro filtro restringir o que ela refaz)
+        full_run = not filt.active and not args.sources and not args.retry_quarantine
+        term_index = TermIndex(TERM_INDEX_PATH)
+        for source in sources:
+            source.index_text = term_index.add
+
+        # Fontes cuja extração (backend, triagem) mudou desde que seus registros foram lidos
+        reextract = {s.name for s in sources if store.extraction.get(s.name, {}) != s.settings()}
+
+        if args.rules_delta:
+            affected, per_term = affected_records(term_index, store.rules or {}, rules) if store.rules else (None, {})
+            for term, count in per_term.items():
+                print(f"   {term}: {count} registros")
+            if reextract:
+                print(f"⚠️  Extração mudou em {', '.join(sorted(reextract))}: reprocessando tudo.")
+                affected = None
+            elif affected is None:
+                print("⚠️  Mudança nas regras não delimitável pelo índice: reprocessando tudo.")
+            else:
+                # Registros que nunca passaram pelo índice também precisam ser refeitos
+                affected |= set(store.sources) - set(term_index.positions)
+                print(f"📌 Regras alteradas afetam {len(affected)} registros")
+                filt = filt._replace(source_ids=frozenset(affected))
+
+        from build_aggregates import read_json, write_json
+        quarantine_log = read_json(QUARANTINE_PATH, {})
+        timeout = args.record_timeout or None
+        if args.retry_quarantine:
+            ids = frozenset(quarantine_log)
+            filt = filt._replace(source_ids=ids if filt.source_ids is None else filt.source_ids & ids)
+            timeout = args.slow_timeout or (timeout * SLOW_LANE_FACTOR if timeout else None)
+            print(f"🚧 Reprocessando {len(ids)} registros em quarentena")
+
+        print(f"📄 Fontes: {', '.join(s.name for s in sources) or 'nenhuma'}")
+        if filt.active:
+            print(f"🔎 Filtro: {filt.since or '...'} a {filt.until or '...'}, órgãos: {', '.join(sorted(filt.orgaos)) or 'todos'}"
+                  + (f", registros: {len(filt.source_ids)}" if filt.source_ids is not None else ""))
+
+        # PDFs inalterados já detectados com estas regras e a mesma extração podem ser pulados
+        for source in sources:
+            same = store.rules == rules and source.name not in reextract
+            source.processed = set(store.sources) if same else set()
+
+        dedup = None
+        if args.dedup != "off":
+            from dedup import Deduplicator
+            # O índice persiste entre execuções: uma rodada parcial ainda reconhece
+            # duplicados cujo registro canônico ficou fora da fatia. Um canônico só
+            # suprime outro registro enquanto está no store e fora da quarentena
+            dedup = Deduplicator.load(DEDUP_INDEX_PATH, near=args.dedup == "near",
+                                      live=lambda sid: sid in store.sources and sid not in quarantine_log)
+
+        # Candidatos para auditoria: blocos dos registros lidos nesta rodada, coletados
+        # pelos workers da detecção
+        exporter = None
+        if "candidates" in args.stages:
+            from export_candidates import CandidateExporter, batch_dir
+            exporter = CandidateExporter(rules, batch_dir(), find_config("ground_truth.json"))
+
+        quarantined = {}
+        def quarantine(record, error, lane):
+            print(f"🚧 Quarentena: {record.source_id} ({error})")
+            quarantined[record.source_id] = {
+                "source": run_sources.get(record.source_id, {}).get("source"),
+                "date": record.date,
+                "reason": error.reason,
+                "detail": error.detail,
+                "lane": lane,
+                "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+
+        def retry(record, error):
+            print(f"⏱️  {record.source_id}: {error} — fica para a faixa lenta")
+
+        def slow_lane(count, slow_timeout):
+            print(f"🐢 Faixa lenta: {count} registros, orçamento de {slow_timeout or 'ilimitado'}s por tarefa")
+
+        governor = None
+        if budget:
+            from memory import MemoryGovernor
+            governor = MemoryGovernor(monitor, max_in_flight=max(1, args.workers) * 4, blocks_per_chunk=BLOCKS_PER_CHUNK)
+            print(f"🧠 Orçamento de memória: {format_size(budget)}")
+
+        from sources import RecordFilter
+        selected = {s.name for s in sources}
+        removed, added = [], []
+        any_quarantined = False
+        pass_filt, passes = filt, 0
+        while True:
+            passes += 1
+            run_sources = {}
+            quarantined.clear()
+            records = (r for s in sources for r in track_sources(s, s.records(pass_filt), run_sources))
+            records = term_index.indexing(records)
+            if dedup is not None:
+                records = dedup.filter(records)
+
+            new_events = []
+            detected = detect_records(records, rules, workers=args.workers, timeout=timeout,
+                                      slow_timeout=args.slow_timeout, on_quarantine=quarantine,
+                                      on_retry=retry, on_slow_lane=slow_lane,
+                                      governor=governor, on_candidates=exporter.add if exporter else None,
+                                      candidate_context=exporter.context_blocks if exporter else 1)
+            for i, (record, record_events) in enumerate(detected, 1):
+                if i % 500 == 0:
+                    print(f"   ... {i} registros processados")
+                new_events.extend(record_events)
+
+            # Quarentena: sai quem foi processado agora; quem falhou não entra no store
+            # (mantém os eventos de uma execução anterior, se houver) e é tentado de novo depois
+            for sid in run_sources:
+                if sid not in quarantined:
+                    quarantine_log.pop(sid, None)
+            for sid, entry in quarantined.items():
+                entry["attempts"] = quarantine_log.get(sid, {}).get("attempts", 0) + 1
+                quarantine_log[sid] = entry
+                run_sources.pop(sid, None)
+            any_quarantined = any_quarantined or bool(quarantined)
+
+            # Substitui no store apenas a fatia reprocessada (fontes/datas/órgãos do filtro),
+            # mantendo os registros que as fontes pularam por estarem inalterados e os em quarentena
+            kept = set().union(*(s.unchanged for s in sources)) | set(quarantined)
+            pass_removed, pass_added = store.merge(
+                run_sources, new_events,
+                in_scope=lambda sid, meta: (
+                    meta.get("source") in selected and sid not in kept and pass_filt.matches_id(sid)
+                    and pass_filt.covers(meta.get("date", ""), meta.get("orgao"))
+                ),
             )
-            events.extend(dou_events)
-
-    # 3.5) Merge with Ground Truth (Historical Audit)
-    gt_path = "ground_truth.json" if os.path.exists("ground_truth.json") else os.path.join("pipeline", "ground_truth.json")
-    
-    # Events currently are dataclasses, we need to convert to/from dict if apply_ground_truth uses dicts
-    # Or just handle it inside apply_ground_truth
-    # Let's convert them to dicts for easier manipulation
-    event_dicts = []
-    for e in events:
-        d = {
-            "orgao": e.orgao,
-            "destino": e.destino,
-            "date": e.date,
-            "mes": e.mes,
-            "confidence": e.confidence,
-            "source_pdf": e.source_pdf,
-            "nome": e.nome,
-            "ref_date": e.ref_date,
-            "tipo": e.tipo
-        }
-        event_dicts.append(d)
-        
-    final_event_dicts = apply_ground_truth(event_dicts, gt_path)
-    
-    # Convert back to Event dataclasses for build_outputs (if it expects objects)
-    # Actually build_outputs expects List[Event]
-    from detect_events import Event
-    final_events = []
-    for d in final_event_dicts:
-        final_events.append(Event(**d))
-
-    # 4) Save results
-    os.makedirs(OUT_DIR, exist_ok=True)
-    build_outputs(final_events, OUT_DIR)
+            removed += pass_removed
+            added += pass_added
+
+            # Duplicados descartados (agora ou antes) cujo canônico saiu do store, foi
+            # para a quarentena ou mudou de texto: são detectados por conta própria
+            if dedup is None:
+                break
+            orphans = {sid for sid in dedup.orphans(set(store.sources) - set(quarantine_log))
+                       if store.sources[sid].get("source") in selected}
+            if not orphans:
+                break
+            if passes >= DEDUP_PASSES:
+                print(f"⚠️  {len(orphans)} duplicados ainda sem registro canônico válido; ficam para a próxima execução")
+                break
+            print(f"🧬 {len(orphans)} duplicados perderam o registro canônico: detectando-os por conta própria")
+            pass_filt = RecordFilter(source_ids=frozenset(orphans))
+            for source in sources:
+                source.processed = set()
+
+        if governor is not None:
+            print(f"🧠 {governor.summary()}")
+
+        if exporter is not None:
+            paths = exporter.close()
+            print(f"📝 Candidatos: {exporter.report()}" + (f" em {os.path.dirname(paths[0])}" if paths else ""))
+
+        for source in sources:
+            summary = source.report()
+            if summary:
+                print(f"📊 {source.name}: {summary}")
+
+        if dedup is not None:
+            print(f"🧬 Duplicados descartados antes da detecção: {dedup.dropped}")
+            # Ids que saíram do store não suprimem mais nada
+            dedup.prune(set(store.sources))
+            write_json(DUPLICATES_PATH, dict(sorted(dedup.duplicates.items())))
+            dedup.save(DEDUP_INDEX_PATH)
+
+        write_json(QUARANTINE_PATH, dict(sorted(quarantine_log.items())))
+        if quarantine_log:
+            print(f"🚧 {len(quarantine_log)} registros em quarentena ({QUARANTINE_PATH}); use --retry-quarantine")
+
+        # O snapshot das regras só vale quando todo o store foi detectado com elas
+        if full_run and not any_quarantined:
+            store.rules = rules
+        elif store.rules is not None and store.rules != rules:
+            print("⚠️  rules.yaml mudou, mas esta rodada parcial não atualiza o snapshot de regras do store.")
+        # O da extração, quando todos os registros das fontes selecionadas foram relidos
+        # ou pulados por estarem inalterados com a extração atual
+        if not filt.active and not any_quarantined:
+            for source in sources:
+                store.extraction[source.name] = source.settings()
+        store.save()
+        term_index.save()
+        print(f"🗃️  Store de eventos: -{len(removed)} +{len(added)} (total {len(store.events)})")
+
+        # Índice de carreiras: aplica só o delta do store (ou constrói, na primeira vez)
+        from careers import CareerIndex
+        careers = CareerIndex()
+        if careers.built:
+            careers.apply(removed, added)
+        else:
+            careers.rebuild(store.events)
+        careers.save()
+
+    if "candidates" in args.stages and "detect" not in args.stages:
+        print("⚠️  A etapa candidates roda junto com a detect; para exportar o corpus inteiro use export_candidates.py")
+
+    events = store.events
+    final_count = len(events)
+    exit_code = 0
+
+    if "ground_truth" in args.stages:
+        from careers import CareerIndex
+        careers = CareerIndex()
+        fresh = not careers.built
+        if fresh:
+            careers.rebuild(store.events)
+        if careers.sync_ground_truth(find_config("ground_truth.json")) or fresh:
+            careers.save()
+
+    # Gate de publicação: mudanças no store desde a última publicação
+    publish_aggregates = "aggregates" in args.stages
+    if publish_aggregates and args.max_changes is not None and not within_max_changes(store, args.max_changes):
+        publish_aggregates, exit_code = False, 1
+
+    # 3.5 + 4) Ground truth e agregados: mantidos incrementalmente a partir do que
+    # mudou no store (e no ground truth) desde a última execução
+    if publish_aggregates:
+        monitor.enter("aggregates")
+        from aggregate_state import OUTPUTS, AggregateState
+        from build_aggregates import MANIFEST_NAME, publish
+
+        gt_path = find_config("ground_truth.json") if "ground_truth" in args.stages else None
+        state = AggregateState()
+        sync = state.sync(store, gt_path)
+        if sync["rebuilt"]:
+            print(f"🧮 Agregados reconstruídos ({state.total} eventos)")
+        else:
+            print(f"🧮 Agregados: {sync['changed']} de {sync['keys']} chaves alteradas"
+                  + (f" (meses: {', '.join(sync['meses'])}; órgãos: {', '.join(sync['orgaos'])})" if sync["changed"] else ""))
+
+        os.makedirs(OUT_DIR, exist_ok=True)
+        # Só as saídas afetadas pelo sync são recodificadas; publicação incompleta regrava tudo
+        names = state.dirty_outputs
+        if names is not None and not all(os.path.exists(os.path.join(OUT_DIR, n)) for n in OUTPUTS + (MANIFEST_NAME,)):
+            names = None
+        changed = publish(OUT_DIR, state.outputs(names), partial=names is not None)
+        if changed:
+            print(f"✅ Agregados atualizados em {OUT_DIR}: {', '.join(changed)}")
+        else:
+            print(f"✅ Agregados sem alterações em {OUT_DIR}")
+
+        if args.verify_aggregates:
+            mismatched = state.verify(store, gt_path)
+            if mismatched:
+                print(f"❌ Agregados incrementais divergem do recálculo completo: {', '.join(mismatched)}")
+                exit_code = 1
+            else:
+                print("✅ Agregados incrementais idênticos ao recálculo completo")
+
+        # O estado é gravado antes de limpar as chaves pendentes do store:
+        # se algo falhar no meio, a próxima execução só as revisita de novo
+        state.save()
+        if store.dirty:
+            store.dirty = set()
+            store.save()
+        # O que acabou de ser publicado é a base do próximo diff
+        store.snapshot(PREVIOUS_STORE_PATH)
+        final_count = state.total
+
+    elif "ground_truth" in args.stages:
+        # 3.5) Merge with Ground Truth (Historical Audit)
+        monitor.enter("ground_truth")
+        from apply_ground_truth import apply_ground_truth
+
+        gt_path = find_config("ground_truth.json")
+        # Events are slotted dataclasses; apply_ground_truth works on dicts
+        final_event_dicts = apply_ground_truth(events_to_dicts(events), gt_path)
+        final_count = len(final_event_dicts)
+
+    monitor.stop()
+    print("\n📈 Pico de memória por etapa" + (f" (orçamento {format_size(budget)}):" if budget else ":"))
+    for line in monitor.report():
+        print(line)
 
     print(f"\n✨ FINALIZADO ✨")
-    print(f"Total de eventos detectados: {len(final_events)}")
+    print(f"Total de eventos detectados: {final_count}")
     print(f"JSONs atualizados em: {OUT_DIR}")
+    return exit_code
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Stratified sample preview for rule iteration (`run.py --sample N`).
+
+Draws a seeded sample of records stratified by organ, publication year
+and act type (ingresso/saída, from the rules' entry/exit patterns), runs
+detection on it only and reports the detection funnel, the "Não
+identificado" rates, hits per rule term and the full-corpus counts
+projected from the sample, with 95% confidence intervals (stratified
+estimator, finite population correction).
+
+The sampling frame is the metadata of the previous runs (event store
+sources + term index), so only the sampled records are read. Without it
+(first run), the records are streamed once through a reservoir per
+stratum that keeps only their ids, and the sampled ones are read again.
+"""
+import math
+import random
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+from detect_events import block_contexts, contains_any, detect_block, keyword_regex, split_blocks
+
+DEFAULT_SEED = 42
+Z_95 = 1.96
+NAO_IDENTIFICADO = "Não identificado"
+# Listas de termos com contagem de acertos por termo
+HIT_LISTS = ("exit_patterns", "entry_patterns", "skip_patterns", "ti_keywords")
+# Métricas por registro projetadas para o corpus
+METRICS = ("eventos", "evasoes", "ingressos", "nome_nao_identificado", "cargo_nao_identificado")
+
+Stratum = Tuple[str, str, str]
+
+def act_type(is_entry: Optional[bool], is_exit: Optional[bool]) -> str:
+    if is_entry is None:
+        return "?"
+    if is_entry and is_exit:
+        return "ambos"
+    return "ingresso" if is_entry else "saída" if is_exit else "outro"
+
+def text_stratum(record, rules: Dict) -> Stratum:
+    """(organ, year, act type) of a Record, from its own metadata and text."""
+    text = record.text
+    return (record.orgao_hint or "?", record.date[:4],
+            act_type(contains_any(text, rules.get("entry_patterns", [])), contains_any(text, rules["exit_patterns"])))
+
+class StratifiedReservoir:
+    """
+    Uniform sample of up to `n` items per stratum from a stream (one
+    reservoir per stratum), plus the stratum sizes. sample() then keeps
+    n items in total, allocated to the strata in proportion to their size
+    (at least one per stratum when n allows).
+    """
+    def __init__(self, n: int, seed: int = DEFAULT_SEED):
+        self.n = n
+        self.rng = random.Random(seed)
+        self.sizes: Counter = Counter()
+        self.items: Dict[Hashable, List] = defaultdict(list)
+
+    def offer(self, stratum: Hashable, item):
+        self.sizes[stratum] += 1
+        seen, items = self.sizes[stratum], self.items[stratum]
+        if len(items) < self.n:
+            items.append(item)
+        else:
+            j = self.rng.randrange(seen)
+            if j < self.n:
+                items[j] = item
+
+    def allocation(self) -> Dict[Hashable, int]:
+        total = sum(self.sizes.values())
+        if not total:
+            return {}
+        strata = sorted(self.sizes)
+        floor = 1 if self.n >= len(strata) else 0
+        quotas = {s: max(floor, self.n * self.sizes[s] / total) for s in strata}
+        alloc = {s: min(self.sizes[s], int(q)) for s, q in quotas.items()}
+        # O mínimo de um por estrato pode estourar n: devolve dos maiores
+        while sum(alloc.values()) > self.n:
+            largest = max(strata, key=lambda s: (alloc[s], s))
+            alloc[largest] -= 1
+        # Maiores restos até completar n
+        for s in sorted(strata, key=lambda s: (int(quotas[s]) - quotas[s], s)):
+            if sum(alloc.values()) >= self.n:
+                break
+            if alloc[s] < self.sizes[s]:
+                alloc[s] += 1
+        return alloc
+
+    def sample(self) -> Dict[Hashable, List]:
+        # O reservatório é uma amostra uniforme do estrato; embaralhado, qualquer prefixo também é
+        chosen = {}
+        for s, k in self.allocation().items():
+            items = list(self.items[s])
+            self.rng.shuffle(items)
+            chosen[s] = items[:k]
+        return chosen
+
+def frame_from_store(store, term_index, rules: Dict, source_names: Set[str], filt) -> Dict[str, Stratum]:
+    """
+    Sampling frame from previous runs: source_id -> stratum for the records
+    of the selected sources in the store that pass the filter. The act
+    type comes from the term index (records holding an entry/exit term).
+    """
+    def with_any(terms: List[str]) -> Optional[Set[str]]:
+        hits: Set[str] = set()
+        for term in terms:
+            found = term_index.records_with(term)
+            if found is None:
+                return None
+            hits |= found
+        return hits
+
+    entry_ids = with_any(rules.get("entry_patterns", []))
+    exit_ids = with_any(rules["exit_patterns"])
+    frame = {}
+    for sid, meta in store.sources.items():
+        if meta.get("source") not in source_names or not filt.matches_id(sid):
+            continue
+        if not filt.matches(meta.get("date", ""), meta.get("orgao")):
+            continue
+        if sid in term_index.positions and entry_ids is not None and exit_ids is not None:
+            kind = act_type(sid in entry_ids, sid in exit_ids)
+        else:
+            kind = "?"
+        frame[sid] = (meta.get("orgao") or "?", (meta.get("date") or "")[:4], kind)
+    return frame
+
+class SampleStats:
+    """Detection funnel, rule hits and per-record metrics of the sampled records."""
+    def __init__(self, rules: Dict):
+        self.rules = rules
+        self.funnel = Counter()
+        # Um regex por termo, fora do cache de keyword_regex (que é das listas inteiras)
+        self.term_regexes = {key: {t: keyword_regex.__wrapped__((t,)) for t in rules.get(key) or []} for key in HIT_LISTS}
+        self.hits = {key: Counter() for key in HIT_LISTS}
+        self.event_hits = {key: Counter() for key in HIT_LISTS}
+        # estrato -> valores por registro de cada métrica
+        self.values: Dict[Stratum, Dict[str, List[int]]] = defaultdict(lambda: {m: [] for m in METRICS})
+        self.events = []
+
+    def detect(self, record, stratum: Stratum):
+        rules = self.rules
+        blocks = split_blocks(record.text)
+        bnorms, contexts = block_contexts(record.text, blocks)
+        f = self.funnel
+        f["registros"] += 1
+        counts = Counter()
+        for bnorm, ctx in zip(bnorms, contexts):
+            f["blocos"] += 1
+            matched = {key: [t for t, r in regexes.items() if r.search(bnorm)] for key, regexes in self.term_regexes.items()}
+            for key, terms in matched.items():
+                self.hits[key].update(terms)
+            if matched["skip_patterns"]:
+                continue
+            f["blocos sem skip_patterns"] += 1
+            if not (matched["exit_patterns"] or matched["entry_patterns"]):
+                continue
+            f["com saída/ingresso"] += 1
+            if not matched["ti_keywords"]:
+                continue
+            f["com termos de TI"] += 1
+            event = detect_block(bnorm, ctx, rules, record.date, record.source_id)
+            if event is None:
+                continue
+            f["eventos"] += 1
+            for key, terms in matched.items():
+                self.event_hits[key].update(terms)
+            self.events.append(event)
+            counts["eventos"] += 1
+            counts["evasoes" if event.tipo == "evasão" else "ingressos"] += 1
+            counts["nome_nao_identificado"] += event.nome == NAO_IDENTIFICADO
+            counts["cargo_nao_identificado"] += event.role == NAO_IDENTIFICADO
+        for m in METRICS:
+            self.values[stratum][m].append(counts[m])
+
+    def projections(self, sizes: Dict[Stratum, int]) -> Dict[str, Dict]:
+        """
+        Full-corpus totals: sum over strata of N_h * mean_h, with variance
+        sum N_h^2 (1 - n_h/N_h) s_h^2 / n_h. Strata with a single sampled
+        record use the pooled within-stratum variance; strata left out of
+        the sample (N smaller than the number of strata) are estimated
+        together from the mean and variance of the whole sample.
+        """
+        out = {}
+        missing = sum(N for s, N in sizes.items() if s not in self.values)
+        for m in METRICS:
+            pooled_num = pooled_den = 0.0
+            per_stratum = []
+            everything = []
+            for s, vals in self.values.items():
+                ys = vals[m]
+                everything.extend(ys)
+                n = len(ys)
+                mean = sum(ys) / n
+                var = sum((y - mean) ** 2 for y in ys) / (n - 1) if n > 1 else None
+                if var is not None:
+                    pooled_num += var * (n - 1)
+                    pooled_den += n - 1
+                per_stratum.append((sizes[s], n, mean, var))
+            pooled = pooled_num / pooled_den if pooled_den else 0.0
+            total = variance = 0.0
+            for N, n, mean, var in per_stratum:
+                total += N * mean
+                variance += N * N * (1 - n / N) * (pooled if var is None else var) / n
+            if missing and everything:
+                n = len(everything)
+                mean = sum(everything) / n
+                total += missing * mean
+                if n > 1:
+                    variance += missing * missing * sum((y - mean) ** 2 for y in everything) / (n - 1) / n
+            half = Z_95 * math.sqrt(variance)
+            out[m] = {"estimativa": round(total, 1), "ic95": [round(max(0.0, total - half), 1), round(total + half, 1)],
+                      "amostra": sum(everything)}
+        return out
+
+    def report(self, sizes: Dict[Stratum, int]) -> Dict:
+        events = self.funnel["eventos"]
+        rates = {
+            "nome": sum(e.nome == NAO_IDENTIFICADO for e in self.events),
+            "cargo": sum(e.role == NAO_IDENTIFICADO for e in self.events),
+            "destino": sum(e.destino == "Desconhecido" or e.destino.startswith("Não informado") for e in self.events),
+        }
+        return {
+            "funil": dict(self.funnel),
+            "nao_identificado": {k: {"eventos": v, "taxa": round(v / events, 4) if events else None} for k, v in rates.items()},
+            "regras": {
+                key: {t: {"blocos": self.hits[key][t], "eventos": self.event_hits[key][t]} for t in self.term_regexes[key]}
+                for key in HIT_LISTS
+            },
+            "projecao": self.projections(sizes),
+            "estratos": [
+                {"orgao": s[0], "ano": s[1], "tipo": s[2], "registros": sizes[s],
+                 "amostra": len(self.values[s]["eventos"]) if s in self.values else 0}
+                for s in sorted(sizes)
+            ],
+        }
+
+def print_report(report: Dict, population: int, elapsed: float, top: int = 8):
+    f = report["funil"]
+    strata = report["estratos"]
+    print(f"\n🧪 Amostra: {f.get('registros', 0)} de {population} registros, "
+          f"{sum(1 for s in strata if s['amostra'])} de {len(strata)} estratos (órgão × ano × tipo de ato), {elapsed:.1f}s")
+    if any(not s["amostra"] for s in strata):
+        print("   ⚠️  N menor que o número de estratos: os estratos fora da amostra entram na projeção pela média geral")
+    print("   Funil: " + " → ".join(f"{k} {v}" for k, v in f.items()))
+    for field, r in report["nao_identificado"].items():
+        taxa = f"{r['taxa']:.1%}" if r["taxa"] is not None else "-"
+        print(f"   {field} \"Não identificado\": {r['eventos']} ({taxa})")
+    print("   Projeção para o corpus (IC 95%):")
+    for m, p in report["projecao"].items():
+        lo, hi = p["ic95"]
+        print(f"     {m:<24} {p['estimativa']:>10.1f}  [{lo:.1f}, {hi:.1f}]  (na amostra: {p['amostra']})")
+    for key, terms in report["regras"].items():
+        ranked = sorted(terms.items(), key=lambda kv: (-kv[1]["blocos"], kv[0]))
+        zero = [t for t, h in ranked if not h["blocos"]]
+        shown = ", ".join(f"{t} {h['blocos']}/{h['eventos']}" for t, h in ranked[:top] if h["blocos"])
+        print(f"   {key} (blocos/eventos): {shown or '-'}" + (f"; sem acertos: {len(zero)}" if zero else ""))
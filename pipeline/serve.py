@@ -0,0 +1,236 @@
+"""
+Local read-only query service over the detected events.
+
+Loads the event store once (with the ground truth applied, as run.py does
+before building the aggregates), indexes the events by month, organ,
+destination category and type, and answers filtered aggregates over HTTP:
+
+    python serve.py --port 8765
+
+    GET /api/agregados?inicio=2023-01&fim=2023-12&orgao=trt7&destino=aposentadoria&tipo=saída
+    GET /api/series_mensal?orgao=trt2        (also top_orgaos, top_destinos, metricas)
+    GET /api/dimensoes                       (filter values available)
+    GET /data/series_mensal.json             (same payloads as the static JSONs)
+    GET /data/eventos.bin                    (events in the columnar format, see columnar.py)
+
+Repeated filters (orgao=trt1&orgao=trt2) are OR'ed; different filters are
+AND'ed. Responses are cached (LRU) per normalized query and carry an ETag,
+so a revalidation with If-None-Match gets a 304 without a body.
+"""
+import argparse
+import bisect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from build_aggregates import aggregate, as_record, content_hash, destino_category, event_month, normalize_orgao
+
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PORT = 8765
+CACHE_SIZE = 256
+
+OUTPUTS = ("series_mensal", "top_orgaos", "top_destinos", "metricas")
+# Filtros aceitos na query string -> dimensão do índice
+FILTERS = ("orgao", "destino", "tipo")
+
+class EventIndex:
+    """Normalized event records plus inverted indexes (value -> set of positions)."""
+    def __init__(self, records: List[Dict]):
+        self.records = records
+        self.index: Dict[str, Dict[str, Set[int]]] = {dim: defaultdict(set) for dim in ("mes",) + FILTERS}
+        for i, r in enumerate(records):
+            for dim, value in self.keys(r).items():
+                self.index[dim][value].add(i)
+        self.meses = sorted(self.index["mes"])
+        self.all = frozenset(range(len(records)))
+
+    @staticmethod
+    def keys(r: Dict) -> Dict[str, str]:
+        return {
+            "mes": event_month(r),
+            "orgao": normalize_orgao(r.get("orgao", "desconhecido")),
+            "destino": destino_category(r.get("destino", "")),
+            "tipo": r.get("type") or "",
+        }
+
+    def select(self, inicio: Optional[str], fim: Optional[str], filters: Dict[str, Tuple[str, ...]]) -> List[int]:
+        """Positions of the records matching the month range and every filter, in load order."""
+        sets = []
+        if inicio or fim:
+            lo = bisect.bisect_left(self.meses, inicio) if inicio else 0
+            hi = bisect.bisect_right(self.meses, fim) if fim else len(self.meses)
+            sets.append(set().union(*(self.index["mes"][m] for m in self.meses[lo:hi])))
+        for dim, values in filters.items():
+            sets.append(set().union(*(self.index[dim].get(v, ()) for v in values)))
+        if not sets:
+            return sorted(self.all)
+        sets.sort(key=len)
+        return sorted(sets[0].intersection(*sets[1:]))
+
+    def dimensions(self) -> Dict[str, List[str]]:
+        return {dim: sorted(values) for dim, values in self.index.items()}
+
+def load_records(store_path: str, gt_path: Optional[str], events_path: Optional[str] = None) -> List[Dict]:
+    """
+    Store events as the dashboard sees them: ground truth applied, audited
+    schema. With events_path, reads an already audited events JSON instead.
+    """
+    from event_store import EventStore
+
+    if events_path:
+        from build_aggregates import load_events
+        return load_events(events_path) or []
+    dicts = [e.to_dict() for e in EventStore(store_path).events]
+    if gt_path:
+        from apply_ground_truth import apply_ground_truth
+        dicts = apply_ground_truth(dicts, gt_path)
+    return [as_record(d) for d in dicts]
+
+class QueryService:
+    """Filtered aggregates over an EventIndex, with an LRU cache of encoded responses."""
+    def __init__(self, index: EventIndex, cache_size: int = CACHE_SIZE):
+        self.index = index
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[tuple, Tuple[bytes, str]]" = OrderedDict()
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._events_bin: Optional[Tuple[bytes, str]] = None
+
+    def events_bin(self) -> Tuple[bytes, str]:
+        """(eventos.bin, ETag) of every indexed event, encoded on first use."""
+        if self._events_bin is None:
+            from columnar import encode_events
+
+            data = encode_events(self.index.records)
+            self._events_bin = (data, f'"{content_hash(data)[:32]}"')
+        return self._events_bin
+
+    @staticmethod
+    def normalize(params: Dict[str, List[str]]) -> Tuple:
+        """Cache key: the query with empty values dropped and repeated values sorted."""
+        def values(name):
+            return tuple(sorted({v.strip().lower() if name == "orgao" else v.strip()
+                                 for v in params.get(name, []) if v.strip()}))
+        inicio = (params.get("inicio") or [""])[0][:7] or None
+        fim = (params.get("fim") or [""])[0][:7] or None
+        return (inicio, fim) + tuple((name, values(name)) for name in FILTERS)
+
+    def query(self, output: str, params: Dict[str, List[str]]) -> Tuple[bytes, str]:
+        """(JSON body, ETag) for one output ("agregados" = all of them)."""
+        key = (output,) + self.normalize(params)
+        with self._lock:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        inicio, fim = key[1], key[2]
+        filters = {name: values for name, values in key[3:] if values}
+        records = [self.index.records[i] for i in self.index.select(inicio, fim, filters)]
+        outputs = {name[:-len(".json")]: payload for name, payload in aggregate(records).items()}
+        payload = outputs if output == "agregados" else outputs[output]
+        entry = (json.dumps(payload, ensure_ascii=False).encode("utf-8"), f'"{content_hash(payload)[:32]}"')
+
+        with self._lock:
+            self.cache[key] = entry
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return entry
+
+class Handler(BaseHTTPRequestHandler):
+    service: QueryService = None
+    server_version = "ObservatorioServe/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        params = parse_qs(url.query)
+
+        # Aceita também o prefixo do site (base "/observatoriojud/" do Vite)
+        if path.startswith("/observatoriojud/"):
+            path = path[len("/observatoriojud"):]
+        if path == "/api/dimensoes":
+            body = json.dumps(self.service.index.dimensions(), ensure_ascii=False).encode("utf-8")
+            return self.respond(200, body)
+        if path == "/api/status":
+            s = self.service
+            body = json.dumps({"eventos": len(s.index.records), "cache": len(s.cache),
+                               "hits": s.hits, "misses": s.misses}).encode("utf-8")
+            return self.respond(200, body)
+
+        if path == "/data/eventos.bin":
+            body, etag = self.service.events_bin()
+            return self.respond_cached(body, etag, "application/octet-stream")
+
+        output = None
+        if path.startswith("/api/"):
+            output = path[len("/api/"):]
+        elif path.startswith("/data/") and path.endswith(".json"):
+            output = path[len("/data/"):-len(".json")]
+        if output not in OUTPUTS + ("agregados",):
+            return self.respond(404, json.dumps({"erro": f"não encontrado: {url.path}"}).encode("utf-8"))
+
+        body, etag = self.service.query(output, params)
+        self.respond_cached(body, etag)
+
+    def respond_cached(self, body: bytes, etag: str, content_type: str = "application/json; charset=utf-8"):
+        if etag in (t.strip() for t in self.headers.get("If-None-Match", "").split(",")):
+            return self.respond(304, None, etag)
+        self.respond(200, body, etag, content_type)
+
+    def respond(self, status: int, body: Optional[bytes], etag: Optional[str] = None,
+                content_type: str = "application/json; charset=utf-8"):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if body is not None:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço local (somente leitura) de agregados filtrados")
+    parser.add_argument("--store", default=os.path.join(PIPELINE_DIR, "eventos_detectados.json"))
+    parser.add_argument("--ground-truth", default=os.path.join(PIPELINE_DIR, "ground_truth.json"),
+                        help="Ground truth aplicado aos eventos (vazio para não aplicar)")
+    parser.add_argument("--events", help="JSON de eventos já auditados (ex.: eventos_judiciario.json) em vez do store")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="Respostas mantidas no cache LRU")
+    parser.add_argument("--verbose", action="store_true", help="Loga cada requisição")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    records = load_records(args.store, args.ground_truth or None, args.events)
+    index = EventIndex(records)
+    print(f"📚 {len(records)} eventos indexados em {time.perf_counter() - t0:.2f}s "
+          f"({len(index.meses)} meses, {len(index.index['orgao'])} órgãos)")
+
+    Handler.service = QueryService(index, args.cache_size)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.verbose = args.verbose
+    print(f"🌐 Servindo em http://{args.host}:{args.port}/api/agregados (Ctrl+C para parar)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+"""
+Source adapters for the detection pipeline.
+
+Every input (DOU parquet, DEJT PDFs, plain-text dumps, ...) is exposed as a
+Source that lazily yields normalized Records, so all of them feed the same
+detection engine (engine.py). New sources are added by registering an
+adapter here and listing it in sources.yaml; run.py doesn't change.
+"""
+import datetime
+import functools
+import hashlib
+import os
+import re
+import tarfile
+import tempfile
+import zipfile
+from typing import BinaryIO, Callable, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+DEFAULT_DATE = os.environ.get("DATA_REF", "2026-01-30")
+DATE_IN_NAME_RE = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})")
+
+# Arquivos compactados lidos diretamente pela fonte de PDFs (sem descompactar em disco)
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+# Membros maiores que isso são bufferizados em arquivo temporário em vez de memória
+MEMBER_BUFFER_BYTES = 64 * 1024 * 1024
+
+class Record(NamedTuple):
+    source_id: str   # unique, stable id (becomes Event.source_pdf)
+    date: str        # publication date, YYYY-MM-DD
+    orgao_hint: str  # organ name from source metadata or header ("" if unknown)
+    text: str
+
+class RecordFilter(NamedTuple):
+    """Publication-date range and organ labels (as in top_orgaos.json) to keep."""
+    since: Optional[str] = None   # YYYY-MM-DD, inclusive
+    until: Optional[str] = None   # YYYY-MM-DD, inclusive
+    orgaos: FrozenSet[str] = frozenset()
+    source_ids: Optional[FrozenSet[str]] = None   # None = all records
+
+    @property
+    def active(self) -> bool:
+        return bool(self.since or self.until or self.orgaos or self.source_ids is not None)
+
+    def matches_id(self, source_id: str) -> bool:
+        return self.source_ids is None or source_id in self.source_ids
+
+    def matches_date(self, date: str) -> bool:
+        return (not self.since or date >= self.since) and (not self.until or date <= self.until)
+
+    def matches_orgao(self, label: Optional[str]) -> bool:
+        # Unknown organ (None) can't be pruned: it has to be processed to find out
+        return not self.orgaos or label is None or label in self.orgaos
+
+    def matches(self, date: str, label: Optional[str]) -> bool:
+        return self.matches_date(date) and self.matches_orgao(label)
+
+    def covers(self, date: str, label: Optional[str]) -> bool:
+        """
+        Whether an already-known record belongs to this slice. Unlike
+        matches(), an unknown organ is not covered: if such a record is
+        reprocessed it is replaced anyway, otherwise it must be kept.
+        """
+        return self.matches_date(date) and (not self.orgaos or label in self.orgaos)
+
+NO_FILTER = RecordFilter()
+
+@functools.lru_cache(maxsize=4096)
+def orgao_label(raw: str) -> str:
+    """Normalizes a raw organ name (DOU metadata, detected context) to its aggregate label."""
+    from build_aggregates import normalize_orgao
+    from detect_events import orgao_from_meta
+
+    return normalize_orgao(orgao_from_meta(raw))
+
+def text_orgao_label(text: str) -> Optional[str]:
+    """Organ label from the header context of a document, None if unknown."""
+    from detect_events import find_trt_context
+
+    ctx = find_trt_context(text)
+    return None if ctx == "DESCONHECIDO" else orgao_label(ctx)
+
+SOURCE_TYPES: Dict[str, type] = {}
+
+def register(type_name: str):
+    def deco(cls):
+        cls.type_name = type_name
+        SOURCE_TYPES[type_name] = cls
+        return cls
+    return deco
+
+def date_from_name(name: str, default: str = DEFAULT_DATE) -> str:
+    """Publication date from a file name like 'dejt_2024-03-15.pdf', else default."""
+    m = DATE_IN_NAME_RE.search(name)
+    if m:
+        y, mo, d = m.groups()
+        if "01" <= mo <= "12" and "01" <= d <= "31":
+            return f"{y}-{mo}-{d}"
+    return default
+
+def is_archive(name: str) -> bool:
+    return name.lower().endswith(ARCHIVE_SUFFIXES)
+
+def iter_archive_pdfs(path: str) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    Yields (member name, stream) for each PDF in a zip or tar archive, one
+    member at a time. Tars are read sequentially ("r|*"), so compressed
+    tarballs are never seeked or unpacked.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(".pdf"):
+                    with zf.open(info) as f:
+                        yield info.filename, f
+    else:
+        with tarfile.open(path, mode="r|*") as tf:
+            for member in tf:
+                if member.isfile() and member.name.lower().endswith(".pdf"):
+                    yield member.name, tf.extractfile(member)
+
+def buffer_stream(stream: BinaryIO, max_in_memory: int = MEMBER_BUFFER_BYTES):
+    """
+    Copies a stream into a seekable buffer (in memory up to max_in_memory,
+    then a temporary file) and returns (sha1 hex, buffer at position 0).
+    """
+    buf = tempfile.SpooledTemporaryFile(max_size=max_in_memory)
+    digest = hashlib.sha1()
+    while True:
+        chunk = stream.read(1024 * 1024)
+        if not chunk:
+            break
+        digest.update(chunk)
+        buf.write(chunk)
+    buf.seek(0)
+    return digest.hexdigest(), buf
+
+class Source:
+    type_name = "base"
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name or self.type_name
+        # rules.yaml, set by load_sources (used by adapters that pre-screen input)
+        self.rules: Optional[Dict] = None
+        # source_ids already in the event store, detected with the current rules
+        # (set by run.py); adapters may skip them if their input didn't change
+        self.processed: Set[str] = set()
+        # source_ids skipped in the last records() run because their input was unchanged
+        self.unchanged: Set[str] = set()
+        # Called with (source_id, full text) by adapters that narrow the text before
+        # detection (page triage), so the term index (run.py) still sees all of it
+        self.index_text: Optional[Callable[[str, str], None]] = None
+
+    def records(self, filt: RecordFilter = NO_FILTER) -> Iterator[Record]:
+        """Yields the records of this source, pruned by `filt` as early as possible."""
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        return self.type_name
+
+    def settings(self) -> Dict:
+        """
+        Settings that change the text this source produces (extraction
+        backend, triage). When they change, run.py doesn't skip unchanged input.
+        """
+        return {}
+
+    def report(self) -> Optional[str]:
+        """Summary of the last records() run, if the adapter keeps stats."""
+        return None
+
+    def watch_files(self) -> List[str]:
+        """Input files whose arrival or change should trigger a rerun (run.py --watch)."""
+        return []
+
+    def watch_ids(self, changed: List[str]) -> Optional[FrozenSet[str]]:
+        """
+        source_ids to reprocess for changed watch files, or None to rerun the
+        whole source (adapters that skip unchanged input by themselves).
+        """
+        return None
+
+@register("dou_parquet")
+class DouParquetSource(Source):
+    """
+    DOU records from the BigQuery parquet cache (ingest_dou_jud.py).
+    `path` points to a parquet file; without it the cached query for
+    [start_date, end_date] is used (downloaded if missing).
+    """
+    def __init__(self, path: Optional[str] = None, start_date: str = "2019-01-01",
+                 end_date: str = "2024-12-31", name: Optional[str] = None):
+        super().__init__(name)
+        self.path = path
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def describe(self) -> str:
+        return f"{self.type_name} ({self.path or f'{self.start_date}..{self.end_date}'})"
+
+    def watch_files(self) -> List[str]:
+        # Um parquet ou um diretório de partições; sem path, o cache da consulta ao BigQuery
+        if not self.path:
+            from ingest_dou_jud import dou_cache_path
+            return [dou_cache_path(self.start_date, self.end_date)]
+        if os.path.isdir(self.path):
+            return sorted(
+                os.path.join(root, n) for root, _, names in os.walk(self.path)
+                for n in names if n.endswith(".parquet")
+            )
+        return [self.path]
+
+    def load_frame(self, filt: RecordFilter = NO_FILTER):
+        import pandas as pd
+
+        if self.path:
+            # Row groups outside the date range are skipped by the parquet reader
+            filters = []
+            if filt.since:
+                filters.append(("data_publicacao", ">=", datetime.date.fromisoformat(filt.since)))
+            if filt.until:
+                filters.append(("data_publicacao", "<=", datetime.date.fromisoformat(filt.until)))
+            df = pd.read_parquet(self.path, filters=filters or None)
+        else:
+            from ingest_dou_jud import query_dou_history
+            df = query_dou_history(start_date=self.start_date, end_date=self.end_date, use_cache=True)
+            if df is None:
+                return None
+            dates = df["data_publicacao"].astype(str)
+            if filt.since:
+                df = df[dates >= filt.since]
+            if filt.until:
+                df = df[dates <= filt.until]
+
+        if filt.orgaos and len(df) > 0:
+            # Few distinct organ names: label each once, then mask
+            labels = {raw: orgao_label(str(raw)) for raw in df["orgao"].unique()}
+            df = df[df["orgao"].map(labels).isin(filt.orgaos)]
+        return df
+
+    def records(self, filt: RecordFilter = NO_FILTER) -> Iterator[Record]:
+        from ingest_dou_jud import dou_row_to_text
+
+        df = self.load_frame(filt)
+        if df is None or len(df) == 0:
+            return
+        print(f"⌛ {self.name}: {len(df)} registros do DOU")
+        for row in df.itertuples(index=False):
+            date = str(row.data_publicacao)
+            url_hash = hashlib.sha1(str(row.url).encode("utf-8")).hexdigest()[:10]
+            source_id = f"DOU_{date}_{url_hash}"
+            if not filt.matches_id(source_id):
+                continue
+            yield Record(source_id, date, str(row.orgao or ""), dou_row_to_text(row))
+
+@register("dejt_pdf")
+class DejtPdfDirSource(Source):
+    """
+    DEJT PDFs in a directory, loose or inside zip/tar archives (read as
+    streams, never unpacked to disk); the publication date is taken from
+    the file name. With `triage`, only pages that pass the rules keyword
+    screen (plus neighbours) reach detection (see triage.py). `extractor`
+    is an extract_text backend ("auto" = the one selected by its bench).
+    """
+    def __init__(self, path: str = "pdfs", triage: bool = True, extractor: str = "auto",
+                 name: Optional[str] = None):
+        super().__init__(name)
+        self.path = path
+        self.triage = triage
+        self.extractor = extractor
+        self.page_triage = None
+
+    def describe(self) -> str:
+        return f"{self.type_name} ({self.path}, extrator {self.extractor}{', triagem de páginas' if self.triage else ''})"
+
+    def settings(self) -> Dict:
+        from extract_text import resolve_backend
+
+        return {"extractor": resolve_backend(self.extractor), "triage": self.triage}
+
+    def report(self) -> Optional[str]:
+        parts = []
+        if self.unchanged:
+            parts.append(f"{len(self.unchanged)} PDFs inalterados pulados")
+        if self.page_triage and self.page_triage.pages_total:
+            parts.append(self.page_triage.report())
+        return "; ".join(parts) or None
+
+    def watch_files(self) -> List[str]:
+        return [os.path.join(self.path, n) for n in self.files()]
+
+    def watch_ids(self, changed: List[str]) -> Optional[FrozenSet[str]]:
+        # Um PDF solto é o próprio id; um arquivo compactado vale por seus membros
+        # (os atuais e, se algum sumiu, os que o manifest conhece)
+        from build_aggregates import read_json
+
+        manifest = read_json(self.manifest_path, {})
+        ids = set()
+        for path in changed:
+            name = os.path.basename(path)
+            if not is_archive(name):
+                ids.add(name)
+                continue
+            ids.update(sid for sid in manifest if sid.startswith(name + "/"))
+            if os.path.exists(path):
+                ids.update(f"{name}/{member}" for member, _ in iter_archive_pdfs(path))
+        return frozenset(ids)
+
+    def files(self) -> List[str]:
+        """Loose PDFs and archives in the directory."""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(n for n in os.listdir(self.path) if n.lower().endswith(".pdf") or is_archive(n))
+
+    def documents(self) -> Iterator[Tuple[str, BinaryIO]]:
+        """
+        Yields (source_id, stream) per PDF. Archive members get the id
+        "<archive>/<member>"; streams are only valid until the next item.
+        """
+        for name in self.files():
+            path = os.path.join(self.path, name)
+            if is_archive(name):
+                for member, stream in iter_archive_pdfs(path):
+                    yield f"{name}/{member}", stream
+            else:
+                with open(path, "rb") as f:
+                    yield name, f
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+
+    def records(self, filt: RecordFilter = NO_FILTER) -> Iterator[Record]:
+        """
+        PDFs are pruned by the date in their name and by the organ recorded
+        in pdfs/manifest.json (filled in the first time each PDF is read).
+        The manifest also keeps each PDF's content hash: a PDF whose hash
+        didn't change and whose events are already in the store
+        (`processed`) is not extracted again.
+        """
+        from build_aggregates import read_json, write_json
+        from extract_text import iter_pages
+
+        if self.triage and self.rules:
+            from triage import PageTriage
+            self.page_triage = PageTriage(self.rules)
+
+        self.unchanged = set()
+        manifest = read_json(self.manifest_path, {})
+        try:
+            for source_id, stream in self.documents():
+                # Data do nome do membro; senão, do nome do arquivo compactado
+                date = date_from_name(source_id.rsplit("/", 1)[-1], date_from_name(source_id))
+                known = manifest.get(source_id, {})
+                if not filt.matches_id(source_id) or not filt.matches(date, known.get("orgao")):
+                    continue
+                sha1, buf = buffer_stream(stream)
+                with buf:
+                    if sha1 == known.get("sha1") and source_id in self.processed:
+                        self.unchanged.add(source_id)
+                        continue
+                    pages = list(iter_pages(buf, self.extractor))
+                    text = self.page_triage.text(pages) if self.page_triage else "\n".join(pages)
+                    if self.page_triage and self.index_text:
+                        # Um termo novo das regras pode acertar páginas que a triagem descartou
+                        self.index_text(source_id, "\n".join(pages))
+                label = text_orgao_label(text)
+                manifest[source_id] = {"date": date, "orgao": label, "sha1": sha1}
+                if not filt.matches_orgao(label):
+                    continue
+                yield Record(source_id, date, label or "", text)
+        finally:
+            if os.path.isdir(self.path):
+                write_json(self.manifest_path, manifest)
+
+@register("text")
+class TextDumpSource(Source):
+    """Plain-text dumps (*.txt), one act or publication per file."""
+    def __init__(self, path: str = "textos", name: Optional[str] = None):
+        super().__init__(name)
+        self.path = path
+
+    def describe(self) -> str:
+        return f"{self.type_name} ({self.path})"
+
+    def watch_files(self) -> List[str]:
+        if not os.path.isdir(self.path):
+            return []
+        return [os.path.join(self.path, n) for n in sorted(os.listdir(self.path)) if n.lower().endswith(".txt")]
+
+    def watch_ids(self, changed: List[str]) -> Optional[FrozenSet[str]]:
+        # O source_id de um dump é o nome do arquivo
+        return frozenset(os.path.basename(p) for p in changed)
+
+    def records(self, filt: RecordFilter = NO_FILTER) -> Iterator[Record]:
+        if not os.path.isdir(self.path):
+            return
+        for name in sorted(os.listdir(self.path)):
+            if not name.lower().endswith(".txt"):
+                continue
+            date = date_from_name(name)
+            if not filt.matches_id(name) or not filt.matches_date(date):
+                continue
+            with open(os.path.join(self.path, name), "r", encoding="utf-8") as f:
+                text = f.read()
+            label = text_orgao_label(text)
+            if not filt.matches_orgao(label):
+                continue
+            yield Record(name, date, label or "", text)
+
+def load_sources(config_path: str, only: Optional[List[str]] = None, rules: Optional[Dict] = None) -> List[Source]:
+    """
+    Builds the sources listed in a sources.yaml file. Relative paths are
+    resolved against the config file's directory.
+    """
+    import yaml
+
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+
+    base_dir = os.path.dirname(os.path.abspath(config_path))
+    sources = []
+    for entry in config.get("sources", []):
+        params = dict(entry)
+        type_name = params.pop("type")
+        if type_name not in SOURCE_TYPES:
+            raise ValueError(f"Tipo de fonte desconhecido em {config_path}: {type_name}")
+        if params.pop("enabled", True) is False:
+            continue
+        if params.get("path") and not os.path.isabs(params["path"]):
+            params["path"] = os.path.join(base_dir, params["path"])
+        source = SOURCE_TYPES[type_name](**params)
+        source.rules = rules
+        if only and source.name not in only:
+            continue
+        sources.append(source)
+    return sources
+
+def iter_records(sources: List[Source], filt: RecordFilter = NO_FILTER) -> Iterator[Record]:
+    for source in sources:
+        yield from source.records(filt)
@@ -0,0 +1,87 @@
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+from typing import Optional
+
+import pytest
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Os módulos do pipeline são scripts soltos em pipeline/ (importados pelo nome)
+sys.path.insert(0, PIPELINE_DIR)
+
+def act(name: str, date: str, region: int = 7, number: int = 100) -> str:
+    """Texto de um ato de vacância de um servidor de TI (detectado sem NER)."""
+    d, m, y = date[8:10], date[5:7], date[:4]
+    return (
+        f"TRIBUNAL REGIONAL DO TRABALHO DA {region}ª REGIÃO\n"
+        f"PORTARIA Nº {number}\n"
+        "O PRESIDENTE DO TRIBUNAL, no uso de suas atribuições,\n"
+        "RESOLVE:\n"
+        f"Declarar vago, a contar de {d}/{m}/{y}, o cargo de Analista Judiciário, Área Apoio Especializado, "
+        "Especialidade Tecnologia da Informação,\n"
+        f"ocupado pelo servidor {name}, em virtude de posse em outro cargo inacumulável.\n"
+    )
+
+class Workspace:
+    """Cópia isolada do pipeline (scripts + regras) com uma fonte de textos, para rodar o run.py."""
+    def __init__(self, root):
+        self.root = str(root)
+        self.dir = os.path.join(self.root, "pipeline")
+        os.makedirs(os.path.join(self.dir, "textos"))
+        for path in glob.glob(os.path.join(PIPELINE_DIR, "*.py")) + [os.path.join(PIPELINE_DIR, "rules.yaml")]:
+            shutil.copy(path, self.dir)
+        with open(os.path.join(self.dir, "sources.yaml"), "w", encoding="utf-8") as f:
+            f.write("sources:\n  - type: text\n    name: textos\n    path: textos\n")
+
+    def write_sources(self, config: str):
+        with open(os.path.join(self.dir, "sources.yaml"), "w", encoding="utf-8") as f:
+            f.write(config)
+
+    def append_module(self, name: str, code: str):
+        """Acrescenta código a um script da cópia (ex.: um backend de extração falso)."""
+        with open(os.path.join(self.dir, name), "a", encoding="utf-8") as f:
+            f.write("\n" + code)
+
+    def write_text(self, name: str, text: str):
+        with open(os.path.join(self.dir, "textos", name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def remove_text(self, name: str):
+        os.unlink(os.path.join(self.dir, "textos", name))
+
+    def edit_rules(self, edit):
+        """Aplica edit(rules) ao rules.yaml da cópia."""
+        import yaml
+
+        path = os.path.join(self.dir, "rules.yaml")
+        with open(path, encoding="utf-8") as f:
+            rules = yaml.safe_load(f)
+        edit(rules)
+        with open(path, "w", encoding="utf-8") as f:
+            yaml.safe_dump(rules, f, allow_unicode=True)
+
+    def run(self, *args: str, check: bool = True, record_timeout: Optional[str] = "0") -> subprocess.CompletedProcess:
+        # record_timeout=None deixa o padrão do run.py: detecção no pool supervisionado
+        timeout = ["--record-timeout", record_timeout] if record_timeout is not None else []
+        proc = subprocess.run([sys.executable, "run.py", *timeout, *args], cwd=self.dir,
+                              capture_output=True, text=True)
+        if check and proc.returncode != 0:
+            raise AssertionError(f"run.py {' '.join(args)} saiu com {proc.returncode}:\n{proc.stdout}\n{proc.stderr}")
+        return proc
+
+    def read(self, name: str, default=None):
+        path = os.path.join(self.dir, name)
+        if not os.path.exists(path):
+            return default
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def store_events(self):
+        return self.read("eventos_detectados.json", {}).get("events", [])
+
+@pytest.fixture
+def workspace(tmp_path):
+    return Workspace(tmp_path)
@@ -0,0 +1,100 @@
+import json
+
+from aggregate_state import OUTPUTS, AggregateState
+from build_aggregates import MANIFEST_NAME, aggregate, as_record, publish, read_json
+from detect_events import Event
+from event_store import EventStore
+
+def evento(nome, date, orgao="trt7", destino="Banco Central", source="pdf-1", tipo="evasão"):
+    return Event(orgao=orgao, destino=destino, date=date, mes=date[:7], confidence="confirmada",
+                 source_pdf=source, nome=nome, role="Analista Judiciário", tipo=tipo)
+
+def full_outputs(store):
+    return aggregate([as_record(e) for e in store.events])
+
+def incremental_outputs(state):
+    outputs = state.outputs()
+    outputs.pop("eventos.bin")
+    return outputs
+
+def test_sync_matches_full_recompute_after_adds_and_removes(tmp_path):
+    store = EventStore(str(tmp_path / "eventos_detectados.json"))
+    state = AggregateState(str(tmp_path / "agregados_estado.json"))
+    store.merge({"pdf-1": {}, "pdf-2": {}}, [
+        evento("ANA", "2023-01-10", source="pdf-1"),
+        evento("BRUNO", "2023-01-20", orgao="trt2", destino="Tribunal de Contas da União", source="pdf-1"),
+        evento("CARLA", "2023-03-05", orgao="trt2", source="pdf-2"),
+        evento("DIEGO", "2023-03-05", orgao="trt7", tipo="ingresso", source="pdf-2"),
+    ])
+    assert state.sync(store)["rebuilt"]
+    store.dirty.clear()
+    assert incremental_outputs(state) == full_outputs(store)
+
+    # Remove o pdf-2 e acrescenta o pdf-3 (órgãos empatados, mês novo)
+    store.merge({"pdf-3": {}}, [
+        evento("EDUARDO", "2023-05-02", orgao="trt15", source="pdf-3"),
+        evento("ANA", "2023-01-10", source="pdf-3"),
+    ], in_scope=lambda sid, meta: sid == "pdf-2")
+    info = state.sync(store)
+    assert not info["rebuilt"]
+    assert info["changed"] > 0
+    store.dirty.clear()
+    assert incremental_outputs(state) == full_outputs(store)
+    assert state.verify(store) == []
+
+    # Estado relido do disco continua equivalente
+    state.save()
+    store.merge({}, [], in_scope=lambda sid, meta: sid == "pdf-1")
+    reloaded = AggregateState(state.path)
+    assert not reloaded.sync(store)["rebuilt"]
+    assert incremental_outputs(reloaded) == full_outputs(store)
+
+def test_sync_matches_full_recompute_with_ground_truth(tmp_path):
+    gt_path = tmp_path / "gt.json"
+    gt_path.write_text(json.dumps([
+        {"name": "Ana", "date": "2023-01-10", "type": "evasão", "orgao": "trt7", "destination_matched": "STJ"},
+    ]), encoding="utf-8")
+    store = EventStore(str(tmp_path / "eventos_detectados.json"))
+    state = AggregateState(str(tmp_path / "agregados_estado.json"))
+    store.merge({"pdf-1": {}}, [evento("ANA", "2023-01-10"), evento("BRUNO", "2023-02-01")])
+    state.sync(store, str(gt_path))
+    store.dirty.clear()
+    assert state.verify(store, str(gt_path)) == []
+
+    # Entrada nova no ground truth, sem evento detectado
+    gt_path.write_text(json.dumps([
+        {"name": "Ana", "date": "2023-01-10", "type": "evasão", "orgao": "trt7", "destination_matched": "STJ"},
+        {"name": "Caio", "date": "2023-04-01", "type": "evasão", "orgao": "trt2", "reason": "Aposentadoria"},
+    ]), encoding="utf-8")
+    assert not state.sync(store, str(gt_path))["rebuilt"]
+    assert state.verify(store, str(gt_path)) == []
+
+class Unscannable(list):
+    def __iter__(self):
+        raise AssertionError("sync percorreu store.events inteiro")
+
+def test_sync_reads_only_dirty_keys_and_encodes_only_dirty_outputs(tmp_path):
+    store = EventStore(str(tmp_path / "eventos_detectados.json"))
+    state = AggregateState(str(tmp_path / "agregados_estado.json"))
+    store.merge({"pdf-1": {}}, [evento("ANA", "2023-01-10"), evento("BRUNO", "2023-02-01", orgao="trt2")])
+    state.sync(store)
+    assert state.dirty_outputs is None
+    out_dir = tmp_path / "data"
+    out_dir.mkdir()
+    publish(str(out_dir), state.outputs())
+    store.dirty.clear()
+
+    # Só um ingresso novo: métricas e eventos.bin mudam, o resto não é recodificado
+    store.merge({"pdf-2": {}}, [evento("CARLA", "2023-03-05", tipo="ingresso", source="pdf-2")],
+                in_scope=lambda sid, meta: False)
+    events = list(store.events)
+    store.events = Unscannable(events)
+    assert state.sync(store)["changed"] == 1
+    assert state.dirty_outputs == {"metricas.json", "eventos.bin"}
+    partial = state.outputs(state.dirty_outputs)
+    assert set(partial) == state.dirty_outputs
+    assert partial["metricas.json"] == aggregate([as_record(e) for e in events])["metricas.json"]
+
+    assert publish(str(out_dir), partial, partial=True) == ["metricas.json", "eventos.bin"]
+    manifest = read_json(str(out_dir / MANIFEST_NAME))
+    assert set(manifest["files"]) == set(OUTPUTS)
@@ -0,0 +1,65 @@
+import os
+import stat
+
+import cache
+from build_aggregates import AggregateCounters, aggregate, compute_metrics, is_month, month_range, read_json, write_json
+
+def saida(date, orgao="TRT7"):
+    return {"type": "saída", "date": date, "orgao": orgao, "name": "FULANO", "destino": "Banco Central"}
+
+def test_month_range_is_dense():
+    assert month_range("2023-11", "2024-02") == ["2023-11", "2023-12", "2024-01", "2024-02"]
+
+def test_is_month():
+    assert is_month("2023-12")
+    assert not is_month("2023-13")
+    assert not is_month("2023-00")
+    assert not is_month("01/02/")
+
+def test_malformed_dates_stay_off_the_month_axis():
+    metrics = compute_metrics([saida("2023-13-01"), saida("01/02/2023"), saida("2023-02-10"), saida("2023-04-01")])
+    assert metrics["meses"]["mes"] == ["2023-02", "2023-03", "2023-04"]
+    assert metrics["meses"]["evasoes"] == [1, 0, 1]
+    # Continuam contando por órgão
+    assert metrics["orgaos"]["evasoes"] == [4]
+
+def test_missing_dates_count_in_the_same_month_everywhere():
+    events = [saida(None), dict(saida(None), date=""), {k: v for k, v in saida(None).items() if k != "date"}]
+    outputs = aggregate(events)
+    assert outputs["series_mensal.json"] == [{"mes": "2000-01", "evasoes": 3}]
+    assert outputs["metricas.json"]["meses"]["mes"] == ["2000-01"]
+    assert outputs["metricas.json"]["meses"]["evasoes"] == [3]
+    assert [d["data"] for d in outputs["top_orgaos.json"][0]["details"]] == ["", "", ""]
+
+    counters = AggregateCounters()
+    for e in events:
+        counters.add(e)
+    for e in events:
+        counters.add(e, -1)
+    assert counters.to_dict() == AggregateCounters().to_dict()
+
+def test_write_json_only_rewrites_changed_content(tmp_path):
+    path = str(tmp_path / "out.json")
+    assert write_json(path, {"a": 1})
+    assert not write_json(path, {"a": 1})
+    assert write_json(path, {"a": 2})
+    assert read_json(path) == {"a": 2}
+
+def test_write_json_keeps_umask_permissions(tmp_path, monkeypatch):
+    # O umask é lido uma vez, na importação de cache.py
+    assert cache.UMASK == os.umask(cache.UMASK)
+    for umask, mode in ((0o022, 0o644), (0o077, 0o600)):
+        monkeypatch.setattr(cache, "UMASK", umask)
+        path = str(tmp_path / f"out-{umask:o}.json")
+        write_json(path, [])
+        assert stat.S_IMODE(os.stat(path).st_mode) == mode
+
+def test_atomic_path_leaves_no_temp_file_on_error(tmp_path):
+    path = str(tmp_path / "out.bin")
+    try:
+        with cache.atomic_path(path) as tmp:
+            open(tmp, "wb").close()
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert os.listdir(tmp_path) == []
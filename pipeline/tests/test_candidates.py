@@ -0,0 +1,60 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+import yaml
+
+import detect_events
+import engine
+from conftest import PIPELINE_DIR, act
+from detect_events import detect_events as detect_text
+from engine import detect_records
+from export_candidates import CandidateExporter, batch_dir
+from sources import Record
+
+@pytest.fixture
+def rules():
+    with open(os.path.join(PIPELINE_DIR, "rules.yaml"), encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+def document(n):
+    # Nomes em minúsculas não casam com as regexes: o evento sai com "Não identificado"
+    return "\n".join(act(f"servidor numero {i}" if i % 3 == 0 else f"SERVIDOR NUMERO {i}", "2023-03-01", number=100 + i)
+                     for i in range(n))
+
+def collect(records, rules, **kwargs):
+    out = {}
+    events = {r.source_id: evs for r, evs in detect_records(
+        records, rules, on_candidates=lambda r, c: out.setdefault(r.source_id, c), **kwargs)}
+    return events, out
+
+def test_pool_candidates_match_a_sequential_export(rules, tmp_path, monkeypatch):
+    # Documento dividido em pedaços: o contexto dos candidatos atravessa a fronteira
+    monkeypatch.setattr(engine, "BLOCKS_PER_CHUNK", 4)
+    monkeypatch.setattr(engine, "SPLIT_THRESHOLD", 8)
+    records = [Record("grande", "2023-03-05", "", document(20)), Record("pequeno", "2023-03-06", "", document(3))]
+    events, candidates = collect(records, rules, workers=2, timeout=60)
+
+    exporter = CandidateExporter(rules, str(tmp_path))
+    for record in records:
+        assert events[record.source_id] == detect_text(record.text, rules, record.date, record.source_id)
+        assert candidates[record.source_id] == exporter.candidates(record)
+    # Bloco 4 abre o segundo pedaço: o vizinho anterior veio do primeiro, só como contexto
+    boundary = next(c for c in candidates["grande"] if c["bloco"] == 4)
+    assert boundary["contexto"]["antes"].endswith("inacumulável.")
+
+def test_candidates_use_the_detector_names(rules, monkeypatch):
+    class FakeNlp:
+        def __call__(self, text):
+            return SimpleNamespace(ents=[SimpleNamespace(label_="PER", text="Beltrano da Silva")])
+
+    monkeypatch.setattr(detect_events, "get_nlp", lambda: FakeNlp())
+    record = Record("r1", "2023-03-05", "", act("beltrano da silva", "2023-03-01"))
+    events, candidates = collect([record], rules)
+    # O NER preenche o nome no evento; o candidato não pode dizer "nome não identificado"
+    assert events["r1"][0].nome == "Beltrano Da Silva"
+    assert all("nome não identificado" not in c["motivos"] for c in candidates["r1"])
+
+def test_batch_dirs_are_unique(tmp_path):
+    dirs = {batch_dir(str(tmp_path)) for _ in range(5)}
+    assert len(dirs) == 5
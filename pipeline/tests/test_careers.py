@@ -0,0 +1,45 @@
+import pytest
+
+from careers import CareerIndex, destino_orgao
+
+@pytest.mark.parametrize("destino, orgao", [
+    ("Poder Judiciário/Tribunal Regional do Trabalho da 6ª Região", "trt6"),
+    ("Poder Judiciário/Tribunal Regional do Trabalho da 7ª Região/Diretoria-Geral/Secretaria de Pessoal", "trt7"),
+    ("Poder Judiciário/Superior Tribunal de Justiça", "stj"),
+    ("Poder Judiciário/Superior Tribunal de Justiça/Conselho da Justiça Federal/Presidência", "stj"),
+    ("Poder Judiciário/Tribunal Regional Federal da 6ª Região", "trf6"),
+    ("Poder Judiciário/Tribunal Regional Eleitoral de São Paulo", "tre-sp"),
+    ("cargo no Superior Tribunal de Justica, em Brasília", "stj"),
+    ("TST", "tst"),
+    ("Ministério da Justiça e Segurança Pública/Polícia Federal/Diretoria de Gestão de Pessoas", None),
+    ("Tribunal de Contas da União", None),
+    ("", None),
+])
+def test_destino_orgao(destino, orgao):
+    assert destino_orgao(destino) == orgao
+
+def saida(destino, date="2023-03-01"):
+    return {"date": date, "tipo": "evasão", "orgao": "trt7", "destino": destino,
+            "role": "", "fonte": "pdf-1", "auditado": False}
+
+def classify(destino):
+    index = CareerIndex("/nonexistent/index_carreiras.json")
+    index.add("Fulano", saida(destino))
+    return [t["tipo"] for t in index.transitions()]
+
+def test_transitions_read_the_organ_from_dou_paths():
+    assert classify("Poder Judiciário/Tribunal Regional do Trabalho da 6ª Região") == ["interna"]
+    assert classify("Poder Judiciário/Superior Tribunal de Justiça") == ["interna"]
+    assert classify("Ministério da Educação/Universidade Federal da Fronteira Sul") == ["externa"]
+    assert classify("Desconhecido") == ["indefinida"]
+
+def test_retirement_and_death_have_their_own_class():
+    assert classify("Aposentadoria") == ["aposentadoria"]
+    assert classify("Falecimento") == ["falecimento"]
+
+def test_entry_decides_when_found():
+    index = CareerIndex("/nonexistent/index_carreiras.json")
+    index.add("Fulano", saida("Desconhecido"))
+    index.add("Fulano", dict(saida(""), tipo="ingresso", orgao="stj", date="2023-03-10"))
+    [t] = index.transitions()
+    assert t["tipo"] == "interna" and t["entrada"]["orgao"] == "stj"
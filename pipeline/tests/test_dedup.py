@@ -0,0 +1,102 @@
+import json
+
+from conftest import act
+from dedup import Deduplicator, minhash, normalize_text, similarity
+from sources import Record
+
+def names(events):
+    return sorted((e["nome"], e["source_pdf"]) for e in events)
+
+def test_exact_duplicate_is_dropped():
+    dedup = Deduplicator()
+    text = act("JOAO DA SILVA SANTOS", "2023-03-10")
+    kept = list(dedup.filter([Record("a.txt", "2023-03-10", "", text), Record("b.txt", "2023-03-10", "", text)]))
+    assert [r.source_id for r in kept] == ["a.txt"]
+    assert dedup.duplicates == {"a.txt": ["b.txt"]}
+
+def test_canonical_that_is_not_live_does_not_suppress():
+    dedup = Deduplicator(live=lambda sid: False)
+    text = act("JOAO DA SILVA SANTOS", "2023-03-10")
+    dedup.exact["digest-antigo"] = "outro.txt"
+    list(dedup.filter([Record("a.txt", "2023-03-10", "", text)]))
+    # Lido nesta execução: suprime mesmo sem estar no store
+    kept = list(dedup.filter([Record("b.txt", "2023-03-10", "", text)]))
+    assert kept == []
+
+    stale = Deduplicator.load("/nonexistent", live=lambda sid: False)
+    stale.exact.update(dedup.exact)
+    stale.digests.update(dedup.digests)
+    kept = list(stale.filter([Record("b.txt", "2023-03-10", "", text)]))
+    assert [r.source_id for r in kept] == ["b.txt"]
+    assert stale.exact[stale.digests["b.txt"]] == "b.txt"
+
+def test_orphans_and_prune():
+    dedup = Deduplicator()
+    text = act("JOAO DA SILVA SANTOS", "2023-03-10")
+    list(dedup.filter([Record("a.txt", "2023-03-10", "", text), Record("b.txt", "2023-03-10", "", text)]))
+    assert dedup.orphans({"a.txt", "b.txt"}) == set()
+    assert dedup.orphans({"b.txt"}) == {"b.txt"}
+    # O canônico mudou de texto: o duplicado casou com o texto antigo
+    list(dedup.filter([Record("a.txt", "2023-03-10", "", act("MARIA SOUZA LIMA", "2023-03-10"))]))
+    assert dedup.orphans({"a.txt", "b.txt"}) == {"b.txt"}
+    dedup.prune({"a.txt"})
+    assert dedup.matches == {}
+
+BOILERPLATE = ("Considerando o disposto no artigo 33 da Lei 8112, de 1990, e o que consta do processo "
+               "administrativo, resolve dar publicidade ao presente ato, que entra em vigor na data de sua "
+               "publicação, revogadas as disposições em contrário. Publique-se e cumpra-se. ") * 3
+
+def test_near_duplicate_is_dropped_but_not_a_different_person(tmp_path):
+    text = act("JOAO DA SILVA SANTOS", "2023-03-10") + BOILERPLATE
+    # Republicação com outro cabeçalho DOU e uma palavra a menos
+    republished = "DATA: 2023-03-12\nURL: https://in.gov.br/r\n---\n" + text.replace("Publique-se e ", "", 1)
+    other = act("MARIA SOUZA LIMA", "2023-03-10") + BOILERPLATE
+    dedup = Deduplicator()
+    kept = list(dedup.filter([Record("a.txt", "2023-03-10", "", text), Record("b.txt", "2023-03-12", "", republished),
+                              Record("c.txt", "2023-03-10", "", other)]))
+    assert [r.source_id for r in kept] == ["a.txt", "c.txt"]
+    assert dedup.duplicates == {"a.txt": ["b.txt"]}
+
+    # Assinaturas salvas com outro esquema não entram no índice near
+    path = str(tmp_path / "dedup.json")
+    dedup.save(path)
+    assert Deduplicator.load(path).signatures.keys() == {"a.txt", "c.txt"}
+    with open(path) as f:
+        data = json.load(f)
+    data["signatures"] = "antigo"
+    with open(path, "w") as f:
+        json.dump(data, f)
+    assert Deduplicator.load(path).signatures == {}
+
+def test_minhash_estimates_jaccard():
+    words = normalize_text(BOILERPLATE * 20 + " ".join(f"ato {i}" for i in range(2000)))
+    edited = list(words)
+    edited[::50] = ["x"] * len(edited[::50])
+    shingles = [{" ".join(w[i:i + 5]) for i in range(len(w) - 4)} for w in (words, edited)]
+    jaccard = len(shingles[0] & shingles[1]) / len(shingles[0] | shingles[1])
+    assert abs(similarity(minhash(words), minhash(edited)) - jaccard) < 0.15
+    assert similarity(minhash(words), minhash(words)) == 1.0
+
+def test_duplicate_events_survive_when_canonical_is_removed(workspace):
+    text = act("JOAO DA SILVA SANTOS", "2023-03-10")
+    workspace.write_text("ato_2023-03-10.txt", text)
+    workspace.write_text("republicacao_2023-03-10.txt", text)
+    workspace.run("--stages", "detect", "--dedup", "exact")
+    assert names(workspace.store_events()) == [("JOAO DA SILVA SANTOS", "ato_2023-03-10.txt")]
+
+    workspace.remove_text("ato_2023-03-10.txt")
+    workspace.run("--stages", "detect", "--dedup", "exact")
+    assert names(workspace.store_events()) == [("JOAO DA SILVA SANTOS", "republicacao_2023-03-10.txt")]
+    assert workspace.read("duplicados.json") == {}
+
+def test_duplicate_of_canonical_outside_the_slice_is_rescued(workspace):
+    text = act("JOAO DA SILVA SANTOS", "2023-03-10")
+    workspace.write_text("ato_2023-03-10.txt", text)
+    workspace.run("--stages", "detect", "--dedup", "exact")
+    # Republicação chega numa rodada parcial; o canônico é removido numa rodada de outra fatia
+    workspace.write_text("republicacao_2023-05-02.txt", text)
+    workspace.run("--stages", "detect", "--dedup", "exact", "--since", "2023-05-01")
+    assert names(workspace.store_events()) == [("JOAO DA SILVA SANTOS", "ato_2023-03-10.txt")]
+    workspace.remove_text("ato_2023-03-10.txt")
+    workspace.run("--stages", "detect", "--dedup", "exact", "--until", "2023-04-01")
+    assert names(workspace.store_events()) == [("JOAO DA SILVA SANTOS", "republicacao_2023-05-02.txt")]
@@ -0,0 +1,42 @@
+import inspect
+import os
+
+from conftest import act
+from diff_events import _orgao_label, diff_events, total_changes
+
+def published(workspace, name="top_orgaos.json"):
+    return workspace.read(os.path.join("..", "site", "public", "data", name))
+
+def test_diff_pairs_events_by_key():
+    old = [{"nome": "ANA", "date": "2023-01-01", "orgao": "TRT7", "destino": "A"}]
+    new = [{"nome": "ANA", "date": "2023-01-01", "orgao": "trt7", "destino": "B"},
+           {"nome": "BIA", "date": "2023-01-02", "orgao": "trt7", "destino": "A"}]
+    diff = diff_events(old, new)
+    assert len(diff["alterados"]) == 1 and len(diff["adicionados"]) == 1 and total_changes(diff) == 2
+    assert diff["por_orgao"] == {"trt7": {"adicionados": 1, "removidos": 0, "alterados": 1}}
+
+def test_orgao_label_has_no_mutable_default():
+    assert list(inspect.signature(_orgao_label).parameters) == ["orgao"]
+
+def test_max_changes_gates_publishing(workspace):
+    workspace.write_text("a.txt", act("FULANO DE TAL", "2023-03-01"))
+    workspace.run()
+    first = published(workspace)
+    assert workspace.read("eventos_detectados.anterior.json")["events"] == workspace.store_events()
+
+    # Rodada só de detecção não mexe na base do diff
+    workspace.write_text("b.txt", act("BELTRANO DA SILVA", "2023-04-01", number=101))
+    workspace.run("--stages", "detect")
+    assert len(workspace.read("eventos_detectados.anterior.json")["events"]) == 1
+
+    proc = workspace.run("--max-changes", "0", check=False)
+    assert proc.returncode == 1, proc.stdout
+    assert "agregados não publicados" in proc.stdout
+    assert published(workspace) == first
+    assert len(workspace.read("eventos_detectados.anterior.json")["events"]) == 1
+
+    workspace.run("--max-changes", "1")
+    assert published(workspace) != first
+    assert workspace.read("eventos_detectados.anterior.json")["events"] == workspace.store_events()
+    # Nada mudou desde a publicação: o gate passa
+    workspace.run("--max-changes", "0")
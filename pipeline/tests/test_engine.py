@@ -0,0 +1,83 @@
+import os
+import time
+
+import pytest
+import yaml
+
+import engine
+from conftest import PIPELINE_DIR, Workspace, act
+from detect_events import block_contexts, detect_events as detect_text, split_blocks
+from engine import SupervisedPool, TaskFailed, detect_records
+from sources import Record
+
+@pytest.fixture
+def rules():
+    with open(os.path.join(PIPELINE_DIR, "rules.yaml"), encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+_detect_record = engine._detect_record
+
+def stalling_detect(record):
+    # Trava só o registro marcado; os workers herdam o monkeypatch do pai
+    if "TRAVA" in record.text:
+        time.sleep(60)
+    return _detect_record(record)
+
+def two_organ_document(n):
+    # O metadado ORGAO troca o contexto no meio do documento: os pedaços depois
+    # da troca dependem do que veio antes da fronteira
+    parts = []
+    for i in range(n):
+        if i in (0, n // 2):
+            parts.append(f"ORGAO: {'trt7' if i == 0 else 'trt16'} ---")
+        parts.append(act(f"SERVIDOR NUMERO {i}", "2023-03-01", number=100 + i))
+    return "\n".join(parts)
+
+def test_chunked_detection_matches_detect_events(rules):
+    text = two_organ_document(300)
+    blocks = split_blocks(text)
+    assert len(blocks) > engine.SPLIT_THRESHOLD
+    assert set(block_contexts(text, blocks)[1]) == {"trt7", "trt16"}
+
+    records = [Record("grande", "2023-03-05", "", text), Record("pequeno", "2023-03-06", "", two_organ_document(4))]
+    events = {r.source_id: evs for r, evs in detect_records(records, rules, workers=2, timeout=60)}
+    for record in records:
+        expected = detect_text(record.text, rules, record.date, record.source_id)
+        assert events[record.source_id] == expected
+    assert {e.orgao for e in events["grande"]} == {"trt7", "trt16"}
+
+def test_default_pool_matches_in_process_run(tmp_path):
+    # Sem --record-timeout 0 o run.py detecta no pool supervisionado (o padrão)
+    runs = []
+    for name, timeout in (("pool", None), ("local", "0")):
+        workspace = Workspace(tmp_path / name)
+        workspace.write_text("grande_2023-03-05.txt", two_organ_document(300))
+        workspace.write_text("pequeno_2023-03-06.txt", act("FULANO DE TAL", "2023-03-01"))
+        workspace.run("--stages", "detect", record_timeout=timeout)
+        runs.append(workspace.store_events())
+    assert len(runs[0]) == len(split_blocks(two_organ_document(300))) + 1
+    assert runs[0] == runs[1]
+
+def test_timed_out_worker_is_replaced():
+    with SupervisedPool(1, {}, timeout=0.5) as pool:
+        before = pool.submit(os.getpid).result()
+        with pytest.raises(TaskFailed) as err:
+            pool.submit(time.sleep, 60).result()
+        assert err.value.reason == "timeout"
+        after = pool.submit(os.getpid).result()
+    assert after != before
+
+def test_timeout_goes_to_the_slow_lane_then_quarantine(rules, monkeypatch):
+    monkeypatch.setattr(engine, "_detect_record", stalling_detect)
+    records = [Record("a", "2023-03-05", "", act("FULANO DE TAL", "2023-03-01")),
+               Record("trava", "2023-03-05", "", "TRAVA\n" + act("CICLANO DE TAL", "2023-03-01")),
+               Record("b", "2023-03-06", "", act("BELTRANO DA SILVA", "2023-03-01", number=101))]
+    calls = []
+    detected = detect_records(records, rules, workers=1, timeout=0.5, slow_timeout=0.5,
+                              on_retry=lambda r, e: calls.append(("retry", r.source_id, e.reason)),
+                              on_slow_lane=lambda n, t: calls.append(("lenta", n, t)),
+                              on_quarantine=lambda r, e, lane: calls.append(("quarentena", r.source_id, e.reason, lane)))
+    # O worker travado é substituído: os registros depois dele ainda saem, em ordem
+    events = [(r.source_id, [e.nome for e in evs]) for r, evs in detected]
+    assert events == [("a", ["FULANO DE TAL"]), ("b", ["BELTRANO DA SILVA"])]
+    assert calls == [("retry", "trava", "timeout"), ("lenta", 1, 0.5), ("quarentena", "trava", "timeout", "lenta")]
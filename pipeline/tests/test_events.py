@@ -0,0 +1,45 @@
+import pickle
+import sys
+
+import pytest
+
+from detect_events import CATEGORICAL_FIELDS, EVENT_FIELDS, Event, events_from_arrow, events_to_arrow
+
+def fresh(s):
+    # String nova em tempo de execução (literais do teste já vêm internados)
+    return "".join(list(s))
+
+def eventos():
+    return [
+        Event(orgao=fresh("trt7"), destino=fresh("Banco Central"), date="2023-01-10", mes=fresh("2023-01"),
+              confidence=fresh("confirmada"), source_pdf=fresh("pdf-1"), nome=fresh("ANA"),
+              role=fresh("Analista Judiciário"), tipo=fresh("evasão")),
+        Event(orgao=fresh("trt7"), destino=fresh("Banco Central"), date="2023-01-20", mes=fresh("2023-01"),
+              confidence=fresh("confirmada"), source_pdf=fresh("pdf-1"), nome=fresh("BRUNO"),
+              role=fresh("Analista Judiciário"), tipo=fresh("evasão")),
+    ]
+
+def assert_interned(events):
+    a, b = events
+    for f in CATEGORICAL_FIELDS:
+        assert getattr(a, f) is getattr(b, f), f
+        assert getattr(a, f) is sys.intern(getattr(a, f)), f
+
+def test_categorical_fields_are_interned():
+    assert_interned(eventos())
+
+def test_pickle_round_trip_reinterns():
+    events = eventos()
+    loaded = pickle.loads(pickle.dumps(events))
+    assert loaded == events
+    assert_interned(loaded)
+
+def test_arrow_round_trip_reinterns():
+    pa = pytest.importorskip("pyarrow")
+    events = eventos()
+    table = events_to_arrow(events)
+    assert table.column_names == list(EVENT_FIELDS)
+    assert pa.types.is_dictionary(table.schema.field("orgao").type)
+    loaded = events_from_arrow(table)
+    assert loaded == events
+    assert_interned(loaded)
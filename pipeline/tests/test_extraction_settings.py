@@ -0,0 +1,45 @@
+import json
+import os
+
+from conftest import act
+
+# Backends falsos: o "PDF" é o texto das páginas separado por \f; o segundo
+# extrator lê o nome de outro jeito, para a troca aparecer nos eventos
+FAKE_BACKENDS = '''
+def _fake_pages(pdf):
+    yield from pdf.read().decode("utf-8").split("\\f")
+
+def _fake_other_pages(pdf):
+    for page in _fake_pages(pdf):
+        yield page.replace("JOAO", "JOSE")
+
+BACKENDS["fake"] = (_fake_pages, lambda: True)
+BACKENDS["fake_outro"] = (_fake_other_pages, lambda: True)
+'''
+
+def select_backend(workspace, name):
+    with open(os.path.join(workspace.dir, "extract_backend.json"), "w") as f:
+        json.dump({"backend": name}, f)
+
+def test_backend_switch_reextracts_unchanged_pdfs(workspace):
+    workspace.append_module("extract_text.py", FAKE_BACKENDS)
+    workspace.write_sources("sources:\n  - type: dejt_pdf\n    name: dejt\n    path: pdfs\n")
+    os.makedirs(os.path.join(workspace.dir, "pdfs"))
+    with open(os.path.join(workspace.dir, "pdfs", "dejt_2023-03-10.pdf"), "wb") as f:
+        f.write(act("JOAO DA SILVA SANTOS", "2023-03-10").encode("utf-8"))
+
+    select_backend(workspace, "fake")
+    workspace.run("--stages", "detect")
+    assert [e["nome"] for e in workspace.store_events()] == ["JOAO DA SILVA SANTOS"]
+    assert workspace.read("eventos_detectados.json")["extraction"] == {"dejt": {"extractor": "fake", "triage": True}}
+    assert "1 PDFs inalterados pulados" in workspace.run("--stages", "detect").stdout
+
+    select_backend(workspace, "fake_outro")
+    out = workspace.run("--stages", "detect").stdout
+    assert "inalterados pulados" not in out
+    assert [e["nome"] for e in workspace.store_events()] == ["JOSE DA SILVA SANTOS"]
+
+    # Triagem desligada também muda o texto lido: o PDF é relido
+    workspace.write_sources("sources:\n  - type: dejt_pdf\n    name: dejt\n    path: pdfs\n    triage: false\n")
+    assert "inalterados pulados" not in workspace.run("--stages", "detect").stdout
+    assert workspace.read("eventos_detectados.json")["extraction"]["dejt"]["triage"] is False
@@ -0,0 +1,36 @@
+from memory import MemoryGovernor
+
+class FakeMonitor:
+    """Monitor com amostras pré-definidas (bytes), no lugar do RSS real."""
+    def __init__(self, budget, samples):
+        self.budget = budget
+        self.samples = list(samples)
+
+    def sample(self):
+        return self.samples.pop(0)
+
+def sizes(governor):
+    return governor.in_flight.value, governor.chunk.value
+
+def test_governor_grows_additively_and_halves_under_pressure(capsys):
+    monitor = FakeMonitor(1000, [500, 500, 700, 900, 900, 900, 900, 1100, 1100, 100])
+    governor = MemoryGovernor(monitor, max_in_flight=8, blocks_per_chunk=64, min_interval=0)
+    steps = []
+    for _ in range(len(monitor.samples)):
+        governor.adjust()
+        steps.append(sizes(governor))
+    assert steps == [
+        (9, 72), (10, 80),      # folga: +1 registro, +8 blocos
+        (10, 80),               # entre as marcas: mantém
+        (5, 40), (2, 20), (1, 10), (1, 8),  # pressão: metade, até o mínimo
+        (1, 8), (1, 8),         # acima do orçamento no mínimo: avisa uma vez
+        (2, 16),
+    ]
+    assert governor.shrinks == 3
+    assert capsys.readouterr().out.count("acima do orçamento") == 1
+
+def test_governor_stays_within_bounds():
+    governor = MemoryGovernor(FakeMonitor(1000, [0] * 100), max_in_flight=4, blocks_per_chunk=16, min_interval=0)
+    for _ in range(100):
+        governor.adjust()
+    assert sizes(governor) == (8, 64)
@@ -0,0 +1,75 @@
+import os
+import re
+
+import pytest
+import yaml
+
+import detect_events
+from conftest import PIPELINE_DIR, act
+from patterns import REGISTRY, Pattern, Unsupported, translate
+from rules_impact import RULE_LISTS
+
+TEXTS = [
+    act("JOÃO DA SILVA SANTOS", "2023-03-01"),
+    act("Maria Conceição de Araújo", "2023-11-30", region=15, number=7),
+    "ORGAO: Tribunal Regional do Trabalho da 2ª Região URL: https://in.gov.br/x --- TRT-2 e TRT 15, TRF3",
+    "TRIBUNAL REGIONAL ELEITORAL DE SÃO PAULO\nNOMEAR, em virtude de aprovação, o candidato ÉDER ÇÃO para o cargo de "
+    "Técnico Judiciário, com exercício no Tribunal de Contas da União; publicada em 3 de março de 2023.",
+    # OCR: espaços Unicode, letras coladas a dígitos, fronteiras ao lado de acentos
+    "Exonerar a pedido, a partir de 01/02/23, a servidora ANA LÚCIA, matrícula 123,"
+    " ocupante do cargo de Analista Judiciário—Área Judiciária; aposentadoria; falecimentoã TRT7x",
+    "posse em outro cargo público inacumulável\tpublicado em 12/12/2022\n\n\x0bTRIBUNAL SUPERIOR DO TRABALHO",
+    "",
+]
+
+@pytest.fixture(scope="module")
+def registry():
+    pytest.importorskip("re2")
+    with open(os.path.join(PIPELINE_DIR, "rules.yaml"), encoding="utf-8") as f:
+        rules = yaml.safe_load(f)
+    # Mesmo registro do relatório de compatibilidade (patterns.py), com as listas das regras
+    for key in RULE_LISTS:
+        if rules.get(key):
+            detect_events.keyword_regex(tuple(rules[key]), name=f"rules:{key}")
+    return dict(REGISTRY)
+
+def test_re2_patterns_match_re(registry):
+    on_re2 = {name: p for name, p in registry.items() if p.re2 is not None}
+    assert on_re2
+    for name, p in on_re2.items():
+        for text in TEXTS:
+            expected, got = p.py.search(text), p.re2.search(text)
+            assert (got is None) == (expected is None), (name, text)
+            if expected is None:
+                continue
+            # Os grupos são exatos; group(0) só quando a fronteira não consome o vizinho
+            assert got.groups() == expected.groups(), (name, text)
+            if not p.search_only:
+                assert got.span() == expected.span(), (name, text)
+                assert p.re2.findall(text) == p.py.findall(text), (name, text)
+                assert p.re2.split(text) == p.py.split(text), (name, text)
+
+def test_pattern_methods_match_re(registry):
+    for name, p in registry.items():
+        for text in TEXTS:
+            expected = p.py.search(text)
+            got = p.search(text)
+            assert (got and got.groups()) == (expected and expected.groups()), (name, text)
+            assert p.findall(text) == p.py.findall(text), (name, text)
+            assert p.split(text) == p.py.split(text), (name, text)
+
+@pytest.mark.parametrize("pattern", [
+    r"em\s+(?!virtude)\w+",
+    r"(?<=Nº)\s*\d+",
+    r"(\w)\1",
+    r"\bpara\b\s+\w+",
+    r"\b(?:Nº|-)\b",
+    r"\w++",
+])
+def test_untranslatable_patterns_fall_back_to_re(pattern):
+    with pytest.raises(Unsupported):
+        translate(pattern)
+    p = Pattern(pattern, re.IGNORECASE)
+    assert p.engine == "re" and p.reason
+    text = "em virtude do ato Nº 123, para o Tribunal - ss"
+    assert p.findall(text) == re.findall(pattern, text, re.IGNORECASE)
@@ -0,0 +1,32 @@
+from conftest import act
+from rules_impact import TermIndex, affected_records
+
+def test_affected_records_follow_the_changed_terms(tmp_path):
+    index = TermIndex(str(tmp_path / "index.json"))
+    index.add("a", "Declarar vago o cargo")
+    index.add("b", "Declarar vago o cargo, cessão")
+
+    old = {"skip_patterns": ["retificar"], "exit_patterns": ["posse"]}
+    affected, per_term = affected_records(index, old, dict(old, skip_patterns=["retificar", "Cessão"]))
+    assert affected == {"b"}
+    assert per_term == {"skip_patterns: Cessão": 1}
+    # Mudança fora das listas de termos não é delimitável
+    assert affected_records(index, old, dict(old, nova_regra=True))[0] is None
+
+def test_partial_delta_run_keeps_old_rules_snapshot(workspace):
+    workspace.write_text("ato_2023-03-10.txt", act("JOAO DA SILVA SANTOS", "2023-03-10"))
+    workspace.write_text("ato_2023-06-01.txt", act("MARIA SOUZA LIMA", "2023-06-01", number=200))
+    workspace.run("--stages", "detect")
+    assert len(workspace.store_events()) == 2
+    rules_before = workspace.read("eventos_detectados.json")["rules"]
+
+    # "vago" nos skip_patterns descarta os dois atos, mas a rodada só cobre uma fatia
+    workspace.edit_rules(lambda rules: rules["skip_patterns"].append("vago"))
+    workspace.run("--stages", "detect", "--rules-delta", "--since", "2023-05-01")
+    assert [e["nome"] for e in workspace.store_events()] == ["JOAO DA SILVA SANTOS"]
+    assert workspace.read("eventos_detectados.json")["rules"] == rules_before
+
+    # A próxima rodada delta ainda vê a mudança e corrige o resto
+    workspace.run("--stages", "detect", "--rules-delta")
+    assert workspace.store_events() == []
+    assert "vago" in workspace.read("eventos_detectados.json")["rules"]["skip_patterns"]
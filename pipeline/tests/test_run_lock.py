@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+import time
+
+from cache import FileLock
+from conftest import act
+
+def test_second_run_waits_for_the_state_lock(workspace):
+    workspace.write_text("a.txt", act("FULANO DE TAL", "2023-03-01"))
+    lock = FileLock(os.path.join(workspace.dir, "run"))
+    lock.acquire()
+    try:
+        proc = subprocess.Popen([sys.executable, "run.py", "--record-timeout", "0"], cwd=workspace.dir,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        time.sleep(1.5)
+        # Enquanto o lock está com outro processo, nada do estado é lido nem gravado
+        assert proc.poll() is None
+        assert workspace.read("eventos_detectados.json") is None
+    finally:
+        lock.release()
+    out, _ = proc.communicate(timeout=60)
+    assert proc.returncode == 0, out
+    assert "Aguardando outro processo" in out
+    assert [e["nome"] for e in workspace.store_events()] == ["FULANO DE TAL"]
@@ -0,0 +1,19 @@
+from conftest import act
+
+def test_sample_without_frame_keeps_only_ids(workspace):
+    for i in range(6):
+        workspace.write_text(f"{i}.txt", act(f"SERVIDOR NUMERO {i}", f"2023-0{i + 1}-01", number=100 + i))
+    # O reservatório não pode guardar o Record (com o texto) de cada registro lido
+    workspace.append_module("sample.py", (
+        "_offer = StratifiedReservoir.offer\n"
+        "def _ids_only(self, stratum, item):\n"
+        "    assert isinstance(item, str), type(item)\n"
+        "    _offer(self, stratum, item)\n"
+        "StratifiedReservoir.offer = _ids_only\n"
+    ))
+    proc = workspace.run("--sample", "3")
+    assert "Store sem metadados" in proc.stdout
+    report = workspace.read("amostra.json")
+    assert report["funil"]["registros"] == 3
+    assert report["funil"]["eventos"] == 3
+    assert report["populacao"] == 6
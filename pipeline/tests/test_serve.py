@@ -0,0 +1,68 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from build_aggregates import aggregate, as_record
+from detect_events import Event
+from serve import EventIndex, Handler, QueryService
+
+def evento(nome, date, orgao="trt7", destino="Banco Central", tipo="evasão"):
+    return as_record(Event(orgao=orgao, destino=destino, date=date, mes=date[:7], confidence="confirmada",
+                           source_pdf="pdf-1", nome=nome, role="Analista Judiciário", tipo=tipo))
+
+RECORDS = [
+    evento("ANA", "2023-01-10"),
+    evento("BRUNO", "2023-02-20", orgao="trt2", destino="Tribunal de Contas da União"),
+    evento("CARLA", "2023-03-05", orgao="trt2"),
+    evento("DIEGO", "2023-03-05", tipo="ingresso"),
+    evento("EDUARDO", "2024-05-02", orgao="trt15"),
+]
+
+@pytest.fixture
+def server():
+    service = QueryService(EventIndex(RECORDS))
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), type("TestHandler", (Handler,), {"service": service}))
+    httpd.verbose = False
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def get(server, path, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+    try:
+        conn.request("GET", path, headers=headers or {})
+        resp = conn.getresponse()
+        return resp.status, dict(resp.getheaders()), resp.read()
+    finally:
+        conn.close()
+
+def test_filtered_query_matches_build_aggregates(server):
+    status, headers, body = get(server, "/api/agregados?inicio=2023-01&fim=2023-12&orgao=trt2&orgao=TRT7")
+    assert status == 200
+    selected = [r for r in RECORDS if r["date"][:7] <= "2023-12" and r["orgao"].lower() in ("trt2", "trt7")]
+    expected = {name[:-len(".json")]: payload for name, payload in aggregate(selected).items()}
+    assert json.loads(body) == expected
+
+    status, _, body = get(server, "/api/series_mensal?orgao=trt2")
+    assert json.loads(body) == aggregate([r for r in RECORDS if r["orgao"] == "trt2"])["series_mensal.json"]
+
+def test_revalidation_gets_304_from_the_cache(server):
+    path = "/data/top_orgaos.json?orgao=trt2"
+    status, headers, body = get(server, path)
+    assert status == 200 and body
+    etag = headers["ETag"]
+
+    # Mesma consulta normalizada (ordem/caixa diferentes): mesma entrada do cache
+    status, headers, body = get(server, "/api/top_orgaos?orgao=TRT2&destino=", {"If-None-Match": etag})
+    assert (status, body) == (304, b"")
+    assert headers["ETag"] == etag
+    service = server.RequestHandlerClass.service
+    assert (service.hits, service.misses) == (1, 1)
+
+    status, _, _ = get(server, path, {"If-None-Match": '"outro"'})
+    assert status == 200
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+import time
+
+from conftest import PIPELINE_DIR
+from run import HEAVY_MODULES, STARTUP_BUDGET_S
+
+CHECK_MODULES = """
+import sys
+import run
+code = run.main(["--explain"])
+print("pesados:", ",".join(m for m in run.HEAVY_MODULES if m in sys.modules))
+sys.exit(code)
+"""
+
+def wall_time(args):
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, *args], cwd=PIPELINE_DIR, capture_output=True, text=True, timeout=60)
+    return time.perf_counter() - t0, proc
+
+def test_explain_stays_within_the_startup_budget():
+    baseline, _ = wall_time(["-c", "pass"])
+    elapsed, proc = wall_time(["run.py", "--explain"])
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    # O que passa do interpretador vazio é o custo de importar e planejar
+    assert elapsed - baseline <= STARTUP_BUDGET_S, f"{elapsed:.3f}s (interpretador: {baseline:.3f}s)"
+
+def test_explain_imports_no_heavy_dependency():
+    assert HEAVY_MODULES
+    _, proc = wall_time(["-c", CHECK_MODULES])
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    assert "pesados: \n" in proc.stdout
@@ -0,0 +1,46 @@
+import extract_text
+from rules_impact import TermIndex, affected_records
+from sources import DejtPdfDirSource
+from triage import PageTriage
+
+RULES = {"exit_patterns": ["posse"], "entry_patterns": ["nomear"], "ti_keywords": ["informática"]}
+PAGES = [
+    "TRIBUNAL REGIONAL DO TRABALHO DA 7ª REGIÃO",
+    "Decisão judicial sem atos de pessoal",
+    "Outra decisão judicial",
+    "Declarar vago o cargo, em virtude de posse em outro cargo",
+    "Mais decisões",
+    "Última página: remoção a pedido do servidor de informática",
+]
+
+def test_triage_keeps_hits_neighbours_and_header():
+    triage = PageTriage(RULES)
+    assert triage.select(PAGES) == [PAGES[0], PAGES[2], PAGES[3], PAGES[4]]
+    assert triage.pages_skipped == 2
+
+def test_term_index_sees_pages_dropped_by_triage(tmp_path, monkeypatch):
+    pdfs = tmp_path / "pdfs"
+    pdfs.mkdir()
+    (pdfs / "dejt_2023-03-10.pdf").write_bytes(b"%PDF fake")
+    monkeypatch.setattr(extract_text, "iter_pages", lambda buf, backend="auto": iter(PAGES))
+
+    source = DejtPdfDirSource(str(pdfs))
+    source.rules = RULES
+    index = TermIndex(str(tmp_path / "index.json"))
+    source.index_text = index.add
+    records = list(index.indexing(source.records()))
+    assert "remoção" not in records[0].text
+
+    # "remoção" só aparece numa página descartada; o índice ainda a encontra
+    affected, _ = affected_records(index, RULES, dict(RULES, exit_patterns=["posse", "remoção"]))
+    assert affected == {"dejt_2023-03-10.pdf"}
+
+def test_index_of_another_version_is_discarded(tmp_path):
+    path = str(tmp_path / "index.json")
+    index = TermIndex(path)
+    index.add("a", "posse")
+    index.save()
+    assert TermIndex(path).positions == {"a": 0}
+    with open(path, "w") as f:
+        f.write('{"records": ["a"], "postings": {"posse": [0]}}')
+    assert TermIndex(path).positions == {}
@@ -0,0 +1,124 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import act
+from watch import FileWatcher, file_sha1
+
+def make_watcher(tmp_path, files, sources=None):
+    return FileWatcher(lambda: [(str(p), "textos") for p in files], state_path=str(tmp_path / "state.json"),
+                       interval=0, debounce=0, sources=sources)
+
+def test_commit_records_the_hash_seen_when_the_batch_was_built(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("primeira versão")
+    watcher = make_watcher(tmp_path, [path])
+    assert watcher.changes(watcher.scan()) == {str(path)}
+    first = file_sha1(str(path))
+
+    # Reescrito enquanto o lote roda: o commit guarda o conteúdo que foi processado
+    path.write_text("segunda versão, mais longa")
+    watcher.commit([str(path)])
+    assert watcher.state[str(path)]["sha1"] == first
+    assert watcher.state[str(path)]["source"] == "textos"
+    assert watcher.changes(watcher.scan()) == {str(path)}
+
+def test_restarted_watcher_attributes_files_deleted_while_down(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("conteúdo")
+    watcher = make_watcher(tmp_path, [path])
+    watcher.changes(watcher.scan())
+    watcher.commit([str(path)])
+
+    path.unlink()
+    restarted = make_watcher(tmp_path, [])
+    assert restarted.changes(restarted.scan()) == {str(path)}
+    assert restarted.owner(str(path)) == "textos"
+    restarted.commit([str(path)])
+    assert restarted.state == {}
+    # Uma fonte que não está sendo observada não vê os arquivos das outras como removidos
+    other = make_watcher(tmp_path, [], sources={"dou"})
+    assert other.scan() == {}
+
+WATCH_ONCE = """
+import run, watch
+done = []
+commit = watch.FileWatcher.commit
+def counting_commit(self, paths):
+    commit(self, paths)
+    done.append(sorted(paths))
+watch.FileWatcher.commit = counting_commit
+run.watch(run.parse_args(["--watch", "--watch-interval", "0", "--debounce", "0", "--record-timeout", "0",
+                          "--stages", "detect"]), stop=lambda: bool(done))
+"""
+
+def test_file_deleted_while_watcher_was_down_leaves_the_store(workspace):
+    workspace.write_text("ato_2023-03-10.txt", act("JOAO DA SILVA SANTOS", "2023-03-10"))
+    workspace.write_text("ato_2023-06-01.txt", act("MARIA SOUZA LIMA", "2023-06-01", number=200))
+    watch_once = lambda: subprocess.run([sys.executable, "-c", WATCH_ONCE], cwd=workspace.dir,
+                                        capture_output=True, text=True, timeout=60, check=True)
+    watch_once()
+    assert sorted(e["nome"] for e in workspace.store_events()) == ["JOAO DA SILVA SANTOS", "MARIA SOUZA LIMA"]
+
+    workspace.remove_text("ato_2023-03-10.txt")
+    watch_once()
+    assert [e["nome"] for e in workspace.store_events()] == ["MARIA SOUZA LIMA"]
+    with open(os.path.join(workspace.dir, "watch_state.json")) as f:
+        state = json.load(f)
+    assert [os.path.basename(p) for p in state] == ["ato_2023-06-01.txt"]
+
+def test_uncommitted_batch_is_retried_without_new_changes(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("conteúdo")
+    watcher = make_watcher(tmp_path, [path])
+    polls = []
+    batches = []
+    for batch in watcher.batches(stop=lambda: polls.append(1) or len(polls) > 50):
+        batches.append(batch)
+        if len(batches) == 1:
+            continue  # a primeira execução falhou: nada de commit
+        watcher.commit(batch)
+        break
+    assert batches == [[str(path)], [str(path)]]
+    assert watcher.state[str(path)]["sha1"] == file_sha1(str(path))
+    assert not watcher.pending
+
+def test_retry_wait_grows_and_resets(tmp_path):
+    watcher = FileWatcher(lambda: [], state_path=str(tmp_path / "state.json"), interval=1, debounce=2)
+    watcher.pending = {"x": None}
+    watcher._schedule_retry()
+    watcher._schedule_retry()
+    assert watcher._backoff == 8
+    watcher.pending = {}
+    watcher._schedule_retry()
+    assert watcher._backoff == 2
+
+WATCH_FAIL_ONCE = """
+import run, watch
+runs, done = [], []
+detect = run.run
+def failing_once(args):
+    runs.append(1)
+    if len(runs) == 1:
+        raise RuntimeError("falha simulada")
+    return detect(args)
+run.run = failing_once
+commit = watch.FileWatcher.commit
+def counting_commit(self, paths):
+    commit(self, paths)
+    if paths:
+        done.append(sorted(paths))
+watch.FileWatcher.commit = counting_commit
+run.watch(run.parse_args(["--watch", "--watch-interval", "0", "--debounce", "0", "--record-timeout", "0",
+                          "--stages", "detect"]), stop=lambda: bool(done) or len(runs) > 5)
+print("execucoes", len(runs))
+"""
+
+def test_failed_watch_batch_is_processed_on_a_later_poll(workspace):
+    workspace.write_text("ato_2023-03-10.txt", act("JOAO DA SILVA SANTOS", "2023-03-10"))
+    proc = subprocess.run([sys.executable, "-c", WATCH_FAIL_ONCE], cwd=workspace.dir,
+                          capture_output=True, text=True, timeout=60, check=True)
+    assert "falha simulada" in proc.stdout
+    assert "execucoes 2" in proc.stdout
+    assert [e["nome"] for e in workspace.store_events()] == ["JOAO DA SILVA SANTOS"]
@@ -0,0 +1,46 @@
+"""
+Page-level triage for PDFs.
+
+Most DEJT pages are judicial decisions without any personnel act. Before
+block detection, each page goes through a cheap keyword screen built from
+the rules.yaml exit/entry terms (same word-boundary matching as
+detect_events.contains_any); only hit pages, their neighbours (acts that
+span a page break) and the first page (organ header) are kept.
+"""
+from typing import Dict, Iterable, List
+
+from detect_events import keyword_regex, norm
+
+class PageTriage:
+    def __init__(self, rules: Dict, neighbors: int = 1):
+        terms = tuple(rules.get("exit_patterns", []) + rules.get("entry_patterns", []))
+        self.screen = keyword_regex(terms) if terms else None
+        self.neighbors = neighbors
+        self.pages_total = 0
+        self.pages_kept = 0
+
+    def select(self, pages: Iterable[str]) -> List[str]:
+        """Returns the pages to keep, in order."""
+        pages = list(pages)
+        if self.screen is None:
+            keep = set(range(len(pages)))
+        else:
+            hits = [i for i, page in enumerate(pages) if self.screen.search(norm(page))]
+            keep = {0} if pages else set()
+            for i in hits:
+                keep.update(range(max(0, i - self.neighbors), min(len(pages), i + self.neighbors + 1)))
+
+        self.pages_total += len(pages)
+        self.pages_kept += len(keep)
+        return [pages[i] for i in sorted(keep)]
+
+    def text(self, pages: Iterable[str]) -> str:
+        return "\n".join(self.select(pages))
+
+    @property
+    def pages_skipped(self) -> int:
+        return self.pages_total - self.pages_kept
+
+    def report(self) -> str:
+        pct = 100 * self.pages_skipped / self.pages_total if self.pages_total else 0
+        return f"triagem: {self.pages_skipped} de {self.pages_total} páginas descartadas ({pct:.0f}%)"
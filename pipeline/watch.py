@@ -0,0 +1,162 @@
+"""
+Change detection for `run.py --watch`.
+
+FileWatcher polls a set of files (listed by each source's watch_files())
+and reports the ones that were added, changed or removed. A file counts
+as changed when its size or mtime moved *and* its content hash differs,
+so a touch or a copy of identical bytes doesn't trigger a rerun. Bursts
+of arrivals (a batch of PDFs being copied) are debounced: a change set is
+only released once nothing has moved for `debounce` seconds.
+
+The last seen state is kept in watch_state.json, together with the source
+each file belongs to, so a restarted watcher picks up what arrived (or
+was deleted) while it was down. commit() records the content hashed when
+the batch was built: a file rewritten while its batch ran comes back in
+the next one. A batch that is not committed (its run failed) is reported
+again even if nothing else moves, after a growing wait (RETRY_MAX_S at
+most).
+"""
+import hashlib
+import os
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.path.join(PIPELINE_DIR, "watch_state.json")
+POLL_INTERVAL_S = 5.0
+DEBOUNCE_S = 10.0
+# Espera máxima entre tentativas de um lote que não foi confirmado
+RETRY_MAX_S = 300.0
+
+def file_sha1(path: str, chunk_size: int = 1 << 20) -> Optional[str]:
+    h = hashlib.sha1()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+class FileWatcher:
+    """
+    Polls files for content changes, with debounce and persisted state.
+    `list_files` yields (path, source name); with `sources`, state entries
+    of other sources are left alone (a --sources run doesn't see their
+    files as removed).
+    """
+    def __init__(self, list_files: Callable[[], Iterable[Tuple[str, str]]], state_path: str = STATE_PATH,
+                 interval: float = POLL_INTERVAL_S, debounce: float = DEBOUNCE_S,
+                 sources: Optional[Set[str]] = None):
+        from build_aggregates import read_json
+
+        self.list_files = list_files
+        self.state_path = state_path
+        self.interval = interval
+        self.debounce = debounce
+        self.sources = sources
+        # path -> {"size", "mtime_ns", "sha1", "source"} do último conteúdo processado
+        self.state: Dict[str, Dict] = read_json(state_path, {})
+        # path -> fonte, da última varredura
+        self.owners: Dict[str, str] = {}
+        # Estado novo dos arquivos do último lote (None = removido), gravado por commit()
+        self.pending: Dict[str, Optional[Dict]] = {}
+        # stat visto na última varredura (para saber se algo ainda está mudando)
+        self._last_stat: Dict[str, tuple] = {}
+        # Próxima tentativa de um lote não confirmado, e a espera até a seguinte
+        self._retry_at = 0.0
+        self._backoff = max(debounce, interval)
+
+    def owner(self, path: str) -> Optional[str]:
+        """Source of a file: the one listing it now, else the one recorded in the state."""
+        return self.owners.get(path) or self.state.get(path, {}).get("source")
+
+    def scan(self) -> Dict[str, Optional[tuple]]:
+        """(size, mtime_ns) of every watched file; None for known files that vanished."""
+        current = {}
+        for path, source in self.list_files():
+            self.owners[path] = source
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            current[path] = (st.st_size, st.st_mtime_ns)
+        for path, entry in self.state.items():
+            source = entry.get("source")
+            if self.sources is None or source is None or source in self.sources:
+                current.setdefault(path, None)
+        return current
+
+    def changes(self, current: Dict[str, Optional[tuple]]) -> Set[str]:
+        """
+        Paths whose content differs from the state (hashing only files whose
+        stat moved). Their new state waits in `pending` until commit().
+        """
+        # O que ficou de um lote anterior sem commit é recalculado aqui
+        self.pending.clear()
+        changed = set()
+        for path, stat in current.items():
+            known = self.state.get(path)
+            if stat is None:
+                changed.add(path)
+                self.pending[path] = None
+            elif known is None or (known["size"], known["mtime_ns"]) != stat:
+                sha1 = file_sha1(path)
+                if sha1 is None:
+                    continue  # sumiu entre a varredura e o hash: a próxima varredura decide
+                if known is None or sha1 != known["sha1"]:
+                    changed.add(path)
+                    self.pending[path] = {"size": stat[0], "mtime_ns": stat[1], "sha1": sha1}
+                else:
+                    # Mesmo conteúdo (touch, cópia idêntica): só atualiza o stat
+                    known["size"], known["mtime_ns"] = stat
+        return changed
+
+    def commit(self, paths: Iterable[str]):
+        """Marks `paths` as processed with the content seen when their batch was built, and persists the state."""
+        from build_aggregates import write_json
+
+        for path in paths:
+            if path not in self.pending:
+                continue
+            entry = self.pending.pop(path)
+            if entry is None:
+                self.state.pop(path, None)
+                continue
+            source = self.owner(path)
+            if source:
+                entry["source"] = source
+            self.state[path] = entry
+        write_json(self.state_path, dict(sorted(self.state.items())))
+
+    def _schedule_retry(self):
+        """After a batch: paths still pending are retried later, each time waiting twice as long."""
+        if self.pending:
+            self._retry_at = time.monotonic() + self._backoff
+            self._backoff = min(self._backoff * 2, RETRY_MAX_S)
+        else:
+            self._backoff = max(self.debounce, self.interval)
+
+    def batches(self, stop: Callable[[], bool] = lambda: False) -> Iterator[List[str]]:
+        """
+        Yields debounced sets of changed paths (sorted). The caller processes
+        a batch and then calls commit() with it; paths left uncommitted (a
+        failed run) are reported again in the next batch, or on their own
+        once the retry wait is over.
+        """
+        quiet_since = None
+        while not stop():
+            current = self.scan()
+            if current != self._last_stat:
+                # Algo chegou ou ainda está sendo copiado: reinicia a janela de silêncio
+                self._last_stat = current
+                quiet_since = time.monotonic()
+            elif ((quiet_since is not None and time.monotonic() - quiet_since >= self.debounce)
+                  or (quiet_since is None and self.pending and time.monotonic() >= self._retry_at)):
+                quiet_since = None
+                changed = self.changes(current)
+                if changed:
+                    yield sorted(changed)
+                    self._schedule_retry()
+                    continue
+            time.sleep(self.interval)
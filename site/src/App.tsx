@@ -1,39 +1,37 @@
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import "./styles.css";
-import { loadAllData, type SeriesMensalRow, type TopDestinoRow, type TopOrgaoRow } from "./lib/data";
-import { sum } from "./lib/format";
+import {
+  benchEnabled,
+  createEventsWorker,
+  loadAllData,
+  logParseTiming,
+  type SeriesMensalRow,
+  type TopDestinoRow,
+  type TopOrgaoRow,
+} from "./lib/data";
+import type { EventFilters, FilteredAggregates } from "./lib/columnar";
 import { Panel } from "./components/Panel";
 import { KpiCard } from "./components/KpiCard";
 import { ChartLine } from "./components/ChartLine";
 import { ChartBar } from "./components/ChartBar";
 import { Filters } from "./components/Filters";
 
-type FiltersState = { start: string; end: string; orgao: string; destino: string };
+type FiltersState = EventFilters;
+type EventsWorker = ReturnType<typeof createEventsWorker>;
 
 export default function App() {
   const [loading, setLoading] = useState(true);
   const [series, setSeries] = useState<SeriesMensalRow[]>([]);
   const [topDestinos, setTopDestinos] = useState<TopDestinoRow[]>([]);
   const [topOrgaos, setTopOrgaos] = useState<TopOrgaoRow[]>([]);
+  const [totais, setTotais] = useState<FilteredAggregates["totais"] | null>(null);
   const [error, setError] = useState<string | null>(null);
 
-  useEffect(() => {
-    (async () => {
-      try {
-        const data = await loadAllData();
-        setSeries(data.series);
-        setTopDestinos(data.topDestinos);
-        setTopOrgaos(data.topOrgaos);
-      } catch (e: any) {
-        setError(e?.message ?? "Falha ao carregar dados.");
-      } finally {
-        setLoading(false);
-      }
-    })();
-  }, []);
-
-  const minMes = useMemo(() => (series[0]?.mes ?? "2025-01"), [series]);
-  const maxMes = useMemo(() => (series.at(-1)?.mes ?? "2026-01"), [series]);
+  // Eixo de meses e opções dos filtros: fixos, independentes do filtro aplicado
+  const [minMes, setMinMes] = useState("2025-01");
+  const [maxMes, setMaxMes] = useState("2026-01");
+  const [orgaos, setOrgaos] = useState<string[]>([]);
+  const [destinos, setDestinos] = useState<string[]>([]);
 
   const [filters, setFilters] = useState<FiltersState>({
     start: minMes,
@@ -42,23 +40,83 @@ export default function App() {
     destino: "",
   });
 
-  // Atualiza start/end quando dados chegam
-  useEffect(() => {
-    if (!series.length) return;
-    setFilters((f) => ({
-      ...f,
-      start: series[0].mes,
-      end: series.at(-1)!.mes,
-    }));
-  }, [series]);
+  // Com o eventos.bin os filtros recalculam tudo no worker; sem ele, agregados estáticos
+  const workerRef = useRef<EventsWorker | null>(null);
+  const [filtering, setFiltering] = useState(false);
 
-  const totalAno = useMemo(() => sum(series.map((r) => r.evasoes)), [series]);
-  const ultimoMes = useMemo(() => (series.at(-1)?.evasoes ?? 0), [series]);
+  useEffect(() => {
+    let cancelled = false;
+    const events = createEventsWorker();
+    (async () => {
+      try {
+        const info = await events.load();
+        if (cancelled) return;
+        workerRef.current = events;
+        setMinMes(info.minMes);
+        setMaxMes(info.maxMes);
+        setOrgaos(info.orgaos);
+        setDestinos(info.destinos);
+        setFilters((f) => ({ ...f, start: info.minMes, end: info.maxMes }));
+        setFiltering(true);
+        if (benchEnabled()) {
+          loadAllData()
+            .then((data) => logParseTiming(info, data.timing))
+            .catch(() => undefined);
+        }
+      } catch {
+        events.terminate();
+        if (cancelled) return;
+        try {
+          const data = await loadAllData();
+          if (cancelled) return;
+          setSeries(data.series);
+          setTopDestinos(data.topDestinos);
+          setTopOrgaos(data.topOrgaos);
+          setTotais(data.metricas.totais);
+          setMinMes(data.series[0]?.mes ?? "2025-01");
+          setMaxMes(data.series.at(-1)?.mes ?? "2026-01");
+          setOrgaos(data.topOrgaos.map((r) => r.orgao).sort());
+          setDestinos(data.topDestinos.map((r) => r.destino).sort());
+          if (data.series.length) {
+            setFilters((f) => ({ ...f, start: data.series[0].mes, end: data.series.at(-1)!.mes }));
+          }
+        } catch (e: any) {
+          setError(e?.message ?? "Falha ao carregar dados.");
+        } finally {
+          setLoading(false);
+        }
+      }
+    })();
+    return () => {
+      cancelled = true;
+      workerRef.current = null;
+      events.terminate();
+    };
+  }, []);
 
-  // Para o MVP (dados agregados separados), filtros de Orgao/destino ainda não “recalculam” tudo.
-  // Eles vão funcionar de verdade quando o pipeline gerar agregados por dimensão.
-  const orgaos = useMemo(() => topOrgaos.map((r) => r.orgao).sort(), [topOrgaos]);
-  const destinos = useMemo(() => topDestinos.map((r) => r.destino).sort(), [topDestinos]);
+  // Recalcula os agregados no worker a cada mudança de filtro (respostas antigas são descartadas)
+  const queryRef = useRef(0);
+  useEffect(() => {
+    const events = workerRef.current;
+    if (!filtering || !events) return;
+    const id = ++queryRef.current;
+    events
+      .query(filters)
+      .then((r) => {
+        if (id !== queryRef.current) return;
+        setSeries(r.series);
+        setTopDestinos(r.topDestinos);
+        setTopOrgaos(r.topOrgaos);
+        setTotais(r.totais);
+      })
+      .catch((e: Error) => setError(e.message))
+      .finally(() => setLoading(false));
+  }, [filtering, filters]);
+
+  // Totais do filtro (worker) ou pré-calculados no pipeline (metricas.json)
+  const totalAno = totais?.evasoes ?? 0;
+  const ultimoMes = totais?.ultimo_mes ?? 0;
+  const ultimos12m = totais?.ultimos_12m ?? 0;
 
   const barDestinos = useMemo(
     () => topDestinos.map((r) => ({ label: r.destino, value: r.total })),
@@ -118,9 +176,9 @@ export default function App() {
           />
           <hr className="hr" />
           <p className="subtitle">
-            * No MVP, Órgão/Destino ainda não recalculam os gráficos porque os dados mock estão em
-            agregados separados. Quando ligarmos o pipeline, vamos gerar agregados por dimensão
-            e os filtros passam a funcionar de verdade.
+            {filtering
+              ? "* Período, órgão e destino recalculam os gráficos a partir dos eventos (data/eventos.bin)."
+              : "* Sem data/eventos.bin: os gráficos mostram os agregados completos e os filtros não os recalculam."}
           </p>
         </aside>
 
@@ -128,6 +186,7 @@ export default function App() {
           <div className="kpiRow">
             <KpiCard label="Evasões no período (total)" value={totalAno} hint="Confirmadas (destino fora do Judiciário identificado)" />
             <KpiCard label="Último mês" value={ultimoMes} hint="Consolidado do mês mais recente no dataset" />
+            <KpiCard label="Últimos 12 meses" value={ultimos12m} hint="Soma móvel de 12 meses" />
             <KpiCard label="Cobertura" value="Órgãos (Admin)" hint="Cadernos administrativos analisados" />
           </div>
 
@@ -0,0 +1,162 @@
+// Leitura do eventos.bin (formato colunar gerado por pipeline/columnar.py) e
+// recálculo dos agregados do dashboard para um filtro. Roda no Web Worker.
+import type { SeriesMensalRow, TopDestinoRow, TopOrgaoRow } from "./data";
+
+const MAGIC = "OJEV";
+const VERSION = 1;
+const HEADER_SIZE = 20;
+const COLUMN_SIZE = 24;
+const ALLOWED_PREFIXES = ["stf", "cnj", "stj", "stm", "tse", "tst", "trt", "trf", "tre"];
+
+type Column = Uint8Array | Uint16Array | Uint32Array;
+
+export type EventTable = {
+  rows: number;
+  columns: Record<string, Column>;
+  strings: string[];
+};
+
+export type EventFilters = { start: string; end: string; orgao: string; destino: string };
+
+export type FilteredAggregates = {
+  series: SeriesMensalRow[];
+  topOrgaos: TopOrgaoRow[];
+  topDestinos: TopDestinoRow[];
+  totais: { evasoes: number; ultimo_mes: number; ultimos_12m: number };
+};
+
+export type Dimensions = { minMes: string; maxMes: string; orgaos: string[]; destinos: string[] };
+
+// As colunas são views sobre o próprio buffer (sem cópia); o formato é little-endian,
+// como os typed arrays em todos os navegadores atuais.
+export function decodeEvents(buffer: ArrayBuffer): EventTable {
+  const view = new DataView(buffer);
+  const ascii = new TextDecoder("ascii");
+  const magic = ascii.decode(new Uint8Array(buffer, 0, 4));
+  const version = view.getUint16(4, true);
+  if (magic !== MAGIC || version !== VERSION) {
+    throw new Error(`eventos.bin inválido (magic ${magic}, versão ${version})`);
+  }
+  const ncols = view.getUint16(6, true);
+  const rows = view.getUint32(8, true);
+  const nstrings = view.getUint32(12, true);
+  const stringsOffset = view.getUint32(16, true);
+
+  const columns: Record<string, Column> = {};
+  for (let i = 0; i < ncols; i++) {
+    const at = HEADER_SIZE + i * COLUMN_SIZE;
+    const name = ascii.decode(new Uint8Array(buffer, at, 16)).replace(/\0+$/, "");
+    const width = view.getUint8(at + 16);
+    const offset = view.getUint32(at + 20, true);
+    columns[name] =
+      width === 1
+        ? new Uint8Array(buffer, offset, rows)
+        : width === 2
+          ? new Uint16Array(buffer, offset, rows)
+          : new Uint32Array(buffer, offset, rows);
+  }
+
+  const offsets = new Uint32Array(buffer, stringsOffset, nstrings + 1);
+  const bytes = new Uint8Array(buffer, stringsOffset + 4 * (nstrings + 1), offsets[nstrings]);
+  const utf8 = new TextDecoder();
+  const strings = new Array<string>(nstrings);
+  for (let i = 0; i < nstrings; i++) strings[i] = utf8.decode(bytes.subarray(offsets[i], offsets[i + 1]));
+
+  return { rows, columns, strings };
+}
+
+const monthOf = (yyyymmdd: number) => Math.floor(yyyymmdd / 100);
+const monthKey = (mes: string) => Number(mes.slice(0, 4)) * 100 + Number(mes.slice(5, 7));
+const monthLabel = (yyyymm: number) => `${Math.floor(yyyymm / 100)}-${String(yyyymm % 100).padStart(2, "0")}`;
+const dateLabel = (yyyymmdd: number) => `${monthLabel(monthOf(yyyymmdd))}-${String(yyyymmdd % 100).padStart(2, "0")}`;
+
+function shiftMonth(yyyymm: number, delta: number) {
+  const index = Math.floor(yyyymm / 100) * 12 + (yyyymm % 100) - 1 + delta;
+  return Math.floor(index / 12) * 100 + (index % 12) + 1;
+}
+
+const isAllowedOrgao = (label: string) => ALLOWED_PREFIXES.some((p) => label.startsWith(p));
+const compare = (a: string, b: string) => (a < b ? -1 : a > b ? 1 : 0);
+
+// Valores disponíveis para os filtros. O eixo de meses é o do metricas.json (saídas e
+// ingressos), de modo que sem filtro os totais coincidem com os pré-calculados.
+export function dimensions(table: EventTable): Dimensions {
+  const { data, tipo, orgao, categoria } = table.columns;
+  const orgaos = new Set<string>();
+  const destinos = new Set<string>();
+  let min = Infinity;
+  let max = -Infinity;
+  for (let i = 0; i < table.rows; i++) {
+    min = Math.min(min, monthOf(data[i]));
+    max = Math.max(max, monthOf(data[i]));
+    if (tipo[i] !== 0) continue;
+    const label = table.strings[orgao[i]];
+    if (isAllowedOrgao(label)) orgaos.add(label);
+    destinos.add(table.strings[categoria[i]]);
+  }
+  return {
+    minMes: min === Infinity ? "" : monthLabel(min),
+    maxMes: max === -Infinity ? "" : monthLabel(max),
+    orgaos: [...orgaos].sort(),
+    destinos: [...destinos].sort(),
+  };
+}
+
+// Mesmas regras de build_aggregates.AggregateCounters, restritas às saídas que passam no filtro
+export function aggregateEvents(table: EventTable, filters: EventFilters): FilteredAggregates {
+  const { data, tipo, orgao, categoria, destino, nome, role, motivo, cargo_destino } = table.columns;
+  const s = table.strings;
+  const start = filters.start ? monthKey(filters.start) : 0;
+  const end = filters.end ? monthKey(filters.end) : Infinity;
+  const orgaoId = filters.orgao ? s.indexOf(filters.orgao) : -1;
+  const destinoId = filters.destino ? s.indexOf(filters.destino) : -1;
+
+  const series = new Map<number, number>();
+  const destinos = new Map<string, number>();
+  const details = new Map<string, NonNullable<TopOrgaoRow["details"]>>();
+  for (let i = 0; i < table.rows; i++) {
+    if (tipo[i] !== 0) continue;
+    const mes = monthOf(data[i]);
+    if (mes < start || mes > end) continue;
+    if (filters.orgao && orgao[i] !== orgaoId) continue;
+    if (filters.destino && categoria[i] !== destinoId) continue;
+
+    series.set(mes, (series.get(mes) ?? 0) + 1);
+    const cat = s[categoria[i]];
+    destinos.set(cat, (destinos.get(cat) ?? 0) + 1);
+    const label = s[orgao[i]];
+    if (!isAllowedOrgao(label)) continue;
+    let items = details.get(label);
+    if (!items) details.set(label, (items = []));
+    // As linhas já vêm na ordem dos detalhes (data, nome, destino...)
+    items.push({
+      nome: s[nome[i]],
+      data: dateLabel(data[i]),
+      destino: s[destino[i]],
+      role: s[role[i]],
+      motivo: s[motivo[i]],
+      cargo_destino: s[cargo_destino[i]],
+    });
+  }
+
+  const meses = [...series.keys()].sort((a, b) => a - b);
+  const last = end === Infinity ? (meses.at(-1) ?? 0) : end;
+  const first12 = shiftMonth(last, -11);
+  let evasoes = 0;
+  let ultimos12 = 0;
+  for (const [mes, n] of series) {
+    evasoes += n;
+    if (mes >= first12 && mes <= last) ultimos12 += n;
+  }
+
+  return {
+    series: meses.map((m) => ({ mes: monthLabel(m), evasoes: series.get(m)! })),
+    topOrgaos: [...details]
+      .map(([label, items]) => ({ orgao: label, total: items.length, details: items }))
+      .sort((a, b) => b.total - a.total || compare(a.orgao, b.orgao)),
+    topDestinos: [...destinos]
+      .map(([label, total]) => ({ destino: label, total }))
+      .sort((a, b) => b.total - a.total || compare(a.destino, b.destino)),
+    totais: { evasoes, ultimo_mes: series.get(last) ?? 0, ultimos_12m: ultimos12 },
+  };
+}
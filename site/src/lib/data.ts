@@ -1,3 +1,6 @@
+import type { Dimensions, EventFilters, FilteredAggregates } from "./columnar";
+import type { WorkerQuery, WorkerResponse } from "./events.worker";
+
 export type SeriesMensalRow = { mes: string; evasoes: number };
 export type TopDestinoRow = { destino: string; total: number };
 export type TopOrgaoRow = {
@@ -12,23 +15,103 @@ export type TopOrgaoRow = {
     cargo_destino?: string;
   }[];
 };
+// Métricas pré-calculadas pelo pipeline (build_aggregates.py), em colunas
+export type MetricasMensais = {
+  meses: {
+    mes: string[];
+    evasoes: number[];
+    ingressos: number[];
+    saldo: number[];
+    evasoes_3m: number[];
+    evasoes_6m: number[];
+    evasoes_12m: number[];
+    evasoes_yoy: (number | null)[];
+    evasoes_12m_yoy: (number | null)[];
+  };
+  orgaos: {
+    orgao: string[];
+    evasoes: number[];
+    ingressos: number[];
+    saldo: number[];
+    taxa_mensal: number[];
+    participacao: number[];
+  };
+  totais: { evasoes: number; ingressos: number; saldo: number; ultimo_mes: number; ultimos_12m: number };
+};
 
-async function loadJson<T>(path: string): Promise<T> {
+function dataUrl(path: string) {
   const base = import.meta.env.BASE_URL || "/";
-  const url = new URL(path, window.location.origin + base).toString();
+  return new URL(path, window.location.origin + base).toString();
+}
+
+// Bytes baixados e tempo de decodificação + JSON.parse (comparável ao parseMs do worker)
+export type ParseTiming = { bytes: number; parseMs: number };
+
+async function loadJson<T>(path: string, timing: ParseTiming): Promise<T> {
+  const url = dataUrl(path);
 
   const res = await fetch(url, { cache: "no-store" });
   if (!res.ok) throw new Error(`Falha ao carregar ${url}: ${res.status}`);
-  return res.json();
+  const buffer = await res.arrayBuffer();
+  const t0 = performance.now();
+  const value = JSON.parse(new TextDecoder().decode(buffer)) as T;
+  timing.parseMs += performance.now() - t0;
+  timing.bytes += buffer.byteLength;
+  return value;
 }
 
 
 export async function loadAllData() {
-  const [series, topDestinos, topOrgaos] = await Promise.all([
-    loadJson<SeriesMensalRow[]>("data/series_mensal.json"),
-    loadJson<TopDestinoRow[]>("data/top_destinos.json"),
-    loadJson<TopOrgaoRow[]>("data/top_orgaos.json"),
+  const timing: ParseTiming = { bytes: 0, parseMs: 0 };
+  const [series, topDestinos, topOrgaos, metricas] = await Promise.all([
+    loadJson<SeriesMensalRow[]>("data/series_mensal.json", timing),
+    loadJson<TopDestinoRow[]>("data/top_destinos.json", timing),
+    loadJson<TopOrgaoRow[]>("data/top_orgaos.json", timing),
+    loadJson<MetricasMensais>("data/metricas.json", timing),
   ]);
 
-  return { series, topDestinos, topOrgaos };
+  return { series, topDestinos, topOrgaos, metricas, timing };
+}
+
+// Com ?bench na URL, o dashboard registra no console o custo de leitura dos dois caminhos
+export const benchEnabled = () => new URLSearchParams(window.location.search).has("bench");
+
+export function logParseTiming(bin: ParseTiming, json: ParseTiming) {
+  const fmt = (t: ParseTiming) => `${(t.bytes / 1024).toFixed(1)} KB em ${t.parseMs.toFixed(2)} ms`;
+  console.info(`⏱️ eventos.bin (decodeEvents, worker): ${fmt(bin)} · JSONs (JSON.parse): ${fmt(json)}`);
+}
+
+export type EventsInfo = Dimensions & { rows: number; bytes: number; parseMs: number };
+
+// Eventos em formato colunar (data/eventos.bin), decodificados e filtrados num Web Worker
+export function createEventsWorker() {
+  const worker = new Worker(new URL("./events.worker.ts", import.meta.url), { type: "module" });
+  const pending = new Map<number, { resolve: (v: unknown) => void; reject: (e: Error) => void }>();
+  let nextId = 0;
+
+  worker.addEventListener("message", (e: MessageEvent<WorkerResponse>) => {
+    const p = pending.get(e.data.id);
+    if (!p) return;
+    pending.delete(e.data.id);
+    if (e.data.ok) p.resolve(e.data.result);
+    else p.reject(new Error(e.data.error));
+  });
+  worker.addEventListener("error", (e) => {
+    for (const p of pending.values()) p.reject(new Error(e.message || "Falha no worker de eventos"));
+    pending.clear();
+  });
+
+  function request<T>(req: WorkerQuery): Promise<T> {
+    const id = nextId++;
+    return new Promise<T>((resolve, reject) => {
+      pending.set(id, { resolve: (v) => resolve(v as T), reject });
+      worker.postMessage({ ...req, id });
+    });
+  }
+
+  return {
+    load: () => request<EventsInfo>({ type: "load", url: dataUrl("data/eventos.bin") }),
+    query: (filters: EventFilters) => request<FilteredAggregates>({ type: "query", filters }),
+    terminate: () => worker.terminate(),
+  };
 }
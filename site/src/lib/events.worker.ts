@@ -0,0 +1,34 @@
+// Web Worker: baixa e decodifica o eventos.bin uma vez e responde às consultas
+// de filtro, mantendo o parse e as agregações fora da thread principal.
+import { aggregateEvents, decodeEvents, dimensions, type EventFilters, type EventTable } from "./columnar";
+
+export type WorkerQuery = { type: "load"; url: string } | { type: "query"; filters: EventFilters };
+export type WorkerRequest = WorkerQuery & { id: number };
+
+export type WorkerResponse = { id: number; ok: true; result: unknown } | { id: number; ok: false; error: string };
+
+let table: EventTable | null = null;
+
+async function handle(req: WorkerRequest) {
+  if (req.type === "load") {
+    const res = await fetch(req.url, { cache: "no-store" });
+    if (!res.ok) throw new Error(`Falha ao carregar ${req.url}: ${res.status}`);
+    const buffer = await res.arrayBuffer();
+    const t0 = performance.now();
+    table = decodeEvents(buffer);
+    return { ...dimensions(table), rows: table.rows, bytes: buffer.byteLength, parseMs: performance.now() - t0 };
+  }
+  if (!table) throw new Error("eventos.bin ainda não carregado");
+  return aggregateEvents(table, req.filters);
+}
+
+self.addEventListener("message", async (e: MessageEvent<WorkerRequest>) => {
+  const { id } = e.data;
+  let response: WorkerResponse;
+  try {
+    response = { id, ok: true, result: await handle(e.data) };
+  } catch (err) {
+    response = { id, ok: false, error: err instanceof Error ? err.message : String(err) };
+  }
+  self.postMessage(response);
+});
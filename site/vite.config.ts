@@ -1,7 +1,14 @@
 import { defineConfig } from "vite";
 import react from "@vitejs/plugin-react";
 
+// Com OBSERVATORIO_API=http://localhost:8765, o dev server busca os JSONs (e a /api)
+// no serviço local do pipeline (pipeline/serve.py) em vez de public/data.
+const api = process.env.OBSERVATORIO_API;
+
 export default defineConfig({
   plugins: [react()],
   base: "/observatoriojud/",
+  server: api
+    ? { proxy: { "/observatoriojud/data": api, "/observatoriojud/api": api } }
+    : undefined,
 });